@@ -1,11 +1,10 @@
 from typing import List, Optional
 from enum import Enum
-from threading import RLock, Event, Thread
-import sched
-import time
+from threading import RLock, Event
 from random import gauss
 
 from pyvisa_mock.base.base_mocker import BaseMocker, scpi
+from pyvisa_mock.base.clock import Clock, Timer
 
 
 class MessageCode(Enum):
@@ -25,8 +24,8 @@ class GeigerCounterMock(BaseMocker):
     _reading_mean = 0
     _reading_std = .1
 
-    def __init__(self, call_delay: float = 0):
-        super().__init__(call_delay=call_delay)
+    def __init__(self, call_delay: float = 0, clock: Optional[Clock] = None):
+        super().__init__(call_delay=call_delay, clock=clock)
         self._readings: List[float] = []
         self._accumulation = 0.0
         self._exposure_threshold = 0.0
@@ -34,9 +33,8 @@ class GeigerCounterMock(BaseMocker):
         self._lock = RLock()
         self._running = Event()
         self._running.clear()
-        self._cur_reading_time = time.time()
-        self._measurement_scheduler = sched.scheduler(time.time, time.sleep)
-        self._sched_thread: Optional[Thread] = None
+        self._cur_reading_time = self.clock.time()
+        self._next_reading: Optional[Timer] = None
 
     @property
     def next_reading_time(self) -> float:
@@ -45,7 +43,7 @@ class GeigerCounterMock(BaseMocker):
 
     def _take_reading(self):
         """
-        Task should be run in a thread to periodically make readings.
+        Scheduled on the clock to periodically make readings.
         """
         cur_reading = abs(gauss(self._reading_mean, self._reading_std))
         with self._lock:
@@ -67,11 +65,9 @@ class GeigerCounterMock(BaseMocker):
                     self.stb |= MessageCode.REQUEST_SERVICE.value
                     self.set_service_request_event()
         if self._running.is_set():
-            self._measurement_scheduler.enterabs(
-                time=self.next_reading_time,
-                priority=1,
-                action=self._take_reading,
-                argument=[])
+            self._next_reading = self.clock.call_at(
+                self.next_reading_time, self._take_reading
+            )
 
     @scpi(r'\*IDN\?')
     def identify(self) -> str:
@@ -119,17 +115,12 @@ class GeigerCounterMock(BaseMocker):
         if self._running.is_set():
             return
         self._running.set()
-        self._cur_reading_time = time.time()
+        self._cur_reading_time = self.clock.time()
         self._take_reading()
-        self._sched_thread = Thread(
-            target=self._measurement_scheduler.run,
-            # Should be okay to kill thread on exit, no resouces open
-            daemon=True)
-        self._sched_thread.start()
 
     @scpi(r'MEAS:STOP')
     def stop_measurements(self) -> None:
         self._running.clear()
-        if self._sched_thread is not None:
-            self._sched_thread.join()
-        self._sched_thread = None
+        if self._next_reading is not None:
+            self._next_reading.cancel()
+        self._next_reading = None
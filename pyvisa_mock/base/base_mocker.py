@@ -1,16 +1,33 @@
 from inspect import signature
+from types import FunctionType
 from typing import (
     Dict, List, Callable,
     Any, cast, get_type_hints,
-    Optional,
+    Optional, Pattern, Tuple,
+    NamedTuple, Sequence, Set, Union, Iterable,
     )
+from collections.abc import Iterator
+from copy import copy
 from dataclasses import dataclass
+from functools import lru_cache, partial
 import re
-import time
 from queue import Queue
 
 from pyvisa import constants
 
+from pyvisa_mock.base import grammar
+from pyvisa_mock.base.blocks import Message, split_blocks, block_array
+from pyvisa_mock.base.clock import Clock, RealClock
+from pyvisa_mock.base.compound import split_compound, join_responses, is_query
+from pyvisa_mock.base.converters import get_converter
+from pyvisa_mock.base.datasets import Dataset
+from pyvisa_mock.base.formatters import Format, Formatter
+from pyvisa_mock.base.latency import Latency, response_size
+from pyvisa_mock.base.dispatch import SCPITrie
+from pyvisa_mock.base.responses import (
+    StreamResponse, DeferredResponse, array_response, is_array
+)
+
 
 @dataclass
 class StbRegister:
@@ -25,6 +42,53 @@ class StbRegister:
     value: int = 0
 
 
+class ResponseCacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    currsize: int
+
+
+class ResponseCache:
+    """
+    The formatted responses of handlers declared with 'cache=True', kept
+    per mocker instance and keyed by message. Responses are dropped when
+    a handler which writes one of their state keys is called.
+    """
+    def __init__(self) -> None:
+        self._responses: Dict[str, Any] = {}
+        self._messages_by_state: Dict[str, Set[str]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, message: str) -> Any:
+        """
+        Return the cached response to a message, or None.
+        """
+        response = self._responses.get(message)
+        if response is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return response
+
+    def put(self, message: str, states: Tuple[str, ...], response: Any) -> None:
+        self._responses[message] = response
+        for state in states:
+            self._messages_by_state.setdefault(state, set()).add(message)
+
+    def invalidate(self, states: Tuple[str, ...]) -> None:
+        for state in states:
+            for message in self._messages_by_state.pop(state, ()):
+                self._responses.pop(message, None)
+
+    def clear(self) -> None:
+        self._responses.clear()
+        self._messages_by_state.clear()
+
+    def info(self) -> ResponseCacheInfo:
+        return ResponseCacheInfo(self.hits, self.misses, len(self._responses))
+
+
 class MockingError(Exception):
     pass
 
@@ -43,11 +107,14 @@ class SCPIHandler:
     1) Because SCPI messages are strings, this handler will cast string
         values to the appropriate type depending on the annotation of the
         input method. The method will be called with the recast arguments.
+        The converter of each annotation is looked up once, see
+        converters.py.
 
     2) A handler can combine two handlers into one. Each handler handles part
         of a scpi string, for example ":INSTR:CHANNEL(.*)" and ":VOLTAGE?".
         The handler of the former returns a mock sub-module instance, containing
-        a handler method for the latter substring.
+        a handler method for the latter substring. A combined handler calls
+        the methods of its call plan in order (see 'stages').
     """
     @classmethod
     def from_method(cls, method: Callable) -> 'SCPIHandler':
@@ -86,47 +153,27 @@ class SCPIHandler:
         """
         Combine two handlers, each processing part of a SCPI message.
         """
-        handler_arg_count = len(handler.annotations)
         parameters = list(handler.parameters)
         parameters.extend(sub_handler.parameters)
         annotations = list(handler.annotations)
         annotations.extend(sub_handler.annotations)
 
-        def method(self, *args, **kwargs):
-            handler_args = ()
-            handler_kwargs = {}
-            sub_handler_args = ()
-            sub_handler_kwargs = {}
-
-            if args:
-                handler_args = args[:handler_arg_count]
-                sub_handler_args = args[handler_arg_count:]
-
-            if kwargs:
-                handler_kwargs = {
-                    parameter: kwargs[parameter]
-                    for parameter in parameters[:handler_arg_count]
-                }
-
-                sub_handler_kwargs = {
-                    parameter: kwargs[parameter]
-                    for parameter in parameters[handler_arg_count:]
-                }
-
-            # The first handler returns a submodule
-            sub_module = handler(self, *handler_args, **handler_kwargs)
-            # 'sub_handler' is a *class* method, meaning that the
-            # first argument needs to be a 'self'. This is
-            # provided by the first handler.
-            return sub_handler(
-                sub_module,
-                *sub_handler_args,
-                **sub_handler_kwargs
-            )
+        # The arguments of the sub handler follow those of the handler
+        offset = len(handler.annotations)
+        plan = handler.stages() + tuple(
+            stage.shifted(offset) for stage in sub_handler.stages()
+        )
 
-        return cls(
-            method, parameters, annotations, sub_handler.return_type
+        # The response of the combined handler is that of the sub handler
+        combined_handler = copy(sub_handler)
+        combined_handler.parameters = parameters
+        combined_handler.annotations = annotations
+        combined_handler.converters = handler.converters + sub_handler.converters
+        combined_handler.named_converters = dict(
+            zip(parameters, combined_handler.converters)
         )
+        combined_handler.plan = plan
+        return combined_handler
 
     def __init__(
             self,
@@ -149,7 +196,45 @@ class SCPIHandler:
         self.parameters = parameters
         self.annotations = annotations
         self.return_type = return_type
-        self.call_delay = None
+        self.converters = tuple(get_converter(annotation) for annotation in annotations)
+        self.named_converters = dict(zip(parameters, self.converters))
+        # The scpi string this handler was registered with. This remains
+        # None for handlers registered with a raw regular expression.
+        self.scpi_string: Optional[str] = None
+        # The mocker class returned by the handler, if the remainder of a
+        # message is dispatched lazily to this submodule
+        self.submodule: Optional['MockerMetaClass'] = None
+        # Reuse the submodule returned for the same arguments
+        self.cache_submodule = False
+        # The call plan of a combined handler, see 'stages'
+        self.plan: Optional[Tuple['CallStage', ...]] = None
+        # Cache the response, until a handler writing one of the states
+        # is called. See the 'scpi' decorator.
+        self.cache = False
+        self.states: Tuple[str, ...] = ()
+        self.writes: Tuple[str, ...] = ()
+        # How a returned numpy array is encoded, see 'array_response', and
+        # how the values of binary block parameters are decoded
+        self.datatype: Optional[str] = None
+        self.is_big_endian = False
+        # The names of the binary block parameters
+        self.blocks: Tuple[str, ...] = ()
+        # Formats the response as text, see formatters.py
+        self.formatter: Optional[Formatter] = None
+
+    def stages(self) -> Tuple['CallStage', ...]:
+        """
+        Return the call plan of this handler: the methods to call in
+        order, each with the submodule returned by the previous one.
+        """
+        if self.plan is not None:
+            return self.plan
+        return (
+            CallStage(
+                self.method, 0, self.parameters, self.converters,
+                self.cache_submodule
+            ),
+        )
 
     def __call__(self, mocker_self, *args, **kwargs):
         """
@@ -157,53 +242,320 @@ class SCPIHandler:
         SCPI message string. Convert these string to the appropriate type
         using the annotations and call the handler method.
         """
-        new_args = ()
-        new_kwargs = {}
+        if self.plan is not None:
+            target = mocker_self
+            for stage in self.plan:
+                target = stage(target, args, kwargs)
+            return target
 
-        if args:
-            new_args = [
-                annotation_type(value)
-                for annotation_type, value in zip(self.annotations, args)
-            ]
+        if kwargs:
+            converters = self.named_converters
+            return self.method(mocker_self, **{
+                name: converters.get(name, _unchanged)(value)
+                for name, value in kwargs.items()
+            })
+
+        if not args:
+            return self.method(mocker_self)
+
+        return self.method(mocker_self, *[
+            converter(value) for converter, value in zip(self.converters, args)
+        ])
+
+
+def _unchanged(value: Any) -> Any:
+    return value
 
+
+class CallStage:
+    """
+    A method in the call plan of a combined handler. The positions and the
+    names of its arguments and the converters are computed once, when the
+    handlers are combined.
+    """
+    __slots__ = ("method", "start", "stop", "names", "converters", "cached")
+
+    def __init__(
+            self,
+            method: Callable,
+            start: int,
+            parameters: List,
+            converters: Tuple[Callable, ...],
+            cached: bool = False
+    ) -> None:
+        self.method = method
+        self.start = start
+        self.stop = start + len(converters)
+        self.names = tuple(parameters)
+        self.converters = tuple(converters)
+        # Cache the returned submodule per mocker instance
+        self.cached = cached
+
+    def shifted(self, offset: int) -> 'CallStage':
+        return CallStage(
+            self.method, self.start + offset, list(self.names),
+            self.converters, self.cached
+        )
+
+    def __call__(self, target: Any, args: tuple, kwargs: dict) -> Any:
         if kwargs:
-            new_kwargs = {
-                name: annotation_type(value)
-                for annotation_type, (name, value) in zip(self.annotations, kwargs.items())
-            }
+            strings = tuple(kwargs[name] for name in self.names)
+        else:
+            strings = args[self.start:self.stop]
+        values = tuple(
+            converter(value) for converter, value in zip(self.converters, strings)
+        )
+
+        if not self.cached:
+            return self.method(target, *values)
+
+        try:
+            key = (self.method, values)
+            hash(key)
+        except TypeError:
+            # Values which cannot be a key, e.g. the numpy array of a list
+            # parameter, are identified by the strings in the message
+            key = (self.method, strings)
+
+        try:
+            return target._submodules[key]
+        except KeyError:
+            sub_module = target._submodules[key] = self.method(target, *values)
+            return sub_module
+
+
+class SubmoduleHandler:
+    """
+    Handles a message which has been dispatched lazily to a submodule. The
+    handler of the parent returns the submodule instance, which is passed
+    as 'self' to the handler of the remainder of the message.
+    """
+    def __init__(
+            self,
+            handler: SCPIHandler,
+            args: tuple,
+            kwargs: dict,
+            sub_handler: Any
+    ) -> None:
+        self.handler = handler
+        self.args = args
+        self.kwargs = kwargs
+        self.sub_handler = sub_handler
+
+    def __getattr__(self, name: str) -> Any:
+        # The response is that of the sub handler: its cache, states, format
+        # and so on
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return getattr(self.sub_handler, name)
 
-        return self.method(mocker_self, *new_args, **new_kwargs)
+    def __call__(self, mocker_self, *args, **kwargs):
+        sub_module = self.handler(mocker_self, *self.args, **self.kwargs)
+        return self.sub_handler(sub_module, *args, **kwargs)
 
 
-__tmp_scpi_dict__: Dict[str, SCPIHandler] = {}
+def _setting(settings: Dict[Any, Any], handler: Any) -> Any:
+    """
+    Return the setting of a handler, e.g. its call delay. A command resolved
+    lazily in a submodule takes the setting of the command, or else that of
+    the header of the submodule.
+    """
+    setting = settings.get(handler)
+    if setting is None and isinstance(handler, SubmoduleHandler):
+        setting = _setting(settings, handler.sub_handler)
+        if setting is None:
+            setting = settings.get(handler.handler)
+    return setting
+
+
+def _add_handler(function: Callable, regex: str, handler: SCPIHandler) -> None:
+    """
+    Register a handler on the decorated function. The mocker metaclass
+    collects the handlers of all functions in the class namespace.
+    """
+    handlers = function.__dict__.setdefault("__scpi_handlers__", {})
+    handlers[regex] = handler
+
+
+class _MockerNamespace(dict):
+    """
+    The namespace of a mocker class body. Collects the handlers of every
+    decorated function, including functions whose name is reused. The
+    handlers of a dataset (see 'scpi_dataset') may not replace or be
+    replaced by other handlers.
+    """
+    def __init__(self) -> None:
+        super().__init__()
+        self.scpi_handlers: Dict[str, SCPIHandler] = {}
+        self.dataset_regexes: Set[str] = set()
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        if isinstance(value, FunctionType):
+            handlers = value.__dict__.get("__scpi_handlers__", {})
+            is_dataset = value.__dict__.get("__scpi_dataset__", False)
+            for regex, handler in handlers.items():
+                if regex not in self.scpi_handlers:
+                    continue
+                if is_dataset:
+                    raise MockingError(
+                        f"'{handler.scpi_string}' of dataset '{key}' is already registered"
+                    )
+                if regex in self.dataset_regexes:
+                    raise MockingError(
+                        f"'{handler.scpi_string}' of '{key}' is already registered by a dataset"
+                    )
+            if is_dataset:
+                self.dataset_regexes.update(handlers)
+            self.scpi_handlers.update(handlers)
+        super().__setitem__(key, value)
 
 
 class MockerMetaClass(type):
     """
     We need a custom metaclass as right after class declaration
-    we need to modify class attributes: The `__scpi_dict__` needs
-    to be populated
+    we need to modify class attributes: The handlers decorated in the
+    class body are kept in `__scpi_own__`. The `__scpi_dict__` is
+    populated with the own handlers of the classes in the MRO, classes
+    earlier in the MRO overriding later ones per regular expression. Every
+    regular expression is compiled once and stored in `__scpi_patterns__`,
+    and the dispatch trie is built and analysed for overlapping patterns.
+    A class which adds no handlers shares the tables of a base class with
+    the same handlers.
     """
 
-    def __new__(cls, *args, **kwargs):
-        mocker_class = super().__new__(cls, *args, **kwargs)
-        mocker_class.__scpi_dict__ = dict(__tmp_scpi_dict__)
+    @classmethod
+    def __prepare__(mcs, name, bases, **kwargs):
+        return _MockerNamespace()
+
+    def __new__(mcs, name, bases, namespace, **kwargs):
+        mocker_class = super().__new__(mcs, name, bases, dict(namespace), **kwargs)
+        own_handlers = getattr(namespace, "scpi_handlers", {})
+        mocker_class.__scpi_own__ = own_handlers
+
+        # The classes which define handlers, in MRO order
+        owners = mcs._owners(mocker_class)
+
+        if not own_handlers and owners and mcs._owners(owners[0]) == owners:
+            # The handlers are those of the first class which defines any
+            base = owners[0]
+            mocker_class.__scpi_dict__ = base.__scpi_dict__
+            mocker_class.__scpi_patterns__ = base.__scpi_patterns__
+            mocker_class.__scpi_trie__ = base.__scpi_trie__
+        else:
+            scpi_dict: Dict[str, SCPIHandler] = {}
+            patterns: Dict[str, Pattern] = {}
+            # Classes earlier in the MRO override the classes after them
+            for base in reversed(owners):
+                scpi_dict.update(base.__scpi_own__)
+                patterns.update(base.__scpi_patterns__)
+
+            mocker_class.__scpi_dict__ = scpi_dict
+            mocker_class.__scpi_patterns__ = {
+                regex: patterns.get(regex) or re.compile(regex)
+                for regex in scpi_dict
+            }
+            mocker_class.__scpi_trie__ = mcs._build_trie(
+                mocker_class.__scpi_dict__, mocker_class.__scpi_patterns__
+            )
+
+        # Only look for binary blocks in messages if a handler expects one
+        mocker_class.__scpi_blocks__ = any(
+            handler.blocks or (
+                handler.submodule is not None and handler.submodule.__scpi_blocks__
+            )
+            for handler in mocker_class.__scpi_dict__.values()
+        )
 
-        names = list(__tmp_scpi_dict__.keys())
-        for name in names:
-            __tmp_scpi_dict__.pop(name)
+        mocker_class.__dispatch_cache__ = None
+        if mocker_class.dispatch_cache_size:
+            mocker_class.enable_dispatch_cache(mocker_class.dispatch_cache_size)
 
         return mocker_class
 
+    @staticmethod
+    def _owners(mocker_class: 'MockerMetaClass') -> List['MockerMetaClass']:
+        """
+        Return the classes in the MRO of a mocker class, including the class
+        itself, which define handlers.
+        """
+        return [
+            base for base in mocker_class.__mro__
+            if isinstance(base, MockerMetaClass) and base.__scpi_own__
+        ]
+
+    @staticmethod
+    def _build_trie(
+            scpi_dict: Dict[str, SCPIHandler],
+            patterns: Dict[str, Pattern]
+    ) -> SCPITrie:
+        trie = SCPITrie()
+        for regex, handler in scpi_dict.items():
+            if handler.submodule is not None:
+                trie.add_mount(
+                    handler.scpi_string, patterns[regex], handler,
+                    handler.submodule.__scpi_trie__
+                )
+            elif handler.scpi_string is not None:
+                trie.add_scpi(handler.scpi_string, patterns[regex], handler)
+            else:
+                trie.add_regex(patterns[regex], handler)
+
+        trie.analyse()
+        return trie
+
 
 class BaseMocker(metaclass=MockerMetaClass):
+    __scpi_own__: Dict[str, Callable] = {}
     __scpi_dict__: Dict[str, Callable] = {}
+    __scpi_patterns__: Dict[str, Pattern] = {}
+    __scpi_trie__: SCPITrie
+    __scpi_blocks__: bool = False
+    # When True, every message is checked against all patterns and a
+    # MockingError is raised if more than one matches. When False, only
+    # the patterns found to overlap at class definition are checked.
+    check_ambiguity: bool = False
+    # Number of resolved messages cached per mocker class. See
+    # 'enable_dispatch_cache'. Zero disables the cache.
+    dispatch_cache_size: int = 0
+    __dispatch_cache__: Optional[Callable] = None
+    # The output queue of a session with this mocker, see session.py.
+    # What happens to unread responses when a new message arrives:
+    # "discard" drops them (a reply replaces the previous one), "keep"
+    # queues the responses to queries, such that queries can be pipelined,
+    # and "error" drops them and raises a QueryInterruptedError.
+    query_interrupted: str = "discard"
+    # The maximum number of unread responses with "keep", and what happens
+    # when a response does not fit: "error" raises an
+    # OutputQueueOverflowError, "drop_oldest" or "drop_newest" discard a
+    # response.
+    output_queue_size: int = 64
+    output_overflow: str = "error"
+    # When True, a session calls the handler of a query when the response
+    # is read, instead of when the query is send. A response which is never
+    # read is never computed. Unread responses are computed before the
+    # next message is handled, unless they are discarded. Queries with
+    # 'writes' and compound messages are never deferred.
+    defer_queries: bool = False
     _events: Dict[constants.EventType, Queue]
     # Should be created and set by session
     _stb_register: StbRegister
 
-    def __init__(self, call_delay: float = 0.0):
+    def __init__(self, call_delay: float = 0.0, clock: Optional[Clock] = None):
         self._call_delay = call_delay
+        # Call delays of single commands, by handler
+        self._call_delays: Dict[Any, float] = {}
+        # Latency profiles, see latency.py
+        self._latency: Optional[Latency] = None
+        self._latencies: Dict[Any, Latency] = {}
+        self._latency_families: List[Tuple[Pattern, Latency]] = []
+        # Call delays and background simulations use this clock, see clock.py
+        self.clock: Clock = RealClock() if clock is None else clock
+        # Submodules returned by handlers with 'cache_submodule' set
+        self._submodules: Dict[Any, 'BaseMocker'] = {}
+        self._response_cache = ResponseCache()
+        # The records selected in the datasets served with 'scpi_dataset',
+        # as [start, stop] by attribute name
+        self._selections: Dict[str, List[Optional[int]]] = {}
         # will be updated with supported events when registered with session
         self._events: Dict[constants.EventType, Queue] = {}
         self._stb_register: StbRegister = self._create_stb_register()
@@ -215,17 +567,207 @@ class BaseMocker(metaclass=MockerMetaClass):
     ) -> None:
         """
         This method set the call delay to either the whole instrument, or the
-        scpi command specified.
+        scpi command specified. The delay only applies to this instance.
 
         Args:
             call_delay: the intended delay value in second.
             scpi_string: when provided, this method will apply the call_delay
-                to this scpi command only.
+                to this scpi command only. A command of a lazy submodule is
+                named by the scpi string of the header followed by that of
+                the command, e.g. ":CHANnel<n>" + ":VOLTage?".
         """
         if scpi_string is None:
             self._call_delay = call_delay
         else:
-            self.__scpi_dict__[compile_regular_expression(scpi_string)].call_delay = call_delay
+            self._call_delays[self._handler(scpi_string)] = call_delay
+
+    def set_latency(
+            self,
+            latency: Optional[Latency],
+            scpi_string: Optional[str] = None,
+            family: Optional[str] = None
+    ) -> None:
+        """
+        Set the latency profile of this instrument, of a command or of a
+        family of commands. See latency.py. A profile of a command takes
+        precedence over that of a family, which takes precedence over that
+        of the instrument.
+
+        Args:
+            latency: The profile, or None to remove a profile.
+            scpi_string: The scpi string of the command, as given to the
+                'scpi' decorator. See 'set_call_delay' for the commands of
+                a lazy submodule.
+            family: The scpi string of a header, e.g. ":MEASure" or
+                ":INSTRument:CHANnel<n>". The profile applies to the
+                messages starting with this header.
+        """
+        if scpi_string is not None:
+            key = self._handler(scpi_string)
+            if latency is None:
+                self._latencies.pop(key, None)
+            else:
+                self._latencies[key] = latency
+        elif family is not None:
+            pattern = re.compile("(?i)" + grammar.to_header_regex(family))
+            self._latency_families = [
+                entry for entry in self._latency_families
+                if entry[0].pattern != pattern.pattern
+            ]
+            if latency is not None:
+                self._latency_families.append((pattern, latency))
+        else:
+            self._latency = latency
+
+    @classmethod
+    def _handler(cls, scpi_string: str) -> Any:
+        """
+        Return the handler registered with a scpi string. The header of a
+        lazily dispatched submodule is registered with its header regex, and
+        its commands are found in the table of the submodule.
+        """
+        handler = cls._find_handler(scpi_string)
+        if handler is None:
+            raise ValueError(
+                f"Unknown scpi string {scpi_string}. The command of a lazy "
+                f"submodule is named by the scpi string of its header followed "
+                f"by the scpi string of the command"
+            )
+        return handler
+
+    @classmethod
+    def _find_handler(cls, scpi_string: str) -> Any:
+        scpi_dict = cls.__scpi_dict__
+        handler = scpi_dict.get(compile_regular_expression(scpi_string))
+        if handler is None:
+            handler = scpi_dict.get('(?i)' + grammar.to_header_regex(scpi_string))
+        if handler is not None:
+            return handler
+
+        for header in scpi_dict.values():
+            if header.submodule is None or header.scpi_string is None:
+                continue
+            if scpi_string.startswith(header.scpi_string):
+                handler = header.submodule._find_handler(
+                    scpi_string[len(header.scpi_string):]
+                )
+                if handler is not None:
+                    return handler
+        return None
+
+    def _delay(self, handler: Any) -> float:
+        """
+        Return the call delay of a handler.
+        """
+        if self._call_delays:
+            delay = _setting(self._call_delays, handler)
+            if delay is not None:
+                return delay
+        return self._call_delay
+
+    def _latency_delay(self, scpi_string: str, handler: Any, response: Any) -> float:
+        """
+        Return the delay of the latency profile of a message.
+        """
+        if self._latency is None and not self._latencies and not self._latency_families:
+            return 0.0
+
+        latency = _setting(self._latencies, handler)
+        if latency is None:
+            for pattern, family_latency in self._latency_families:
+                if pattern.match(scpi_string):
+                    latency = family_latency
+                    break
+            else:
+                latency = self._latency
+        if latency is None:
+            return 0.0
+        return latency.delay(scpi_string, response_size(response))
+
+    def _wait(self, delay: float, deadline: Optional[float]) -> None:
+        """
+        Sleep on the clock of the mocker.
+
+        Raises:
+            TimeoutError: If the clock would pass the deadline. The clock
+                is slept until the deadline, such that a timeout takes as
+                long as on a real instrument (and no time under a virtual
+                clock).
+        """
+        if deadline is not None and self.clock.time() + delay > deadline:
+            self.clock.sleep(max(deadline - self.clock.time(), 0.0))
+            raise TimeoutError(f"The delay of {delay} seconds exceeds the timeout")
+        if delay:
+            self.clock.sleep(delay)
+
+    def response_cache_info(self) -> ResponseCacheInfo:
+        """
+        Return the hits, misses and size of the cache of responses of the
+        handlers declared with 'cache=True'.
+        """
+        return self._response_cache.info()
+
+    def clear_response_cache(self) -> None:
+        self._response_cache.clear()
+
+    @staticmethod
+    def map_dataset(
+            path: str,
+            datatype: Optional[str] = None,
+            shape: Optional[Tuple[int, ...]] = None,
+            offset: int = 0
+    ) -> Dataset:
+        """
+        Map a capture stored in a ".npy" or raw file into memory, to serve
+        (slices of) it as binary blocks without loading the file. See
+        'scpi_dataset', and datasets.py for the arguments.
+        """
+        return Dataset(path, datatype, shape, offset)
+
+    @classmethod
+    def enable_dispatch_cache(cls, maxsize: int = 1024) -> None:
+        """
+        Cache the resolved handler and arguments of the most recently send
+        messages. Unknown messages are cached as well. The cache is shared
+        by all instances of this mocker class.
+
+        Args:
+            maxsize: The maximum number of cached messages. The least
+                recently used message is evicted when the cache is full.
+        """
+        # A staticmethod, such that instances do not bind to the cache
+        cls.__dispatch_cache__ = staticmethod(lru_cache(maxsize=maxsize)(cls._resolve))
+
+    @classmethod
+    def disable_dispatch_cache(cls) -> None:
+        cls.__dispatch_cache__ = None
+
+    @classmethod
+    def clear_dispatch_cache(cls) -> None:
+        """
+        Invalidate the cached resolutions, e.g. after a handler has changed.
+        """
+        if cls.__dispatch_cache__ is not None:
+            cls.__dispatch_cache__.cache_clear()
+
+    @classmethod
+    def dispatch_cache_info(cls) -> Any:
+        """
+        Return the hits, misses, maxsize and currsize of the dispatch cache
+        as a named tuple, or None if the cache is disabled.
+        """
+        if cls.__dispatch_cache__ is None:
+            return None
+        return cls.__dispatch_cache__.cache_info()
+
+    @classmethod
+    def ambiguous_patterns(cls) -> List[Tuple[str, str]]:
+        """
+        Return the pairs of regular expressions in the `__scpi_dict__` which
+        can match the same message. This analysis is done once, when the
+        mocker class is defined.
+        """
+        return cls.__scpi_trie__.overlapping()
 
     @classmethod
     def scpi_raw_regex(cls, re_string: str) -> Callable:
@@ -243,12 +785,23 @@ class BaseMocker(metaclass=MockerMetaClass):
 
             if isinstance(return_type, MockerMetaClass):
                 raise MockingError('Submodule not supported by for exact match commands.')
-            __tmp_scpi_dict__[re_string] = handler
-            return
+            _add_handler(function, re_string, handler)
+            return function
         return decorator
 
     @classmethod
-    def scpi(cls, scpi_string: str) -> Callable:
+    def scpi(
+            cls,
+            scpi_string: str,
+            lazy: bool = False,
+            cache_submodule: bool = False,
+            cache: bool = False,
+            state: Union[str, Sequence[str], None] = None,
+            writes: Union[str, Sequence[str], None] = None,
+            datatype: Optional[str] = None,
+            is_big_endian: bool = False,
+            fmt: Optional[Format] = None
+    ) -> Callable:
         """
         Decorator to add the decorated method as a SCPI handler.
 
@@ -261,16 +814,55 @@ class BaseMocker(metaclass=MockerMetaClass):
                 Please see the doc string of
                 'compile_regular_expression' also defined in this
                 module.
+            lazy: Only used when the method returns a submodule. By
+                default, the patterns of the submodule are combined
+                with the scpi string and added to this mocker class.
+                When True, the scpi string only matches the start of a
+                message and the remainder is dispatched by the
+                submodule class, which keeps deep trees of submodules
+                cheap to define.
+            cache_submodule: Only used when the method returns a
+                submodule. When True, the method is called once per
+                mocker instance and set of arguments, e.g. once per
+                channel number, and the returned submodule is reused.
+            cache: Cache the response per mocker instance and message.
+                The call delay still applies to cached responses.
+            state: One or more state keys the response depends on. The
+                cached response is dropped when a handler which writes
+                one of these keys is called. Without state keys, the
+                response is cached until 'clear_response_cache' is
+                called.
+            writes: One or more state keys changed by this handler.
+            datatype: When the method returns a numpy array, it is send
+                as an IEEE 488.2 block of values of this type, e.g. "f"
+                (as in pyvisa's 'query_binary_values'). Defaults to the
+                type of the array. When given, the data of a binary
+                block parameter ("<data:block>") is passed as a numpy
+                array of this type as well, instead of a memoryview.
+            is_big_endian: The byte order of a returned numpy array or
+                of the values in a binary block parameter.
+            fmt: Format the response as text: a format specification
+                for numbers, e.g. ".6E", or a function which formats a
+                single value. Lists, tuples and numpy arrays are formatted
+                value by value and joined with commas. See formatters.py.
         """
         def decorator(function):
             handler = SCPIHandler.from_method(function)
             return_type = handler.return_type
+            handler.cache = cache
+            handler.states = _state_keys(state)
+            handler.writes = _state_keys(writes)
+            handler.datatype = datatype
+            handler.is_big_endian = is_big_endian
+            handler.blocks = tuple(grammar.block_parameters(scpi_string))
+            handler.formatter = None if fmt is None else Formatter(fmt)
 
             regex = compile_regular_expression(scpi_string)
 
             if not isinstance(return_type, MockerMetaClass):
-                __tmp_scpi_dict__[regex] = handler
-                return
+                handler.scpi_string = scpi_string
+                _add_handler(function, regex, handler)
+                return function
 
             # The function being decorated itself returns a Mocker. This is very
             # useful as it allows mockers to be modular. Further processing of the
@@ -279,55 +871,363 @@ class BaseMocker(metaclass=MockerMetaClass):
             # and specifically study the class 'Mocker3'
 
             SubModule = cast(MockerMetaClass, return_type)
+            handler.cache_submodule = cache_submodule
+
+            if lazy:
+                handler.scpi_string = scpi_string
+                handler.submodule = SubModule
+                if cache_submodule:
+                    handler.plan = handler.stages()
+                _add_handler(function, '(?i)' + grammar.to_header_regex(scpi_string), handler)
+                return function
+
+            # The header is followed by the patterns of the submodule, so it
+            # is not anchored to the end of a message
+            header_regex = '(?i)' + grammar.to_regex(scpi_string, anchored=False)
 
             for regex_sub_string, sub_handler in SubModule.__scpi_dict__.items():
 
                 if regex_sub_string.startswith('(?i)'):
                     regex_sub_string = regex_sub_string.replace('(?i)', '', 1)
 
-                __tmp_scpi_dict__[regex + regex_sub_string] = SCPIHandler.combine(
-                    handler, sub_handler
-                )
+                combined_handler = SCPIHandler.combine(handler, sub_handler)
+                if sub_handler.scpi_string is not None:
+                    combined_handler.scpi_string = scpi_string + sub_handler.scpi_string
+                    if sub_handler.submodule is not None:
+                        # A lazy submodule of the submodule
+                        combined_regex = '(?i)' + grammar.to_header_regex(
+                            combined_handler.scpi_string
+                        )
+                    else:
+                        combined_regex = compile_regular_expression(
+                            combined_handler.scpi_string
+                        )
+                else:
+                    combined_regex = header_regex + regex_sub_string
+
+                _add_handler(function, combined_regex, combined_handler)
+
+            return function
 
         return decorator
 
-    def send(self, scpi_string: str) -> Any:
-
-        found = False
-        args = ()
-        kwargs = {}
-        handler = None
-
-        for regex_pattern in self.__scpi_dict__:
-            search_result = re.match(regex_pattern, scpi_string)
-            if search_result:
-                if not found:
-                    found = True
-                    handler = self.__scpi_dict__[regex_pattern]
-                    kwargs = search_result.groupdict()
-                    if not kwargs:
-                        args = search_result.groups()
-                else:
-                    raise MockingError(
-                        f"SCPI command {scpi_string} matches multiple mocker "
-                        f"class entries"
-                    )
+    @classmethod
+    def scpi_dataset(
+            cls,
+            query: str,
+            attribute: str,
+            start: Optional[str] = ":DATa:STARt",
+            stop: Optional[str] = ":DATa:STOP",
+            datatype: Optional[str] = None,
+            is_big_endian: bool = False
+    ) -> Callable:
+        """
+        Serve the records of a dataset (see 'map_dataset') selected with a
+        start and a stop command, as on an oscilloscope. Returns a function
+        to assign in the class body, which carries the handlers:
+
+            class Scope(BaseMocker):
+                def __init__(self, path):
+                    super().__init__()
+                    self._curve = self.map_dataset(path)
+
+                _get_curve = scpi_dataset(":CURVe?", "_curve", datatype="h")
 
-        if not found:
-            raise ValueError(f"Unknown SCPI command {scpi_string}")
+        The query returns the selected records, see 'Dataset.select', as a
+        view of the mapping. They are send as a binary block straight from
+        the file.
 
-        if handler.call_delay is not None:
-            time.sleep(handler.call_delay)
+        Args:
+            query: The scpi string of the query.
+            attribute: The name of the instance attribute holding the
+                dataset.
+            start: The scpi string of the header selecting the first
+                record, e.g. ":DATa:STARt 101". A query (":DATa:STARt?") is
+                added as well. If None, the selection starts at the first
+                record. The scpi strings of a dataset may not be registered
+                already, e.g. by another dataset: give each dataset its own
+                start and stop.
+            stop: As 'start', for the last record. If None, the selection
+                stops at the last record.
+            datatype: The type of the values in the binary block. Defaults
+                to the type of the dataset.
+            is_big_endian: The byte order of the values in the binary block.
+        """
+        def selection(self) -> List[Optional[int]]:
+            return self._selections.setdefault(attribute, [1, None])
+
+        def get_records(self) -> Any:
+            first, last = selection(self)
+            return getattr(self, attribute).select(first, last)
+
+        def set_start(self, value: int) -> None:
+            selection(self)[0] = value
+
+        def get_start(self) -> int:
+            return selection(self)[0]
+
+        def set_stop(self, value: int) -> None:
+            selection(self)[1] = value
+
+        def get_stop(self) -> int:
+            last = selection(self)[1]
+            return len(getattr(self, attribute)) if last is None else last
+
+        functions = [
+            cls.scpi(query, datatype=datatype, is_big_endian=is_big_endian)(get_records)
+        ]
+        if start is not None:
+            functions.append(cls.scpi(start + " <value:int>")(set_start))
+            functions.append(cls.scpi(start + "?")(get_start))
+        if stop is not None:
+            functions.append(cls.scpi(stop + " <value:int>")(set_stop))
+            functions.append(cls.scpi(stop + "?")(get_stop))
+
+        # The namespace of the class collects the handlers of one function
+        for function in functions[1:]:
+            get_records.__scpi_handlers__.update(function.__scpi_handlers__)
+        get_records.__scpi_dataset__ = True
+        return get_records
+
+    @classmethod
+    def _lookup(
+            cls,
+            scpi_string: str,
+            check_ambiguity: bool = False
+    ) -> Optional[Tuple[Any, tuple, dict]]:
+        """
+        Resolve a message, using the dispatch cache if it is enabled.
+        """
+        if cls.__dispatch_cache__ is None or check_ambiguity:
+            return cls._resolve(scpi_string, check_ambiguity)
+        return cls.__dispatch_cache__(scpi_string)
+
+    @classmethod
+    def _resolve(
+            cls,
+            scpi_string: str,
+            check_ambiguity: bool = False
+    ) -> Optional[Tuple[Any, tuple, dict]]:
+        """
+        Find the handler of a message and the arguments to call it with.
+        Returns None for unknown messages.
+        """
+        if check_ambiguity:
+            matches = list(cls.__scpi_trie__.iter_matches(scpi_string))
+            if len(matches) > 1:
+                raise MockingError(
+                    f"SCPI command {scpi_string} matches multiple mocker "
+                    f"class entries"
+                )
+            match = matches[0] if matches else None
         else:
-            time.sleep(self._call_delay)
+            match = cls.__scpi_trie__.match(scpi_string)
 
-        resp = handler(self, *args, **kwargs)
-        if isinstance(resp, (bytes, bytearray)):
-            # Return binary data as-is
-            return resp
+        if match is None:
+            return None
+
+        if match.conflicts:
+            raise MockingError(
+                f"SCPI command {scpi_string} matches multiple mocker "
+                f"class entries"
+            )
+
+        if match.rest is None:
+            return match.handler, match.args, match.kwargs
+
+        # The remainder of the message is handled by a submodule
+        sub_resolved = match.handler.submodule._lookup(match.rest, check_ambiguity)
+        if sub_resolved is None:
+            return None
+
+        sub_handler, args, kwargs = sub_resolved
+        handler = SubmoduleHandler(match.handler, match.args, match.kwargs, sub_handler)
+        return handler, args, kwargs
+
+    def send(
+            self,
+            scpi_string: Union[str, Message],
+            defer: bool = False,
+            timeout: Optional[float] = None
+    ) -> Any:
+        """
+        Handle a message and return the response. A compound message,
+        e.g. ":VOLT 1;:CURR 0.1;*OPC?", is handled as a batch of commands
+        (see 'send_many'), and the responses of its queries are joined with
+        ';'. See compound.py.
+
+        Args:
+            scpi_string: The message. Messages send as bytes (e.g. with
+                pyvisa's 'write_raw' or 'write_binary_values') are decoded
+                as utf-8, except for the binary blocks they contain, which
+                are passed to the '<name:block>' parameters without
+                copying.
+            defer: Return a 'DeferredResponse' for a query, which calls
+                the handler when it is called itself. See 'defer_queries'.
+            timeout: The time in seconds the call delay and latency may
+                take, unlimited if None.
+
+        Raises:
+            TimeoutError: If the delays exceed the timeout. The handler is
+                not called if the call delay exceeds the timeout.
+        """
+        deadline = None if timeout is None else self.clock.time() + timeout
+        text, blocks = self._split_message(scpi_string)
+        if ";" in text and len(split_compound(text, blocks)) != 1:
+            # A compound message, see compound.py. A ';' in a string does
+            # not separate commands.
+            return self._send_batch([(text, blocks)], deadline)[0]
+
+        resolved = self._lookup(text, self.check_ambiguity)
+        if resolved is None:
+            raise ValueError(f"Unknown SCPI command {text}")
+
+        handler = resolved[0]
+        self._wait(self._delay(handler), deadline)
+
+        if defer and not blocks and not handler.writes and is_query(text):
+            response = DeferredResponse(partial(self._respond, text, blocks, resolved))
         else:
-            # Cast to string for all others
-            return str(resp)
+            response = self._respond(text, blocks, resolved)
+
+        self._wait(self._latency_delay(text, handler, response), deadline)
+        return response
+
+    def send_many(self, scpi_strings: Iterable[Union[str, Message]]) -> List[Any]:
+        """
+        Handle a batch of messages and return the responses, as if each
+        message were send in turn. All messages are resolved before any
+        handler is called, and repeated messages are resolved once. The
+        call delays and latencies of the messages are applied as a single
+        sleep, after the handlers are called.
+
+        Raises:
+            ValueError: If a message is unknown. No handler is called.
+        """
+        return self._send_batch([
+            self._split_message(scpi_string) for scpi_string in scpi_strings
+        ])
+
+    def _send_batch(
+            self,
+            messages: List[Tuple[str, List[memoryview]]],
+            deadline: Optional[float] = None
+    ) -> List[Any]:
+        """
+        Handle messages, given as (text, blocks) pairs. Compound messages
+        are split into their commands, which are all resolved in one pass.
+        """
+        resolutions: Dict[str, Any] = {}
+        batch = []
+        delay = 0.0
+        for text, blocks in messages:
+            if ";" in text:
+                commands = split_compound(text, blocks)
+            else:
+                commands = [(text, blocks)]
+            if not commands:
+                raise ValueError(f"Unknown SCPI command {text}")
+
+            resolved_commands = []
+            for command, command_blocks in commands:
+                resolved = resolutions.get(command)
+                if resolved is None:
+                    resolved = self._lookup(command, self.check_ambiguity)
+                    if resolved is None:
+                        raise ValueError(f"Unknown SCPI command {command}")
+                    resolutions[command] = resolved
+
+                delay += self._delay(resolved[0])
+                resolved_commands.append((command, command_blocks, resolved))
+
+            batch.append(resolved_commands)
+
+        if deadline is not None and self.clock.time() + delay > deadline:
+            # As for a single command, no handler is called if the call
+            # delays exceed the timeout
+            self._wait(delay, deadline)
+
+        responses = []
+        for resolved_commands in batch:
+            command_responses = []
+            for command, command_blocks, resolved in resolved_commands:
+                response = self._respond(command, command_blocks, resolved)
+                delay += self._latency_delay(command, resolved[0], response)
+                command_responses.append(response)
+
+            if len(command_responses) == 1:
+                responses.append(command_responses[0])
+            else:
+                responses.append(join_responses(
+                    [command for command, _, _ in resolved_commands], command_responses
+                ))
+
+        self._wait(delay, deadline)
+        return responses
+
+    def _split_message(
+            self,
+            scpi_string: Union[str, Message]
+    ) -> Tuple[str, List[memoryview]]:
+        """
+        Return the text of a message to match and its binary blocks.
+        """
+        if self.__scpi_blocks__:
+            if isinstance(scpi_string, str):
+                scpi_string = scpi_string.encode("utf-8")
+            return split_blocks(scpi_string)
+        if not isinstance(scpi_string, str):
+            return bytes(scpi_string).decode("utf-8").rstrip("\r\n"), []
+        return scpi_string, []
+
+    def _respond(
+            self,
+            scpi_string: str,
+            blocks: List[memoryview],
+            resolved: Tuple[Any, tuple, dict]
+    ) -> Any:
+        """
+        Call the handler of a resolved message and return the response.
+        """
+        handler, args, kwargs = resolved
+
+        if blocks:
+            if len(blocks) != len(handler.blocks):
+                raise ValueError(f"Unexpected binary block in SCPI command {scpi_string}")
+            if handler.datatype is not None:
+                blocks = [
+                    block_array(block, handler.datatype, handler.is_big_endian)
+                    for block in blocks
+                ]
+            kwargs = {**kwargs, **dict(zip(handler.blocks, blocks))}
+
+        # The text of a message with blocks does not identify the response
+        cache = handler.cache and not blocks
+        if cache:
+            cached = self._response_cache.get(scpi_string)
+            if cached is not None:
+                return cached
+
+        resp = handler(self, *args, **kwargs)
+        if handler.formatter is not None and not isinstance(
+                resp, (bytes, bytearray, StreamResponse, Iterator)
+        ):
+            resp = handler.formatter(resp)
+        elif is_array(resp):
+            resp = array_response(resp, handler.datatype, handler.is_big_endian)
+        elif isinstance(resp, Iterator):
+            # A generator of chunks, which are produced while reading
+            resp = StreamResponse(resp)
+        elif not isinstance(resp, (bytes, bytearray, StreamResponse)):
+            # Cast to string for all others. Binary data is returned as-is
+            resp = str(resp)
+
+        if handler.writes:
+            self._response_cache.invalidate(handler.writes)
+        if cache and not isinstance(resp, StreamResponse):
+            self._response_cache.put(scpi_string, handler.states, resp)
+
+        return resp
 
     """
     Event Support:
@@ -405,8 +1305,17 @@ class BaseMocker(metaclass=MockerMetaClass):
         return StbRegister()
 
 
+def _state_keys(keys: Union[str, Sequence[str], None]) -> Tuple[str, ...]:
+    if keys is None:
+        return ()
+    if isinstance(keys, str):
+        return (keys,)
+    return tuple(keys)
+
+
 scpi = BaseMocker.scpi
 scpi_raw_regex = BaseMocker.scpi_raw_regex
+scpi_dataset = BaseMocker.scpi_dataset
 
 
 def compile_regular_expression(scpi_string: str) -> str:
@@ -426,6 +1335,27 @@ def compile_regular_expression(scpi_string: str) -> str:
     4) SCPI strings containing "?" and "*" will be replaced with "\?" and "\*"
     in the regular expression
 
+    5) A parameter can be given a type, e.g. "<channel:int>", "<value:float>",
+    "<state:bool>" or "<name:str>". Typed parameters only match values of
+    that type, instead of anything, and a scpi string with typed parameters
+    only matches up to the end of a message: trailing text makes the
+    message unknown. A parameter can also be one of a set of
+    alternatives, e.g. "<mode:{ON|OFF|AUTO}>". A list of comma or
+    whitespace separated numbers, e.g. "<values:list[float]>", is passed
+    to the handler as a read-only numpy array.
+
+    6) As in instrument manuals, square brackets denote an optional part,
+    e.g. "[:SOURce]:VOLTage?", and braces with vertical bars denote
+    alternatives, e.g. ":TRIGger:SOURce {BUS|IMMediate}".
+
+    7) A keyword can have a numeric suffix in a given range, e.g.
+    "CHANnel{1:64}" or "CHANnel<ch:{1:64}>". The suffix is passed to the
+    handler as an integer named after the keyword ("channel") or the given
+    name ("ch"). Messages with a suffix outside of the range are unknown.
+
+    8) A parameter of type "block", e.g. ":DATA <data:block>", receives an
+    IEEE 488.2 binary block as a memoryview of its data (see blocks.py).
+
     Examples:
         >>> scpi_pattern = "VOLTage:CHANnel<number> <value>"  # From an instrument manual
         >>> # the upper case part denotes the command short form
@@ -436,6 +1366,10 @@ def compile_regular_expression(scpi_string: str) -> str:
         >>> assert re.match(regex, "volt:chan1 2.3").groupdict() == {'number':'1', 'value': '2.3'}
         >>> # We should be able to mix and match:
         >>> assert re.match(regex, "voltage:chan1 2.3").groupdict() == {'number':'1', 'value': '2.3'}
+        >>> # Typed parameters and optional parts:
+        >>> regex = compile_regular_expression("[:SOURce]:CHANnel<number:int>:MODE <mode:{ON|OFF}>")
+        >>> assert re.match(regex, ":chan12:mode off").groupdict() == {'number': '12', 'mode': 'off'}
+        >>> assert re.match(regex, ":chan1.5:mode off") is None
 
     Args:
         scpi_string: A string representing a pattern with which SCPI commands send by
@@ -454,16 +1388,10 @@ def compile_regular_expression(scpi_string: str) -> str:
         https://docs.python.org/3/howto/regex.html#non-capturing-and-named-groups
 
         Section "Non-capturing and Named Groups"
-    """
-    regex = re.sub(r"\?", r"\\?", scpi_string)
-    regex = re.sub(r"\*", r"\\*", regex)
-    regex = re.sub(r"<(?P<name>.*?)>", r"(?P<\g<name>>.*)", regex)
 
-    regex = re.sub(
-        "(?P<chr>[A-Z])(?P<name>[a-z]+)", r"\g<chr>(?:\g<name>)?",
-        regex
-    )
+        The parsing of the scpi string is implemented in grammar.py.
+    """
     # Add inline case insensitive flag to regex
-    regex = '(?i)' + regex
+    regex = '(?i)' + grammar.to_regex(scpi_string)
 
     return regex
@@ -0,0 +1,96 @@
+"""
+IEEE 488.2 binary blocks in messages send to a mocker, e.g. a waveform
+uploaded with pyvisa's 'write_binary_values'. A block is either definite
+length ("#<digits><length><data>") or indefinite length ("#0<data>",
+ending with the message).
+
+Blocks are cut out of the message without copying their data; the rest
+of the message is decoded and matched as text, with each block replaced
+by the marker "#0". See the "block" parameter type in grammar.py.
+"""
+import re
+from typing import Any, List, Tuple, Union
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional
+    np = None
+
+# The text which replaces a block in a message
+BLOCK_MARKER = "#0"
+
+# The start of a block, or a string which is skipped: "#3abc" is text
+_BLOCK_START = re.compile(rb"#(\d)|\"[^\"]*(?:\"|\Z)|'[^']*(?:'|\Z)")
+_TERMINATION = b"\r\n"
+
+Message = Union[bytes, bytearray, memoryview]
+
+
+def split_blocks(message: Message, encoding: str = "utf-8") -> Tuple[str, List[memoryview]]:
+    """
+    Split a message in the text to match and the data of its blocks.
+
+    Examples:
+        >>> text, blocks = split_blocks(b":DATA #15hello,#0abc\\n")
+        >>> text, [bytes(block) for block in blocks]
+        (':DATA #0,#0', [b'hello', b'abc'])
+    """
+    view = memoryview(message).cast("B")
+    text = []
+    blocks = []
+    pos = 0
+    scan = 0
+
+    while True:
+        match = _BLOCK_START.search(view, scan)
+        if match is None:
+            break
+        scan = match.end()
+        if match.group(1) is None:
+            continue
+
+        start = match.start()
+        text.append(bytes(view[pos:start]))
+        text.append(BLOCK_MARKER.encode("ascii"))
+
+        digits = int(match.group(1))
+        if digits == 0:
+            # An indefinite length block ends with the message
+            end = len(view)
+            while end > start + 2 and view[end - 1] in _TERMINATION:
+                end -= 1
+            blocks.append(view[start + 2:end])
+            pos = len(view)
+            break
+
+        data_start = start + 2 + digits
+        length_digits = bytes(view[start + 2:data_start])
+        if len(length_digits) != digits or not length_digits.isdigit():
+            raise ValueError(f"Invalid block header in message {bytes(view[:data_start])!r}")
+
+        data_end = data_start + int(length_digits)
+        if data_end > len(view):
+            raise ValueError("The message ends before the end of a block")
+
+        blocks.append(view[data_start:data_end])
+        pos = scan = data_end
+
+    text.append(bytes(view[pos:]))
+    return b"".join(text).decode(encoding).rstrip("\r\n"), blocks
+
+
+def block_array(block: memoryview, datatype: str, is_big_endian: bool = False) -> Any:
+    """
+    Return a numpy view of the values in a block.
+
+    Args:
+        block: The data of the block.
+        datatype: The type of the values, as a numpy dtype or a struct
+            format character (e.g. "f" or "h").
+        is_big_endian: The byte order of the values.
+    """
+    if np is None:
+        raise ImportError("Decoding the values of binary blocks requires numpy")
+
+    dtype = np.dtype(datatype).newbyteorder(">" if is_big_endian else "<")
+    return np.frombuffer(block, dtype=dtype)
@@ -0,0 +1,92 @@
+"""
+A model of the link shared by the devices on a board, e.g. a GPIB board or
+a USB hub. Register a bus for the board number of the resource names:
+
+    register_bus("1", Bus(bytes_per_second=1e6, overhead=0.001))
+    register_resource("MOCK1::dmm::INSTR", Dmm())
+    register_resource("MOCK1::source::INSTR", Source())
+
+Every write and read of a session on the board is a transaction on the
+bus. Transactions are serialized: while one transfers, the sessions of the
+other devices on the board wait. The transfer rate is limited with a token
+bucket, which allows bursts of up to 'burst' bytes after the bus was idle.
+"""
+import threading
+from typing import NamedTuple, Optional
+
+from pyvisa_mock.base.clock import Clock, RealClock
+
+
+class BusInfo(NamedTuple):
+    transactions: int
+    bytes: int
+    # The time spent transferring, in seconds of the clock of the bus
+    busy: float
+
+
+class Bus:
+    """
+    Args:
+        bytes_per_second: The transfer rate, unlimited if None.
+        overhead: The time each transaction takes, in seconds.
+        burst: The number of bytes which can be transferred without
+            delay after the bus was idle.
+        clock: The clock to wait on, see clock.py.
+    """
+    def __init__(
+            self,
+            bytes_per_second: Optional[float] = None,
+            overhead: float = 0.0,
+            burst: float = 0.0,
+            clock: Optional[Clock] = None
+    ) -> None:
+        self.bytes_per_second = bytes_per_second
+        self.overhead = overhead
+        self.burst = burst
+        self.clock = RealClock() if clock is None else clock
+        self._tokens = burst
+        self._updated = self.clock.time()
+        self._lock = threading.Lock()
+        self._transactions = 0
+        self._bytes = 0
+        self._busy = 0.0
+
+    def transfer(self, size: int, timeout: Optional[float] = None) -> None:
+        """
+        Transfer a number of bytes. Waits until the bus is free and the
+        bytes have been transferred.
+
+        Raises:
+            TimeoutError: If the transfer would take longer than 'timeout'
+                seconds, after waiting for the timeout.
+        """
+        with self._lock:
+            delay = self.overhead
+            if self.bytes_per_second is not None:
+                now = self.clock.time()
+                self._tokens = min(
+                    self.burst,
+                    self._tokens + (now - self._updated) * self.bytes_per_second
+                )
+                self._tokens -= size
+                if self._tokens < 0:
+                    delay += -self._tokens / self.bytes_per_second
+                    self._tokens = 0.0
+
+            if timeout is not None and delay > timeout:
+                # The bytes which did not make it are not accounted for
+                self.clock.sleep(timeout)
+                self._updated = self.clock.time()
+                self._busy += timeout
+                raise TimeoutError(f"Transferring {size} bytes exceeds the timeout")
+
+            if delay:
+                self.clock.sleep(delay)
+            self._updated = self.clock.time()
+
+            self._transactions += 1
+            self._bytes += size
+            self._busy += delay
+
+    def info(self) -> BusInfo:
+        return BusInfo(self._transactions, self._bytes, self._busy)
@@ -0,0 +1,195 @@
+"""
+Clocks which mockers and sessions use for call delays, background
+simulations and waiting for events. A mocker uses real time by default:
+
+    mocker = Mocker(clock=VirtualClock())
+    mocker.send(":MEAS?")  # A call delay of 2 seconds returns immediately
+    mocker.clock.time()    # 2.0
+
+A 'ScaledClock' runs faster (or slower) than real time. A 'VirtualClock' does
+not wait at all: sleeping advances the simulated time, and actions scheduled
+with 'call_at' or 'call_later' run in order of their simulated time as the
+clock passes them (discrete-event simulation).
+"""
+import heapq
+import itertools
+import threading
+import time
+from queue import Queue, Empty
+from typing import Any, Callable, List, Optional, Tuple
+
+
+class Timer:
+    """
+    An action scheduled on a clock.
+    """
+    def cancel(self) -> None:
+        raise NotImplementedError()
+
+
+class Clock:
+    def time(self) -> float:
+        """
+        Return the time in seconds.
+        """
+        raise NotImplementedError()
+
+    def sleep(self, seconds: float) -> None:
+        raise NotImplementedError()
+
+    def call_at(self, when: float, action: Callable, *args: Any) -> Timer:
+        """
+        Call an action with the given arguments at a time of this clock, in
+        the background.
+        """
+        raise NotImplementedError()
+
+    def call_later(self, delay: float, action: Callable, *args: Any) -> Timer:
+        return self.call_at(self.time() + delay, action, *args)
+
+    def get(self, queue: Queue, timeout: Optional[float]) -> Any:
+        """
+        Remove and return an item from a queue, waiting for at most
+        'timeout' seconds of this clock (forever if None).
+
+        Raises:
+            Empty: If no item was put in the queue in time.
+        """
+        raise NotImplementedError()
+
+
+class _ThreadTimer(Timer):
+    def __init__(self, delay: float, action: Callable, args: Tuple) -> None:
+        self._timer = threading.Timer(max(delay, 0.0), action, args)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def cancel(self) -> None:
+        self._timer.cancel()
+
+
+class RealClock(Clock):
+    def time(self) -> float:
+        return time.time()
+
+    def sleep(self, seconds: float) -> None:
+        time.sleep(seconds)
+
+    def call_at(self, when: float, action: Callable, *args: Any) -> Timer:
+        return _ThreadTimer(when - self.time(), action, args)
+
+    def get(self, queue: Queue, timeout: Optional[float]) -> Any:
+        return queue.get(timeout=timeout)
+
+
+class ScaledClock(RealClock):
+    """
+    A clock which runs 'factor' times faster than real time.
+    """
+    def __init__(self, factor: float) -> None:
+        if factor <= 0:
+            raise ValueError("The factor of a clock needs to be positive")
+        self.factor = factor
+        self._start = time.time()
+
+    def time(self) -> float:
+        return self._start + (time.time() - self._start) * self.factor
+
+    def sleep(self, seconds: float) -> None:
+        time.sleep(seconds / self.factor)
+
+    def call_at(self, when: float, action: Callable, *args: Any) -> Timer:
+        return _ThreadTimer((when - self.time()) / self.factor, action, args)
+
+    def get(self, queue: Queue, timeout: Optional[float]) -> Any:
+        return queue.get(timeout=None if timeout is None else timeout / self.factor)
+
+
+class _VirtualTimer(Timer):
+    __slots__ = ("action", "args", "cancelled")
+
+    def __init__(self, action: Callable, args: Tuple) -> None:
+        self.action = action
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self) -> None:
+        self.cancelled = True
+
+
+class VirtualClock(Clock):
+    """
+    A simulated clock, which only advances when it is slept on or
+    advanced explicitly.
+
+    Args:
+        start: The initial time in seconds.
+    """
+    def __init__(self, start: float = 0.0) -> None:
+        self._now = start
+        self._timers: List[Tuple[float, int, _VirtualTimer]] = []
+        # Orders timers scheduled at the same time
+        self._counter = itertools.count()
+        self._lock = threading.RLock()
+
+    def time(self) -> float:
+        return self._now
+
+    def sleep(self, seconds: float) -> None:
+        self.advance(seconds)
+
+    def advance(self, seconds: float) -> None:
+        """
+        Advance the time, running the actions which are due on the way.
+        """
+        self.run_until(self._now + seconds)
+
+    def run_until(self, when: float) -> None:
+        while self._run_next(when):
+            pass
+        with self._lock:
+            self._now = max(self._now, when)
+
+    def _run_next(self, deadline: float) -> bool:
+        """
+        Run the next action due before the deadline. Returns False if
+        there is none.
+        """
+        with self._lock:
+            if not self._timers or self._timers[0][0] > deadline:
+                return False
+            when, _, timer = heapq.heappop(self._timers)
+            self._now = max(self._now, when)
+
+        # Run without the lock, the action may schedule another one
+        if not timer.cancelled:
+            timer.action(*timer.args)
+        return True
+
+    def call_at(self, when: float, action: Callable, *args: Any) -> Timer:
+        timer = _VirtualTimer(action, args)
+        with self._lock:
+            heapq.heappush(self._timers, (when, next(self._counter), timer))
+        return timer
+
+    def get(self, queue: Queue, timeout: Optional[float]) -> Any:
+        """
+        As 'Clock.get', advancing the time until an item is put in the
+        queue by a scheduled action. If nothing is scheduled and the
+        timeout is None, wait (in real time) for another thread.
+        """
+        deadline = float("inf") if timeout is None else self._now + timeout
+        while True:
+            try:
+                return queue.get_nowait()
+            except Empty:
+                pass
+
+            if not self._run_next(deadline):
+                break
+
+        if timeout is None:
+            return queue.get()
+
+        self.run_until(deadline)
+        return queue.get_nowait()
@@ -0,0 +1,109 @@
+"""
+Compound program messages: several commands separated by ';', e.g.
+":VOLT 1;:CURR 0.1;*OPC?". As defined by SCPI, a header without a leading
+':' is relative to the path of the previous command, which is its header
+without the last keyword. Common commands ("*OPC?") do not change the path:
+
+    >>> [command for command, _ in split_compound(":SOUR:VOLT 1;CURR 0.1;*OPC?")]
+    [':SOUR:VOLT 1', ':SOUR:CURR 0.1', '*OPC?']
+
+The responses of the queries in a compound message are joined with ';'.
+"""
+import re
+from typing import Any, Iterator, List, Sequence, Tuple
+
+from pyvisa_mock.base.blocks import BLOCK_MARKER
+from pyvisa_mock.base.responses import Chunk, StreamResponse
+
+# A string in a command, which may contain the text of a block marker
+_QUOTED = re.compile(r"\"[^\"]*(?:\"|$)|'[^']*(?:'|$)")
+
+
+def _split(text: str) -> List[str]:
+    """
+    Split a message on the ';' characters which are not in a string.
+    """
+    commands = []
+    quote = None
+    start = 0
+    for pos, char in enumerate(text):
+        if quote is not None:
+            if char == quote:
+                quote = None
+        elif char in "\"'":
+            quote = char
+        elif char == ";":
+            commands.append(text[start:pos])
+            start = pos + 1
+
+    commands.append(text[start:])
+    return commands
+
+
+def split_compound(
+        text: str,
+        blocks: Sequence[Any] = ()
+) -> List[Tuple[str, List[Any]]]:
+    """
+    Split a compound message into commands with absolute headers.
+
+    Args:
+        text: The message, with the binary blocks replaced by markers
+            (see 'split_blocks').
+        blocks: The binary blocks of the message.
+
+    Returns:
+        A list of (command, blocks of the command) pairs.
+    """
+    commands = []
+    path = ""
+    remaining = iter(blocks)
+
+    for command in _split(text):
+        command = command.strip()
+        if not command:
+            continue
+
+        if not command.startswith("*"):
+            if not command.startswith(":"):
+                command = path + command
+            header = command.split(maxsplit=1)[0]
+            path = header[:header.rfind(":") + 1]
+
+        count = _QUOTED.sub("", command).count(BLOCK_MARKER) if blocks else 0
+        commands.append((command, [next(remaining) for _ in range(count)]))
+
+    return commands
+
+
+def is_query(command: str) -> bool:
+    return command.split(maxsplit=1)[0].endswith("?")
+
+
+def _chunks(responses: Sequence[Any]) -> Iterator[Chunk]:
+    for number, response in enumerate(responses):
+        if number:
+            yield b";"
+        if isinstance(response, str):
+            yield response.encode("utf-8")
+        elif isinstance(response, StreamResponse):
+            yield from response
+        else:
+            yield response
+
+
+def join_responses(commands: Sequence[str], responses: Sequence[Any]) -> Any:
+    """
+    Join the responses of the queries in a compound message with ';'. If
+    there are no queries, the response of the last command is returned, as
+    for a single command. Binary responses are joined into a stream.
+    """
+    queries = [
+        response for command, response in zip(commands, responses)
+        if is_query(command)
+    ]
+    if not queries:
+        return responses[-1]
+    if all(isinstance(response, str) for response in queries):
+        return ";".join(queries)
+    return StreamResponse(_chunks(queries))
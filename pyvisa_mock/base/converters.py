@@ -0,0 +1,285 @@
+"""
+Converters for the arguments of SCPI handlers. The values in a SCPI
+message are strings; the annotation of a handler argument selects the
+converter which turns the string into the annotated type. Converters are
+looked up once, when the handler is created by the 'scpi' decorator.
+
+The converters of int and float understand the SCPI numeric forms:
+
+    >>> to_float("1.5E+3")
+    1500.0
+    >>> to_float("20 mV")
+    0.02
+    >>> to_int("#H1F")
+    31
+    >>> to_int("MAX")
+    <NumericKeyword.MAXIMUM: 'MAX'>
+
+The converter of bool understands the SCPI boolean forms:
+
+    >>> to_bool("OFF")
+    False
+"""
+import re
+from enum import Enum
+from typing import Any, Callable, Dict
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional
+    np = None
+
+
+class NumericKeyword(Enum):
+    """
+    SCPI keywords which can be send instead of a numeric value. The mocker
+    handler decides what value these stand for.
+    """
+    MINIMUM = "MIN"
+    MAXIMUM = "MAX"
+    DEFAULT = "DEF"
+
+
+_KEYWORDS = {
+    "MIN": NumericKeyword.MINIMUM,
+    "MINIMUM": NumericKeyword.MINIMUM,
+    "MAX": NumericKeyword.MAXIMUM,
+    "MAXIMUM": NumericKeyword.MAXIMUM,
+    "DEF": NumericKeyword.DEFAULT,
+    "DEFAULT": NumericKeyword.DEFAULT,
+}
+
+# The values SCPI defines for these keywords
+_FLOAT_KEYWORDS = {
+    "INF": 9.9E37,
+    "INFINITY": 9.9E37,
+    "NINF": -9.9E37,
+    "NINFINITY": -9.9E37,
+    "NAN": 9.91E37,
+}
+
+# SCPI boolean values
+_BOOLEANS = {"ON": True, "1": True, "OFF": False, "0": False}
+
+# Non-decimal numbers, e.g. "#H1F", "#Q17" and "#B101"
+_BASES = {"#H": 16, "#Q": 8, "#B": 2}
+
+# Suffix multipliers (IEEE 488.2). Note that "M" denotes milli, mega is "MA"
+_MULTIPLIERS = {
+    "EX": 1E18,
+    "PE": 1E15,
+    "T": 1E12,
+    "G": 1E9,
+    "K": 1E3,
+    "M": 1E-3,
+    "U": 1E-6,
+    "N": 1E-9,
+    "P": 1E-12,
+    "F": 1E-15,
+    "A": 1E-18,
+    "MA": 1E6,
+}
+
+_UNITS = {"", "V", "A", "W", "S", "HZ", "OHM", "F", "H", "DB", "DBM", "PCT", "DEG", "RAD"}
+
+# By convention, these denote mega instead of milli
+_MEGA_UNITS = {"MHZ", "MOHM"}
+
+
+
+def _alternation(words) -> str:
+    # The longest words first, such that a word never matches part of another
+    return "|".join(sorted(words, key=lambda word: (-len(word), word)))
+
+
+# Regular expression of the suffixes accepted by '_multiplier', e.g. "MV".
+# Used to match float parameters, see grammar.py
+SUFFIX_REGEX = (
+    f"(?:{_alternation(_MEGA_UNITS)}"
+    f"|(?:{_alternation(_MULTIPLIERS)})?(?:{_alternation(_UNITS)}))"
+)
+
+# An empty value in a list, e.g. "1,,2"
+_EMPTY_VALUE = re.compile(r",\s*,")
+
+_NUMBER_WITH_SUFFIX = re.compile(
+    r"([+-]?(?:\d+\.?\d*|\.\d+)(?:E[+-]?\d+)?)\s*([A-Z]+)"
+)
+
+
+def _multiplier(suffix: str) -> float:
+    """
+    Return the multiplier of a unit suffix, e.g. 1E-3 for "MV". A unit
+    without a multiplier takes precedence, so "A" is ampere, not atto.
+    """
+    if suffix in _UNITS:
+        return 1.0
+    if suffix in _MEGA_UNITS:
+        return 1E6
+
+    for prefix, multiplier in _MULTIPLIERS.items():
+        if suffix.startswith(prefix) and suffix[len(prefix):] in _UNITS:
+            return multiplier
+
+    raise ValueError(f"Unknown suffix '{suffix}'")
+
+
+def _non_decimal(text: str) -> int:
+    return int(text[2:], _BASES[text[:2]])
+
+
+def to_float(value: Any) -> Any:
+    """
+    Convert a SCPI numeric value to a float. MIN, MAX and DEF are returned
+    as a 'NumericKeyword'.
+    """
+    if not isinstance(value, str):
+        return float(value)
+
+    text = value.strip().upper()
+    if text in _KEYWORDS:
+        return _KEYWORDS[text]
+    if text in _FLOAT_KEYWORDS:
+        return _FLOAT_KEYWORDS[text]
+
+    try:
+        return float(text)
+    except ValueError:
+        pass
+
+    if text[:2] in _BASES:
+        return float(_non_decimal(text))
+
+    match = _NUMBER_WITH_SUFFIX.fullmatch(text)
+    if match is None:
+        raise ValueError(f"Invalid numeric value '{value}'")
+
+    number, suffix = match.groups()
+    return float(number) * _multiplier(suffix)
+
+
+def to_int(value: Any) -> Any:
+    """
+    Convert a SCPI numeric value to an int. MIN, MAX and DEF are returned
+    as a 'NumericKeyword'. Values which are not integral are rejected.
+    """
+    if not isinstance(value, str):
+        return int(value)
+
+    try:
+        return int(value)
+    except ValueError:
+        pass
+
+    text = value.strip().upper()
+    if text[:2] in _BASES:
+        return _non_decimal(text)
+
+    number = to_float(text)
+    if isinstance(number, NumericKeyword):
+        return number
+    if not number.is_integer():
+        raise ValueError(f"Invalid integer value '{value}'")
+    return int(number)
+
+
+def to_bool(value: Any) -> bool:
+    """
+    Convert a SCPI boolean value, ON or 1 and OFF or 0, to a bool.
+    """
+    if not isinstance(value, str):
+        return bool(value)
+
+    try:
+        return _BOOLEANS[value.strip().upper()]
+    except KeyError:
+        raise ValueError(f"Invalid boolean value '{value}'") from None
+
+
+def _to_list(text: str, dtype: Any, convert: Callable[[str], Any]) -> Any:
+    stripped = text.strip()
+    if stripped.startswith(",") or stripped.endswith(",") or _EMPTY_VALUE.search(text):
+        raise ValueError(f"Empty value in list '{text}'")
+
+    values = text.replace(",", " ").split()
+    if np is None:
+        return [convert(value) for value in values]
+
+    try:
+        # Parse all values in one pass, this handles plain numbers only
+        array = np.array(values, dtype=dtype)
+    except (ValueError, OverflowError):
+        # Suffixes, non-decimal numbers and keywords
+        converted = [convert(value) for value in values]
+        if any(isinstance(value, NumericKeyword) for value in converted):
+            array = np.array(converted, dtype=object)
+        else:
+            array = np.array(converted, dtype=dtype)
+
+    # The array may be shared by cached resolutions of the message
+    array.flags.writeable = False
+    return array
+
+
+def to_float_list(text: str) -> Any:
+    """
+    Convert a comma or whitespace separated list of SCPI numeric values to
+    a read-only numpy array of floats (a list if numpy is not installed).
+    If the list contains MIN, MAX or DEF, the array has dtype object.
+
+        >>> to_float_list("1, 2.5 3E3")
+        array([1.0e+00, 2.5e+00, 3.0e+03])
+    """
+    return _to_list(text, float, to_float)
+
+
+def to_int_list(text: str) -> Any:
+    """
+    As 'to_float_list', for a list of integers.
+    """
+    return _to_list(text, np.int64 if np is not None else int, to_int)
+
+
+def to_array(value: Any) -> Any:
+    """
+    Convert a binary block to a numpy array of bytes, without copying.
+    Blocks are already converted to the 'datatype' of the handler, if it
+    has one.
+    """
+    if np is None:
+        raise ImportError("Converting binary blocks to arrays requires numpy")
+
+    if isinstance(value, np.ndarray):
+        return value
+    return np.frombuffer(value, dtype=np.uint8)
+
+
+_CONVERTERS: Dict[Any, Callable[[Any], Any]] = {
+    int: to_int,
+    float: to_float,
+    bool: to_bool,
+}
+
+if np is not None:
+    _CONVERTERS[np.ndarray] = to_array
+
+
+def register_converter(annotation: Any, converter: Callable[[Any], Any]) -> None:
+    """
+    Register the converter of the arguments annotated with a type. This
+    only affects handlers created afterwards.
+
+    Args:
+        annotation: The annotation, e.g. a type.
+        converter: Converts the string value in a message. Should raise a
+            ValueError for invalid values.
+    """
+    _CONVERTERS[annotation] = converter
+
+
+def get_converter(annotation: Any) -> Callable[[Any], Any]:
+    """
+    Return the converter for an annotation. Without a registered converter,
+    the annotation itself is called with the value.
+    """
+    return _CONVERTERS.get(annotation, annotation)
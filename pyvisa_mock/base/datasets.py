@@ -0,0 +1,83 @@
+"""
+Captures stored in files, served without loading them into memory. The
+file is memory mapped, so reading a response only touches the pages of
+the requested records, and the pages are shared (through the page cache of
+the OS) by all mockers and processes which map the same file.
+
+    class Scope(BaseMocker):
+        def __init__(self, path):
+            super().__init__()
+            self._curve = self.map_dataset(path)
+
+        _get_curve = scpi_dataset(":CURVe?", "_curve")
+
+The query returns the records selected with ":DATa:STARt" and ":DATa:STOP"
+(see 'scpi_dataset' in base_mocker.py) as a view of the mapping, which is
+send as a binary block straight from the file (see 'array_response').
+"""
+from pathlib import Path
+from typing import Any, Optional, Tuple, Union
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional
+    np = None
+
+
+class Dataset:
+    """
+    A read-only memory mapped array.
+
+    Args:
+        path: A ".npy" file, or a file with raw values.
+        datatype: The type of the values in a raw file, as a numpy dtype or
+            a struct format character (e.g. "f" or "h"). Ignored for
+            ".npy" files, which store their type.
+        shape: The shape of the array in a raw file. Defaults to as many
+            values as the file holds.
+        offset: The number of bytes before the values in a raw file, e.g.
+            to skip a header.
+    """
+    def __init__(
+            self,
+            path: Union[str, Path],
+            datatype: Optional[str] = None,
+            shape: Optional[Tuple[int, ...]] = None,
+            offset: int = 0
+    ) -> None:
+        if np is None:
+            raise ImportError("Datasets require numpy")
+
+        self.path = Path(path)
+        if self.path.suffix == ".npy":
+            self.array = np.load(self.path, mmap_mode="r")
+        else:
+            if datatype is None:
+                raise ValueError(f"The datatype of raw file {self.path} is required")
+            self.array = np.memmap(
+                self.path, dtype=np.dtype(datatype), mode="r",
+                offset=offset, shape=shape
+            )
+
+    def __len__(self) -> int:
+        return len(self.array)
+
+    def __getitem__(self, item: Any) -> Any:
+        return self.array[item]
+
+    def select(self, start: int = 1, stop: Optional[int] = None) -> Any:
+        """
+        Return a view of the records from 'start' to 'stop', as selected
+        by ":DATa:STARt" and ":DATa:STOP" on an oscilloscope: the records
+        are numbered from 1, both ends are included, the ends are limited
+        to the records in the dataset and are swapped if 'start' is after
+        'stop'.
+        """
+        if stop is None:
+            stop = len(self)
+        if start > stop:
+            start, stop = stop, start
+
+        start = min(max(start, 1), len(self))
+        stop = min(max(stop, 1), len(self))
+        return self.array[start - 1:stop]
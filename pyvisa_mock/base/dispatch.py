@@ -0,0 +1,677 @@
+"""
+A keyword trie which mocker classes use to find the handler of a SCPI
+message without trying every registered pattern.
+
+SCPI headers are a sequence of keywords separated by ':'. Each keyword
+can be send in a long or a short form (see 'compile_regular_expression'
+in base_mocker.py). The leading keywords of a scpi string are stored as
+nodes in a trie, with one edge per form of the keyword. Only the remainder
+of the scpi string (the last keyword and the parameters) is matched with a
+regular expression. The tails of a node are indexed by the forms of their
+leading keyword, such that only the tails of the keyword in a message are
+tried. Scpi strings with optional parts are added once for
+every variant. Keywords with a numeric suffix range, e.g. "CHANnel{1:64}",
+are stored as a single edge which accepts any suffix in the range. Other
+keywords with parameters, e.g. "CHANNEL<channel>", are stored as an edge
+which matches the keyword with a regular expression; the keywords after
+it are stored below it. A parameter in such a keyword does not match past
+the next ':', as in the header of a submodule (see 'to_header_regex'). The
+header of a submodule can be mounted: it only matches the start of a
+message, and the remainder is matched by the trie of the submodule.
+
+When the table is built, example messages are generated for every entry to
+find entries which may match the same message. Examples cannot show every
+overlap of an untyped parameter, which matches anything: ":A<x>C" and
+":AB<y>" both match ":ABC". The literal text before the first parameter
+(the skeleton, see 'grammar.skeleton') is compared instead: an entry with an
+untyped parameter is assumed to overlap with the entries below the same
+node whose skeleton can start the same message, e.g. "A" and "AB" but not
+"VOLTage " and "VOLTage?". A message is dispatched to the first matching
+entry; only the entries which overlap with it are checked for ambiguity.
+"""
+import re
+from bisect import bisect_left
+from itertools import product
+from typing import (
+    Dict, List, Optional, Tuple, Iterator, Any, Pattern, Callable, NamedTuple
+)
+
+from pyvisa_mock.base import grammar
+
+# Keywords which can be stored in the trie: no parameters, no regex syntax
+_KEYWORD = re.compile(r"\*?[A-Za-z0-9_]*")
+# Keywords with parameters which can be stored as an edge of the trie: no
+# arguments (whitespace) and no optional parts
+_SEGMENT = re.compile(r"[^\s\[\]]+")
+# A tail which starts with a whole keyword, followed by its arguments or a
+# '?'; used to index the tails by keyword
+_LEADING_KEYWORD = re.compile(r"\*?[A-Za-z0-9_]+(?=[ ?])")
+# The part of a keyword which is mandatory; used to index the other tails
+_MANDATORY = re.compile(r"\*?(?:[A-Z0-9_]|(?<![A-Z])[a-z])*")
+# Regular expression syntax which cannot be turned into an example message
+_REGEX_SYNTAX = re.compile(r"[.^$*+?{}\[\]|()]")
+# A keyword with a numeric suffix in a message
+_SUFFIX = re.compile(r"(.*?)(\d+)")
+
+# Positional and keyword arguments for a handler
+Arguments = Tuple[tuple, Dict[str, Any]]
+
+
+class Match(NamedTuple):
+    handler: Any
+    args: tuple
+    kwargs: Dict[str, Any]
+    # The remainder of the message when a submodule header matches
+    rest: Optional[str] = None
+    # Handlers of overlapping commands which match the message as well
+    conflicts: Tuple[Any, ...] = ()
+
+
+def keyword_forms(keyword: str) -> List[str]:
+    """
+    Return all forms (in upper case) in which a keyword can be send.
+
+    Examples:
+        >>> sorted(keyword_forms("VOLTage"))
+        ['VOLT', 'VOLTAGE']
+    """
+    parts = grammar.OPTIONAL.split(keyword)
+    mandatory = parts[0::2]
+    optional = parts[1::2]
+
+    forms = set()
+    for included in product((False, True), repeat=len(optional)):
+        form = mandatory[0]
+        for part, include, next_part in zip(optional, included, mandatory[1:]):
+            form += (part if include else "") + next_part
+        forms.add(form.upper())
+
+    return sorted(forms)
+
+
+def skeleton_forms(scpi_string: str) -> Tuple[str, ...]:
+    """
+    Return all forms (in upper case) of the skeleton of a scpi string.
+
+    Examples:
+        >>> skeleton_forms("VOLTage <value>")
+        ('VOLT ', 'VOLTAGE ')
+    """
+    return tuple(keyword_forms(grammar.skeleton(scpi_string)))
+
+
+def _compatible(skeletons: Tuple[str, ...], others: Tuple[str, ...]) -> bool:
+    """
+    Return True if messages starting with one of the skeletons can start
+    with one of the other skeletons as well.
+    """
+    return any(
+        skeleton.startswith(other) or other.startswith(skeleton)
+        for skeleton in skeletons for other in others
+    )
+
+
+def regex_examples(regex: str) -> List[str]:
+    """
+    Generate an example message for a raw regular expression. This is only
+    possible for a regular expression which is a literal string.
+    """
+    if regex.startswith("^"):
+        regex = regex[1:]
+    if regex.endswith("$") and not regex.endswith("\\$"):
+        regex = regex[:-1]
+
+    if _REGEX_SYNTAX.search(re.sub(r"\\.", "", regex)):
+        return []
+
+    return [re.sub(r"\\(.)", r"\1", regex)]
+
+
+def _arguments(
+        match: Any,
+        converters: Tuple[Tuple[str, Callable], ...],
+        captured: Optional[Dict[str, Any]] = None
+) -> Optional[Arguments]:
+    """
+    Extract the handler arguments from a match object. Returns None if a
+    converter rejects a value.
+    """
+    kwargs = match.groupdict()
+    for name, converter in converters:
+        try:
+            kwargs[name] = converter(kwargs[name])
+        except ValueError:
+            return None
+
+    if captured:
+        kwargs = {**captured, **kwargs}
+
+    if kwargs:
+        return (), kwargs
+    return match.groups(), {}
+
+
+class _Command:
+    """
+    A registered pattern and its handler.
+    """
+    __slots__ = ("pattern", "converters", "handler", "mount", "examples", "overlaps")
+
+    def __init__(
+            self,
+            pattern: Pattern,
+            converters: List[Tuple[str, Callable]],
+            handler: Any,
+            examples: List[str],
+            mount: Optional["SCPITrie"] = None
+    ) -> None:
+        self.pattern = pattern
+        self.converters = tuple(converters)
+        self.handler = handler
+        self.mount = mount
+        # Only keep the examples which actually match the full pattern
+        self.examples = [
+            example for example in examples if self.accepts(example)
+        ]
+        self.overlaps: Tuple["_Command", ...] = ()
+
+    def accepts(self, message: str) -> bool:
+        match = self.pattern.match(message)
+        if match is None or _arguments(match, self.converters) is None:
+            return False
+        return self.mount is None or self.mount.accepts(message[match.end():])
+
+
+class _Entry:
+    """
+    A command in the trie, together with the compiled regex which matches
+    the tail of a message.
+    """
+    __slots__ = ("regex", "converters", "command", "skeletons", "untyped")
+
+    def __init__(
+            self,
+            regex: Pattern,
+            converters: List[Tuple[str, Callable]],
+            command: _Command,
+            skeletons: Tuple[str, ...] = ("",),
+            untyped: bool = False
+    ) -> None:
+        self.regex = regex
+        self.converters = tuple(converters)
+        self.command = command
+        # The forms of the skeleton of the tail, see 'skeleton_forms'
+        self.skeletons = skeletons
+        # The tail has an untyped parameter
+        self.untyped = untyped
+
+    def match(
+            self,
+            message: str,
+            pos: int,
+            captured: Optional[Dict[str, Any]]
+    ) -> Optional[Match]:
+        match = self.regex.match(message, pos)
+        if match is None:
+            return None
+
+        arguments = _arguments(match, self.converters, captured)
+        if arguments is None:
+            return None
+
+        command = self.command
+        if command.mount is None:
+            return Match(command.handler, *arguments)
+
+        rest = message[match.end():]
+        if not command.mount.accepts(rest):
+            return None
+        return Match(command.handler, *arguments, rest)
+
+
+class _Suffix:
+    """
+    An edge of the trie for a keyword with a numeric suffix.
+    """
+    __slots__ = ("name", "low", "high", "child")
+
+    def __init__(self, name: str, low: int, high: int) -> None:
+        self.name = name
+        self.low = low
+        self.high = high
+        self.child = _Node()
+
+
+class _Segment:
+    """
+    An edge of the trie for a keyword with parameters, e.g.
+    "CHANNEL<channel>". The regular expression matches the whole keyword.
+    """
+    __slots__ = ("regex", "converters", "skeletons", "child")
+
+    def __init__(self, keyword: str) -> None:
+        self.regex = re.compile("(?i)" + grammar.to_header_regex(keyword))
+        self.converters = tuple(grammar.converters(keyword))
+        self.skeletons = skeleton_forms(keyword)
+        self.child = _Node()
+
+
+class _Node:
+    __slots__ = (
+        "children", "suffixed", "segments", "keyed", "tails", "tail_lengths", "generic",
+        "sorted"
+    )
+
+    def __init__(self) -> None:
+        self.children: Dict[str, "_Node"] = {}
+        # Edges for keywords with a numeric suffix, indexed by keyword form
+        self.suffixed: Dict[str, List[_Suffix]] = {}
+        # Edges for other keywords with parameters, indexed by keyword
+        self.segments: Dict[str, _Segment] = {}
+        # Tails starting with a whole keyword, indexed by the forms of
+        # the keyword
+        self.keyed: Dict[str, List[_Entry]] = {}
+        # Other tails indexed by their mandatory (upper case) literal prefix
+        self.tails: Dict[str, List[_Entry]] = {}
+        self.tail_lengths: Tuple[int, ...] = ()
+        # Tails without a literal prefix, these are always tried
+        self.generic: List[_Entry] = []
+        # Sorted keys of the indices above, see 'related_keys'
+        self.sorted: Dict[str, List[str]] = {}
+
+    def add_tail(self, prefix: str, entry: _Entry, forms: List[str] = ()) -> None:
+        """
+        Add the entry of a tail. The tail starts with a whole keyword if its
+        forms are given, or else with the mandatory literal prefix.
+        """
+        self.sorted.clear()
+        for form in forms:
+            self.keyed.setdefault(form, []).append(entry)
+        if forms:
+            return
+
+        if not prefix:
+            self.generic.append(entry)
+            return
+
+        self.tails.setdefault(prefix, []).append(entry)
+        self.tail_lengths = tuple(sorted({len(key) for key in self.tails}))
+
+    def add_keyword(self, keyword: str) -> List["_Node"]:
+        """
+        Add the edges for a keyword and return the child nodes.
+        """
+        self.sorted.clear()
+        suffixed = grammar.suffixed_keyword(keyword)
+        if suffixed is None:
+            if not _KEYWORD.fullmatch(keyword):
+                segment = self.segments.get(keyword)
+                if segment is None:
+                    segment = self.segments[keyword] = _Segment(keyword)
+                return [segment.child]
+
+            return [
+                self.children.setdefault(form, _Node())
+                for form in keyword_forms(keyword)
+            ]
+
+        keyword, name, low, high = suffixed
+        children = []
+        for form in keyword_forms(keyword):
+            edges = self.suffixed.setdefault(form, [])
+            for edge in edges:
+                if (edge.name, edge.low, edge.high) == (name, low, high):
+                    break
+            else:
+                edge = _Suffix(name, low, high)
+                edges.append(edge)
+            children.append(edge.child)
+
+        return children
+
+    def entries(self) -> Iterator[_Entry]:
+        found = set()
+        for bucket in self.keyed.values():
+            for entry in bucket:
+                # An entry is indexed by every form of its keyword
+                if id(entry) not in found:
+                    found.add(id(entry))
+                    yield entry
+        for bucket in self.tails.values():
+            yield from bucket
+        yield from self.generic
+
+    def nodes(self) -> Iterator["_Node"]:
+        """
+        Yield this node and all nodes below it.
+        """
+        yield self
+        for child in self.children.values():
+            yield from child.nodes()
+        for edges in self.suffixed.values():
+            for edge in edges:
+                yield from edge.child.nodes()
+        for segment in self.segments.values():
+            yield from segment.child.nodes()
+
+    def related_keys(self, name: str, skeleton: str) -> Iterator[str]:
+        """
+        Yield the keys of an index of this node which are a prefix of the
+        skeleton, or which start with it.
+        """
+        index = getattr(self, name)
+        for end in range(1, len(skeleton) + 1):
+            if skeleton[:end] in index:
+                yield skeleton[:end]
+
+        keys = self.sorted.get(name)
+        if keys is None:
+            keys = self.sorted[name] = sorted(index)
+        for key in keys[bisect_left(keys, skeleton):]:
+            if not key.startswith(skeleton):
+                break
+            if key != skeleton:
+                yield key
+
+    def below(self) -> Iterator[_Entry]:
+        """
+        Yield the entries of this node and all nodes below it.
+        """
+        for node in self.nodes():
+            yield from node.entries()
+
+    def compatible(self, skeleton: str) -> Iterator[_Entry]:
+        """
+        Yield the entries of this node and the nodes below it which can match
+        a message starting with the skeleton at this node. Entries are only
+        compared to the skeleton at this node; below a compatible edge every
+        entry is assumed to be compatible.
+        """
+        for name in ("keyed", "tails"):
+            index = getattr(self, name)
+            for key in self.related_keys(name, skeleton):
+                for entry in index[key]:
+                    if _compatible((skeleton,), entry.skeletons):
+                        yield entry
+        yield from self.generic
+
+        end = skeleton.find(":")
+        if end >= 0:
+            child = self.children.get(skeleton[:end])
+            if child is not None:
+                yield from child.compatible(skeleton[end + 1:])
+        else:
+            for form in self.related_keys("children", skeleton):
+                # A child whose form starts with the skeleton
+                if form.startswith(skeleton):
+                    yield from self.children[form].below()
+
+        # The message continues the form with the digits of a suffix
+        for form in self.related_keys("suffixed", skeleton):
+            for edge in self.suffixed[form]:
+                yield from edge.child.below()
+
+        for segment in self.segments.values():
+            if _compatible((skeleton,), segment.skeletons):
+                yield from segment.child.below()
+
+    def candidates(self, message: str, pos: int) -> Iterator[_Entry]:
+        if self.keyed:
+            keyword = _KEYWORD.match(message, pos).group().upper()
+            bucket = self.keyed.get(keyword)
+            if bucket is not None:
+                yield from bucket
+
+        for length in self.tail_lengths:
+            bucket = self.tails.get(message[pos:pos + length].upper())
+            if bucket is not None:
+                yield from bucket
+
+        yield from self.generic
+
+
+def split_scpi_string(scpi_string: str) -> Tuple[List[str], str]:
+    """
+    Split a scpi string in the keywords which can be stored in the trie and
+    the remaining tail, which needs to be matched with a regular expression.
+
+    Examples:
+        >>> split_scpi_string(":INSTRument:CHANnel<ch>:VOLTage <value>")
+        (['', 'INSTRument', 'CHANnel<ch>'], 'VOLTage <value>')
+    """
+    segments = grammar.split_header(scpi_string)
+    keywords = []
+
+    # The last segment always goes into the tail
+    for segment in segments[:-1]:
+        if not _KEYWORD.fullmatch(segment) and not _SEGMENT.fullmatch(segment):
+            break
+        keywords.append(segment)
+
+    tail = ":".join(segments[len(keywords):])
+    return keywords, tail
+
+
+class SCPITrie:
+    """
+    Dispatch table of a mocker class. Built once by 'MockerMetaClass'.
+    """
+
+    def __init__(self) -> None:
+        self._root = _Node()
+        self._commands: List[_Command] = []
+
+    def add_scpi(self, scpi_string: str, pattern: Pattern, handler: Any) -> None:
+        """
+        Add a handler for a scpi string.
+
+        Args:
+            scpi_string: The scpi string as given to the 'scpi' decorator.
+            pattern: The compiled regular expression of the scpi string.
+            handler: The handler to call when a message matches.
+        """
+        command = _Command(
+            pattern, grammar.converters(scpi_string), handler,
+            grammar.examples(scpi_string)
+        )
+        self._add(scpi_string, command, grammar.to_regex)
+
+    def add_mount(
+            self,
+            scpi_string: str,
+            pattern: Pattern,
+            handler: Any,
+            trie: "SCPITrie"
+    ) -> None:
+        """
+        Add the header of a submodule. A message matches if it starts with
+        the header and the remainder matches the trie of the submodule.
+
+        Args:
+            scpi_string: The scpi string of the header.
+            pattern: The compiled regular expression of the header, see
+                'grammar.to_header_regex'.
+            handler: The handler which returns the submodule.
+            trie: The dispatch table of the submodule.
+        """
+        headers = grammar.examples(scpi_string)
+        examples = [
+            headers[0] + example
+            for command in trie._commands for example in command.examples
+        ]
+        command = _Command(
+            pattern, grammar.converters(scpi_string), handler, examples, trie
+        )
+        self._add(scpi_string, command, grammar.to_header_regex)
+
+    def _add(
+            self,
+            scpi_string: str,
+            command: _Command,
+            to_regex: Callable[[str], str]
+    ) -> None:
+        self._commands.append(command)
+
+        for variant in grammar.expand_optional(scpi_string):
+            keywords, tail = split_scpi_string(variant)
+            prefix = _MANDATORY.match(tail).group().upper()
+            keyword = _LEADING_KEYWORD.match(tail)
+            forms = keyword_forms(keyword.group()) if keyword else []
+            entry = _Entry(
+                re.compile("(?i)" + to_regex(tail)),
+                grammar.converters(tail), command,
+                skeleton_forms(tail), grammar.has_untyped(tail)
+            )
+
+            nodes = [self._root]
+            for keyword in keywords:
+                nodes = [
+                    child for node in nodes for child in node.add_keyword(keyword)
+                ]
+
+            for node in nodes:
+                node.add_tail(prefix, entry, forms)
+
+    def add_regex(self, pattern: Pattern, handler: Any) -> None:
+        """
+        Add a handler for a compiled raw regular expression. These are tried
+        on every message.
+        """
+        command = _Command(pattern, [], handler, regex_examples(pattern.pattern))
+        self._commands.append(command)
+        self._root.add_tail("", _Entry(pattern, [], command))
+
+    def analyse(self) -> None:
+        """
+        Find the commands which can match the same message. Commands for
+        which no example message could be generated are assumed to overlap
+        with every other command, and commands with an untyped parameter
+        with every command whose skeleton is compatible (see 'compatible').
+        """
+        # Dictionaries keyed by id() keep the definition order of the commands
+        overlaps: Dict[int, Dict[int, _Command]] = {
+            id(command): {} for command in self._commands
+        }
+
+        def add_overlap(command: _Command, other: _Command) -> None:
+            if other is not command:
+                overlaps[id(command)][id(other)] = other
+                overlaps[id(other)][id(command)] = command
+
+        for command in self._commands:
+            if not command.examples:
+                for other in self._commands:
+                    add_overlap(command, other)
+
+            for example in command.examples:
+                for other, _ in self._iter_commands(example):
+                    add_overlap(command, other)
+
+        for node in self._root.nodes():
+            for entry in node.entries():
+                if not entry.untyped:
+                    continue
+                for skeleton in entry.skeletons:
+                    for other in node.compatible(skeleton):
+                        add_overlap(entry.command, other.command)
+
+        for command in self._commands:
+            command.overlaps = tuple(overlaps[id(command)].values())
+
+    def overlapping(self) -> List[Tuple[str, str]]:
+        """
+        Return the pairs of regular expressions which can match the same
+        message.
+        """
+        index = {id(command): number for number, command in enumerate(self._commands)}
+        return [
+            (command.pattern.pattern, other.pattern.pattern)
+            for command in self._commands for other in command.overlaps
+            if index[id(other)] > index[id(command)]
+        ]
+
+    def _iter_entries(self, message: str) -> Iterator[Tuple[_Entry, Match]]:
+        return self._walk(self._root, message, 0, None)
+
+    def _walk(
+            self,
+            node: _Node,
+            message: str,
+            pos: int,
+            captured: Optional[Dict[str, Any]]
+    ) -> Iterator[Tuple[_Entry, Match]]:
+        for entry in node.candidates(message, pos):
+            found = entry.match(message, pos, captured)
+            if found is not None:
+                yield entry, found
+
+        end = message.find(":", pos)
+        if end < 0:
+            return
+
+        segment = message[pos:end].upper()
+        child = node.children.get(segment)
+        if child is not None:
+            yield from self._walk(child, message, end + 1, captured)
+
+        for edge in node.segments.values():
+            match = edge.regex.fullmatch(message, pos, end)
+            if match is None:
+                continue
+            arguments = _arguments(match, edge.converters, captured)
+            if arguments is not None:
+                yield from self._walk(edge.child, message, end + 1, arguments[1])
+
+        if not node.suffixed:
+            return
+
+        match = _SUFFIX.fullmatch(segment)
+        if match is None:
+            return
+
+        number = int(match.group(2))
+        for edge in node.suffixed.get(match.group(1), ()):
+            if edge.low <= number <= edge.high:
+                yield from self._walk(
+                    edge.child, message, end + 1,
+                    {**(captured or {}), edge.name: number}
+                )
+
+    def _iter_commands(self, message: str) -> Iterator[Tuple[_Command, Match]]:
+        # Different variants of a command can match the same message
+        found = set()
+        for entry, match in self._iter_entries(message):
+            if id(entry.command) not in found:
+                found.add(id(entry.command))
+                yield entry.command, match
+
+    def accepts(self, message: str) -> bool:
+        """
+        Return True if any command matches the message.
+        """
+        return next(self._iter_entries(message), None) is not None
+
+    def iter_matches(self, message: str) -> Iterator[Match]:
+        """
+        Yield a match for every command matching the message.
+        """
+        for _, match in self._iter_commands(message):
+            yield match
+
+    def match(self, message: str) -> Optional[Match]:
+        """
+        Find the first command matching the message.
+
+        Returns:
+            None if no command matches. Otherwise the match of the first
+            matching command, with the handlers of overlapping commands
+            which match the message as well in its 'conflicts'.
+        """
+        for entry, match in self._iter_entries(message):
+            conflicts = tuple(
+                other.handler for other in entry.command.overlaps
+                if other.accepts(message)
+            )
+            return match._replace(conflicts=conflicts)
+
+        return None
@@ -0,0 +1,55 @@
+"""
+Formatters for the responses of SCPI handlers, see the 'fmt' argument of
+the 'scpi' decorator. Without a formatter, a response is converted with
+'str', which gives e.g. "0.30000000000000004" for a float and "[1, 2]" for a
+list. A formatter is compiled once, when the handler is created:
+
+    >>> format_float = Formatter(".3E")
+    >>> format_float(0.1 + 0.2)
+    '3.000E-01'
+    >>> format_float([1, 2.5])
+    '1.000E+00,2.500E+00'
+"""
+import re
+from typing import Any, Callable, Union
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional
+    np = None
+
+# A format specification for a single number, as used by 'format' and the
+# % operator: flags, width, precision and type, e.g. "+.6E" or "08.3f"
+_SPEC = re.compile(r"[-+ 0#]*\d*(?:\.\d+)?[eEfFgGdi]")
+
+Format = Union[str, Callable[[Any], Any]]
+
+
+class Formatter:
+    """
+    Format a response as text. Sequences and numpy arrays are formatted
+    value by value and joined with commas.
+
+    Args:
+        fmt: A format specification for numbers, e.g. ".6E", ".3f" or
+            "d", or a function which returns a single value as a string.
+    """
+    __slots__ = ("fmt", "_format")
+
+    def __init__(self, fmt: Format) -> None:
+        self.fmt = fmt
+        if callable(fmt):
+            self._format = fmt
+        elif _SPEC.fullmatch(fmt):
+            # The % operator is the fastest way to format many numbers
+            self._format = ("%" + fmt).__mod__
+        else:
+            raise ValueError(f"Invalid response format '{fmt}'")
+
+    def __call__(self, response: Any) -> str:
+        if np is not None and isinstance(response, np.ndarray):
+            # Convert all values to Python numbers at once
+            return ",".join(map(self._format, response.reshape(-1).tolist()))
+        if isinstance(response, (list, tuple)):
+            return ",".join(map(self._format, response))
+        return self._format(response)
@@ -0,0 +1,600 @@
+"""
+Parser for the scpi strings given to the 'scpi' decorator. See the doc
+string of 'compile_regular_expression' in base_mocker.py for the syntax.
+
+A scpi string is parsed into a list of nodes. From these nodes we generate
+the regular expression matching messages, and example messages which are
+used to analyse patterns for overlaps.
+"""
+import re
+from typing import List, Optional, Tuple, Callable
+
+from pyvisa_mock.base.converters import SUFFIX_REGEX, to_float_list, to_int_list
+
+# Lower case letters preceded by an upper case letter are optional
+OPTIONAL = re.compile(r"(?<=[A-Z])([a-z]+)")
+
+# SCPI keywords which can be send instead of a number, see converters.py
+_NUMERIC_KEYWORDS = r"MIN(?:IMUM)?|MAX(?:IMUM)?|DEF(?:AULT)?"
+_NON_DECIMAL = r"#H[0-9A-F]+|#Q[0-7]+|#B[01]+"
+
+# Regular expressions of the typed parameters. Each is followed by a
+# look-ahead, such that a parameter never matches part of a longer value.
+# The forms accepted by the converters are matched, e.g. "1E3" for an int
+# and "20 mV" for a float, see converters.py.
+PARAMETER_TYPES = {
+    "int": rf"(?:[+-]?\d+(?:E[+-]?\d+)?|{_NON_DECIMAL}|{_NUMERIC_KEYWORDS})(?![\w.])",
+    "float": (
+        rf"(?:[+-]?(?:\d+\.?\d*|\.\d+)(?:E[+-]?\d+)?(?:\s*{SUFFIX_REGEX})?"
+        rf"|{_NON_DECIMAL}|N?INF(?:INITY)?|NAN|{_NUMERIC_KEYWORDS})(?![\w.])"
+    ),
+    "bool": r"(?:ON|OFF|1|0)(?!\w)",
+    "str": r"\"[^\"]*\"|'[^']*'|[^\s,;\"']+",
+    # A binary block is replaced by a marker before matching, see blocks.py
+    "block": "#0",
+}
+# Lists of comma or whitespace separated values. Validating every value
+# with a regular expression is slower than converting them, so a list
+# matches up to the end of the command, and the converter rejects invalid
+# values. These are converted to a numpy array, see converters.py
+_LIST = r"[^\s;][^;]*"
+PARAMETER_TYPES["list[int]"] = _LIST
+PARAMETER_TYPES["list[float]"] = _LIST
+_LIST_CONVERTERS = {
+    "list[int]": to_int_list,
+    "list[float]": to_float_list,
+}
+
+# A scpi string with typed parameters matches up to the end of a message,
+# such that trailing text is not silently dropped
+_END = r"(?=\s*$)"
+
+# Untyped parameters match anything, unless they are part of the header of
+# a submodule, which is followed by the header of the submodule
+_UNTYPED = ".*"
+_UNTYPED_HEADER = "[^:]*"
+
+# Example values used when generating example messages
+_EXAMPLE_VALUES = {
+    None: "1",
+    "int": "1",
+    "float": "1",
+    "bool": "ON",
+    "str": "1",
+    "block": "#0",
+    "list[int]": "1,2",
+    "list[float]": "1,2",
+}
+
+_RANGE = re.compile(r"\{(\d+):(\d+)\}")
+_TRAILING_KEYWORD = re.compile(r"[A-Za-z]+$")
+# A keyword followed by a numeric suffix range, e.g. "CHANnel{1:64}" or
+# "CHANnel<ch:{1:64}>"
+_SUFFIXED_KEYWORD = re.compile(
+    r"(?P<keyword>[A-Za-z]+)"
+    r"(?:\{(?P<low>\d+):(?P<high>\d+)\}"
+    r"|<(?P<name>\w+):\{(?P<named_low>\d+):(?P<named_high>\d+)\}>)"
+)
+
+
+class SCPIGrammarError(ValueError):
+    pass
+
+
+class RangeConverter:
+    """
+    Convert a numeric suffix to an int. Raises a ValueError when the value
+    is outside of the range.
+    """
+    __slots__ = ("low", "high")
+
+    def __init__(self, low: int, high: int) -> None:
+        self.low = low
+        self.high = high
+
+    def __call__(self, value: Optional[str]) -> Optional[int]:
+        if value is None:
+            # An optional part which is not present in the message
+            return None
+
+        number = int(value)
+        if not self.low <= number <= self.high:
+            raise ValueError(
+                f"Suffix {number} is not in range {self.low} to {self.high}"
+            )
+        return number
+
+
+class _Node:
+    def regex(self) -> str:
+        raise NotImplementedError()
+
+    def converters(self) -> List[Tuple[str, Callable]]:
+        """
+        Return the converters which need to be applied to the values of
+        the named groups after a successful match.
+        """
+        return []
+
+    def block_parameters(self) -> List[str]:
+        """
+        Return the names of the parameters of type "block".
+        """
+        return []
+
+    def has_untyped(self) -> bool:
+        """
+        Return True if the node contains an untyped parameter, which
+        matches anything.
+        """
+        return False
+
+    def has_typed(self) -> bool:
+        """
+        Return True if the node contains a typed parameter, or one with
+        alternatives.
+        """
+        return False
+
+    def example(self, short: bool, optional: bool) -> str:
+        """
+        Args:
+            short: Use the short form of keywords.
+            optional: Include optional parts.
+        """
+        raise NotImplementedError()
+
+
+class _Literal(_Node):
+    def __init__(self, text: str) -> None:
+        self.text = text
+
+    def regex(self) -> str:
+        regex = re.sub(r"\?", r"\\?", self.text)
+        regex = re.sub(r"\*", r"\\*", regex)
+        return OPTIONAL.sub(r"(?:\g<1>)?", regex)
+
+    def example(self, short: bool, optional: bool) -> str:
+        if short:
+            return OPTIONAL.sub("", self.text)
+        return self.text
+
+
+class _Sequence(_Node):
+    def __init__(self, nodes: List[_Node]) -> None:
+        self.nodes = nodes
+
+    def regex(self) -> str:
+        return "".join(node.regex() for node in self.nodes)
+
+    def example(self, short: bool, optional: bool) -> str:
+        return "".join(node.example(short, optional) for node in self.nodes)
+
+    def converters(self) -> List[Tuple[str, Callable]]:
+        return [
+            converter for node in self.nodes for converter in node.converters()
+        ]
+
+    def block_parameters(self) -> List[str]:
+        return [name for node in self.nodes for name in node.block_parameters()]
+
+    def has_untyped(self) -> bool:
+        return any(node.has_untyped() for node in self.nodes)
+
+    def has_typed(self) -> bool:
+        return any(node.has_typed() for node in self.nodes)
+
+
+class _Optional(_Sequence):
+    def regex(self) -> str:
+        return f"(?:{super().regex()})?"
+
+    def example(self, short: bool, optional: bool) -> str:
+        if not optional:
+            return ""
+        return super().example(short, optional)
+
+
+class _Alternation(_Node):
+    def __init__(self, alternatives: List[_Sequence]) -> None:
+        self.alternatives = alternatives
+
+    def regex(self) -> str:
+        return "(?:" + "|".join(
+            alternative.regex() for alternative in self.alternatives
+        ) + ")"
+
+    def example(self, short: bool, optional: bool) -> str:
+        return self.alternatives[0].example(short, optional)
+
+    def converters(self) -> List[Tuple[str, Callable]]:
+        return [
+            converter for alternative in self.alternatives
+            for converter in alternative.converters()
+        ]
+
+    def block_parameters(self) -> List[str]:
+        return [
+            name for alternative in self.alternatives
+            for name in alternative.block_parameters()
+        ]
+
+    def has_untyped(self) -> bool:
+        return any(alternative.has_untyped() for alternative in self.alternatives)
+
+    def has_typed(self) -> bool:
+        return any(alternative.has_typed() for alternative in self.alternatives)
+
+
+class _Range(_Node):
+    """
+    A numeric suffix, e.g. the "{1:64}" in "CHANnel{1:64}". The value is
+    converted to an int and validated after matching.
+    """
+    def __init__(self, name: str, low: int, high: int) -> None:
+        self.name = name
+        self.low = low
+        self.high = high
+
+    def regex(self) -> str:
+        return rf"(?P<{self.name}>\d+)(?!\d)"
+
+    def example(self, short: bool, optional: bool) -> str:
+        return str(self.low)
+
+    def converters(self) -> List[Tuple[str, Callable]]:
+        return [(self.name, RangeConverter(self.low, self.high))]
+
+
+class _Parameter(_Node):
+    def __init__(
+            self,
+            name: str,
+            type_name: Optional[str],
+            alternation: Optional[_Alternation] = None,
+            untyped: str = _UNTYPED
+    ) -> None:
+        self.name = name
+        self.type_name = type_name
+        self.alternation = alternation
+        self.untyped = untyped
+
+    def regex(self) -> str:
+        if self.alternation is not None:
+            value = self.alternation.regex() + r"(?!\w)"
+        elif self.type_name is None:
+            value = self.untyped
+        else:
+            value = PARAMETER_TYPES[self.type_name]
+
+        return f"(?P<{self.name}>{value})"
+
+    def example(self, short: bool, optional: bool) -> str:
+        if self.alternation is not None:
+            return self.alternation.example(short, optional)
+        return _EXAMPLE_VALUES.get(self.type_name, "1")
+
+    def converters(self) -> List[Tuple[str, Callable]]:
+        if self.type_name in _LIST_CONVERTERS:
+            return [(self.name, _LIST_CONVERTERS[self.type_name])]
+        return []
+
+    def block_parameters(self) -> List[str]:
+        if self.type_name == "block":
+            return [self.name]
+        return []
+
+    def has_untyped(self) -> bool:
+        return self.type_name is None and self.alternation is None
+
+    def has_typed(self) -> bool:
+        return not self.has_untyped()
+
+
+class _Parser:
+    def __init__(self, text: str, untyped: str = _UNTYPED) -> None:
+        self.text = text
+        self.untyped = untyped
+        self.pos = 0
+
+    def error(self, message: str) -> SCPIGrammarError:
+        return SCPIGrammarError(f"{message} in scpi string '{self.text}'")
+
+    def parse(self) -> _Sequence:
+        sequence = self.parse_sequence("")
+        if self.pos != len(self.text):
+            raise self.error(f"Unexpected '{self.text[self.pos]}'")
+        return sequence
+
+    def parse_sequence(self, stops: str) -> _Sequence:
+        nodes: List[_Node] = []
+        start = self.pos
+
+        while self.pos < len(self.text):
+            char = self.text[self.pos]
+            if char in stops:
+                break
+
+            if char not in "<[{":
+                # A backslash escapes the next character
+                self.pos += 2 if char == "\\" else 1
+                continue
+
+            if start < self.pos:
+                nodes.append(_Literal(self.text[start:self.pos]))
+
+            if char == "<":
+                nodes.append(self.parse_parameter())
+            elif char == "[":
+                nodes.append(self.parse_optional())
+            elif _RANGE.match(self.text, self.pos):
+                nodes.append(self.parse_suffix(self.text[start:self.pos]))
+            else:
+                nodes.append(self.parse_alternation())
+
+            start = self.pos
+
+        if start < self.pos:
+            nodes.append(_Literal(self.text[start:self.pos]))
+
+        return _Sequence(nodes)
+
+    def expect(self, char: str) -> None:
+        if self.pos >= len(self.text) or self.text[self.pos] != char:
+            raise self.error(f"Expected '{char}'")
+        self.pos += 1
+
+    def parse_optional(self) -> _Optional:
+        self.expect("[")
+        sequence = self.parse_sequence("]")
+        self.expect("]")
+        return _Optional(sequence.nodes)
+
+    def parse_alternation(self) -> _Alternation:
+        self.expect("{")
+        alternatives = [self.parse_sequence("|}")]
+        while self.pos < len(self.text) and self.text[self.pos] == "|":
+            self.pos += 1
+            alternatives.append(self.parse_sequence("|}"))
+        self.expect("}")
+        return _Alternation(alternatives)
+
+    def parse_suffix(self, preceding: str) -> _Range:
+        """
+        Parse a numeric suffix range. The value is passed to the handler as
+        an argument named after the long form of the preceding keyword.
+        """
+        keyword = _TRAILING_KEYWORD.search(preceding)
+        if keyword is None:
+            raise self.error("A numeric suffix needs to follow a keyword")
+
+        match = _RANGE.match(self.text, self.pos)
+        self.pos = match.end()
+        return self.make_range(keyword.group().lower(), *match.groups())
+
+    def make_range(self, name: str, low: str, high: str) -> _Range:
+        if int(low) > int(high):
+            raise self.error(f"Empty range {{{low}:{high}}}")
+        return _Range(name, int(low), int(high))
+
+    def parse_parameter(self) -> _Node:
+        self.expect("<")
+        end = self.text.find(">", self.pos)
+        if end < 0:
+            raise self.error("Expected '>'")
+
+        name, _, type_name = self.text[self.pos:end].partition(":")
+
+        range_match = _RANGE.fullmatch(type_name)
+        if range_match:
+            self.pos = end + 1
+            return self.make_range(name, *range_match.groups())
+
+        if type_name.startswith("{"):
+            parser = _Parser(type_name)
+            alternation = parser.parse_alternation()
+            if parser.pos != len(type_name):
+                raise self.error(f"Unknown type '{type_name}'")
+            self.pos = end + 1
+            return _Parameter(name, None, alternation)
+
+        if type_name and type_name not in PARAMETER_TYPES:
+            raise self.error(f"Unknown type '{type_name}'")
+
+        self.pos = end + 1
+        return _Parameter(name, type_name or None, untyped=self.untyped)
+
+
+def parse(scpi_string: str, untyped: str = _UNTYPED) -> _Sequence:
+    return _Parser(scpi_string, untyped).parse()
+
+
+def to_regex(scpi_string: str, anchored: bool = True) -> str:
+    """
+    Compile a scpi string to a regular expression, without flags. If the
+    scpi string has typed parameters, the regular expression only matches
+    up to the end of a message (apart from trailing whitespace), unless
+    'anchored' is False.
+
+    Examples:
+        >>> to_regex("OUTPut <state:bool>")
+        'OUTP(?:ut)? (?P<state>(?:ON|OFF|1|0)(?!\\\\w))(?=\\\\s*$)'
+    """
+    sequence = parse(scpi_string)
+    if anchored and sequence.has_typed():
+        return sequence.regex() + _END
+    return sequence.regex()
+
+
+def to_header_regex(scpi_string: str) -> str:
+    """
+    Compile the scpi string of a submodule header to a regular expression,
+    without flags. Untyped parameters do not match past the next ':', such
+    that the match ends where the header of the submodule starts.
+
+    Examples:
+        >>> to_header_regex(":INSTRument<n>")
+        ':INSTR(?:ument)?(?P<n>[^:]*)'
+    """
+    return parse(scpi_string, _UNTYPED_HEADER).regex()
+
+
+def converters(scpi_string: str) -> List[Tuple[str, Callable]]:
+    """
+    Return (group name, converter) pairs for the groups of the regular
+    expression of the scpi string whose values need converting.
+    """
+    return parse(scpi_string).converters()
+
+
+def block_parameters(scpi_string: str) -> List[str]:
+    """
+    Return the names of the binary block parameters, e.g. ["data"] for
+    ":DATA <data:block>".
+    """
+    return parse(scpi_string).block_parameters()
+
+
+def has_untyped(scpi_string: str) -> bool:
+    """
+    Return True if the scpi string has an untyped parameter, e.g. "<value>".
+    """
+    return parse(scpi_string).has_untyped()
+
+
+def skeleton(scpi_string: str) -> str:
+    """
+    Return the literal text at the start of a scpi string, up to the first
+    parameter, optional part or alternation. Every message matching the
+    scpi string starts with a form of this text.
+
+    Examples:
+        >>> skeleton("VOLTage <value>")
+        'VOLTage '
+    """
+    text = []
+    for node in parse(scpi_string).nodes:
+        if not isinstance(node, _Literal):
+            break
+        text.append(node.text)
+    return "".join(text)
+
+
+def suffixed_keyword(segment: str) -> Optional[Tuple[str, str, int, int]]:
+    """
+    If the segment of a header is a keyword with a numeric suffix range,
+    return the keyword, the argument name and the range.
+
+    Examples:
+        >>> suffixed_keyword("CHANnel{1:64}")
+        ('CHANnel', 'channel', 1, 64)
+    """
+    match = _SUFFIXED_KEYWORD.fullmatch(segment)
+    if match is None:
+        return None
+
+    keyword = match.group("keyword")
+    if match.group("name") is not None:
+        return (
+            keyword, match.group("name"),
+            int(match.group("named_low")), int(match.group("named_high"))
+        )
+
+    return keyword, keyword.lower(), int(match.group("low")), int(match.group("high"))
+
+
+def examples(scpi_string: str) -> List[str]:
+    """
+    Generate example messages which ought to match a scpi string: the
+    short and long forms, with and without the optional parts.
+    """
+    sequence = parse(scpi_string)
+    found = []
+    for short, optional in ((True, False), (True, True), (False, False), (False, True)):
+        found.append(sequence.example(short, optional))
+
+    long_form = found[-1]
+    found.extend([long_form.upper(), long_form.lower()])
+    # Remove duplicates, but keep the order
+    return list(dict.fromkeys(found))
+
+
+def _split_optional(scpi_string: str) -> Optional[Tuple[str, str, str]]:
+    """
+    Split a scpi string around its first top level optional part.
+    """
+    depth = 0
+    start = -1
+    pos = 0
+    while pos < len(scpi_string):
+        char = scpi_string[pos]
+        if char == "\\":
+            pos += 2
+            continue
+        if char == "<":
+            # Parameters cannot contain optional parts
+            end = scpi_string.find(">", pos)
+            pos = len(scpi_string) if end < 0 else end + 1
+            continue
+        if char == "[":
+            if depth == 0:
+                start = pos
+            depth += 1
+        elif char == "]" and depth > 0:
+            depth -= 1
+            if depth == 0:
+                return (
+                    scpi_string[:start],
+                    scpi_string[start + 1:pos],
+                    scpi_string[pos + 1:]
+                )
+        pos += 1
+
+    return None
+
+
+def expand_optional(scpi_string: str, limit: int = 64) -> List[str]:
+    """
+    Return the variants of a scpi string with each optional part either
+    included or left out. If there are more than 'limit' variants, the
+    scpi string is returned as is.
+
+    Examples:
+        >>> expand_optional("[:SOURce]:VOLTage[:LEVel]?")
+        [':SOURce:VOLTage:LEVel?', ':SOURce:VOLTage?', ':VOLTage:LEVel?', ':VOLTage?']
+    """
+    parts = _split_optional(scpi_string)
+    if parts is None:
+        return [scpi_string]
+
+    before, inner, after = parts
+    variants = []
+    for rest in (inner + after, after):
+        variants.extend(
+            before + variant for variant in expand_optional(rest, limit)
+        )
+        if len(variants) > limit:
+            return [scpi_string]
+
+    return list(dict.fromkeys(variants))
+
+
+def split_header(scpi_string: str) -> List[str]:
+    """
+    Split a scpi string on the ':' characters which are not inside a
+    parameter, an optional part or an alternation.
+    """
+    segments = []
+    depth = 0
+    start = 0
+    for pos, char in enumerate(scpi_string):
+        if char in "<[{(":
+            depth += 1
+        elif char in ">]})" and depth > 0:
+            depth -= 1
+        elif char == ":" and depth == 0:
+            segments.append(scpi_string[start:pos])
+            start = pos + 1
+
+    segments.append(scpi_string[start:])
+    return segments
@@ -1,6 +1,5 @@
 from dataclasses import dataclass
-from typing import Dict, List, Tuple, Any, Optional
-from time import perf_counter
+from typing import Dict, List, Tuple, Any, Optional, Union
 from typing_extensions import ClassVar
 from datetime import timedelta
 
@@ -16,13 +15,15 @@ from pyvisa.resources import SerialInstrument
 from pyvisa.rname import register_subclass, ResourceName
 from pyvisa.typing import VISASession
 
-from pyvisa_mock.base.register import resources
+from pyvisa_mock.base.clock import Clock
+from pyvisa_mock.base.register import resources, buses
 from pyvisa_mock.base.session import (
         Session,
         EventNotEnabledError,
         EventNotDisabledError,
         EventTimeoutError,
         EventNotSupportedError,
+        IOTimeoutError,
         )
 
 STATUS_CODE = int
@@ -52,9 +53,24 @@ InterfaceType.mock = mock_constant
 @Resource.register(mock_constant, "INSTR")
 class MockResource(SerialInstrument):
 
+    # Should match the default encoding of a session
+    _encoding: str = "utf-8"
+
+    @property
+    def encoding(self) -> str:
+        """Encoding used for read and write operations."""
+        return self._encoding
+
+    @encoding.setter
+    def encoding(self, encoding: str) -> None:
+        # Test that the encoding specified makes sense.
+        "test encoding".encode(encoding).decode(encoding)
+        self._encoding = encoding
+        self.visalib.set_encoding(self.session, encoding)
+
     def read(self, **kwargs) -> str:
         reply, status_code = self.visalib.read(self.session)
-        return reply
+        return reply.decode(self._encoding)
 
     def write(self, message: str, **kwargs) -> Tuple[int, STATUS_CODE]:
         self.visalib.write(self.session, message)
@@ -95,14 +111,16 @@ class MockResource(SerialInstrument):
         if timeout and not 0 <= timeout <= 4294967295:
             raise ValueError("timeout value is invalid")
 
-        starting_time = perf_counter()
+        # The timeout is in the time of the clock of the device
+        clock = self.visalib.get_clock(self.session)
+        starting_time = clock.time()
 
         while True:
             if timeout is None:
                 adjusted_timeout = constants.VI_TMO_INFINITE
             else:
                 adjusted_timeout = int(
-                    (starting_time + timeout / 1e3 - perf_counter()) * 1e3
+                    (starting_time + timeout / 1e3 - clock.time()) * 1e3
                 )
                 if adjusted_timeout < 0:
                     adjusted_timeout = 0
@@ -166,6 +184,7 @@ class MockVisaLibrary(highlevel.VisaLibraryBase):
         device = resources[resource_name]
         session = Session(manager_session_idx, resource_name)
         session.device = device
+        session.bus = buses.get(getattr(session.parsed, "board", None))
         new_session_index = self.new_session(session)
         return new_session_index, StatusCode.success
 
@@ -369,15 +388,42 @@ class MockVisaLibrary(highlevel.VisaLibraryBase):
         stb_val = self._sessions[session].stb
         return (stb_val, StatusCode.success)
 
-    def read(self, session_idx: int, count: int = None) -> Tuple[str, STATUS_CODE]:
-        reply = self._sessions[session_idx].read(count)
+    def read(self, session_idx: int, count: int = None) -> Tuple[bytes, STATUS_CODE]:
+        session = self._sessions[session_idx]
+        try:
+            if count is None:
+                return session.read_response(), StatusCode.success
+
+            reply = session.read(count)
+        except IOTimeoutError as e:
+            raise errors.VisaIOError(StatusCode.error_timeout) from e
+        if session.pending():
+            # More data is available, pyvisa keeps reading
+            return reply, StatusCode.success_max_count_read
         return reply, StatusCode.success
 
-    def write(self, session_idx: int, data: str) -> STATUS_CODE:
-        self._sessions[session_idx].write(data)
-        return StatusCode.success
+    def get_clock(self, session_idx: int) -> Clock:
+        """
+        Return the clock of the device in a session, see clock.py.
+        """
+        return self._sessions[session_idx].clock
+
+    def set_encoding(self, session_idx: int, encoding: str) -> None:
+        """
+        Set the encoding of the string replies of the device in a session.
+        """
+        self._sessions[session_idx].encoding = encoding
+
+    def write(self, session_idx: int, data: Union[str, bytes]) -> Tuple[int, STATUS_CODE]:
+        try:
+            self._sessions[session_idx].write(data)
+        except IOTimeoutError as e:
+            raise errors.VisaIOError(StatusCode.error_timeout) from e
+        return len(data), StatusCode.success
 
     def clear(self, session_idx: int) -> None:
+        # Like viClear, drop the unread responses of the device
+        self._sessions[session_idx].clear_output()
         return None
 
     @staticmethod
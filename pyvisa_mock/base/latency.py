@@ -0,0 +1,142 @@
+"""
+Latency profiles, which model how long an instrument takes to handle a
+message. A profile is set per mocker instance, for all messages, a single
+command or a family of commands (see 'BaseMocker.set_latency'):
+
+    scope.set_latency(LogNormalLatency(median=0.002, sigma=0.5, seed=1))
+    scope.set_latency(ThroughputLatency(bytes_per_second=1e6), "CURVe?")
+    scope.set_latency(WarmupLatency(FixedLatency(0.01), first=2.0), family=":MEASure")
+
+The delay of a profile is applied after the handler is called, in addition
+to the call delay, such that it can depend on the size of the response.
+Profiles with state (random generators, call counts) should not be shared
+between mocker instances.
+"""
+import math
+import random
+from typing import Any, Optional
+
+from pyvisa_mock.base.responses import StreamResponse
+
+
+class Latency:
+    def delay(self, message: str, size: int) -> float:
+        """
+        Return the delay in seconds.
+
+        Args:
+            message: The message which is handled.
+            size: The size of the response in bytes, zero if unknown.
+        """
+        raise NotImplementedError()
+
+    def __add__(self, other: "Latency") -> "Latency":
+        return _SumLatency(self, other)
+
+
+class _SumLatency(Latency):
+    def __init__(self, first: Latency, second: Latency) -> None:
+        self.first = first
+        self.second = second
+
+    def delay(self, message: str, size: int) -> float:
+        return self.first.delay(message, size) + self.second.delay(message, size)
+
+
+class FixedLatency(Latency):
+    def __init__(self, seconds: float) -> None:
+        self.seconds = seconds
+
+    def delay(self, message: str, size: int) -> float:
+        return self.seconds
+
+
+class NormalLatency(Latency):
+    """
+    Normally distributed delays. Negative samples are clipped to zero.
+
+    Args:
+        mean: The mean delay in seconds.
+        std: The standard deviation in seconds.
+        seed: Seed of the random generator, for reproducible delays.
+    """
+    def __init__(self, mean: float, std: float, seed: Optional[int] = None) -> None:
+        self.mean = mean
+        self.std = std
+        self._random = random.Random(seed)
+
+    def delay(self, message: str, size: int) -> float:
+        return max(self._random.gauss(self.mean, self.std), 0.0)
+
+
+class LogNormalLatency(Latency):
+    """
+    Log-normally distributed delays, which have the long tail of real
+    instrument latencies.
+
+    Args:
+        median: The median delay in seconds.
+        sigma: The standard deviation of the logarithm of the delay.
+        seed: Seed of the random generator, for reproducible delays.
+    """
+    def __init__(self, median: float, sigma: float, seed: Optional[int] = None) -> None:
+        self.median = median
+        self.sigma = sigma
+        self._mu = math.log(median)
+        self._random = random.Random(seed)
+
+    def delay(self, message: str, size: int) -> float:
+        return self._random.lognormvariate(self._mu, self.sigma)
+
+
+class ThroughputLatency(Latency):
+    """
+    A delay proportional to the number of bytes of the message and the
+    response.
+
+    Args:
+        bytes_per_second: The transfer rate.
+        overhead: A fixed delay per message in seconds.
+    """
+    def __init__(self, bytes_per_second: float, overhead: float = 0.0) -> None:
+        self.bytes_per_second = bytes_per_second
+        self.overhead = overhead
+
+    def delay(self, message: str, size: int) -> float:
+        return self.overhead + (len(message) + size) / self.bytes_per_second
+
+
+class WarmupLatency(Latency):
+    """
+    Add a delay to the first calls, e.g. for an instrument which loads a
+    calibration when a command is first used.
+
+    Args:
+        latency: The delay of all calls.
+        first: The additional delay of the first calls in seconds.
+        calls: The number of calls with the additional delay.
+    """
+    def __init__(self, latency: Latency, first: float, calls: int = 1) -> None:
+        self.latency = latency
+        self.first = first
+        self.calls = calls
+        self._count = 0
+
+    def delay(self, message: str, size: int) -> float:
+        delay = self.latency.delay(message, size)
+        if self._count < self.calls:
+            self._count += 1
+            delay += self.first
+        return delay
+
+
+def response_size(response: Any) -> int:
+    """
+    Return the size of a response in bytes, as far as it is known without
+    producing it. Strings are counted in characters.
+    """
+    if isinstance(response, (str, bytes, bytearray)):
+        return len(response)
+    if isinstance(response, StreamResponse):
+        return response.length or 0
+    return 0
@@ -1,8 +1,11 @@
 from typing import Dict
 
 from pyvisa_mock.base.base_mocker import BaseMocker
+from pyvisa_mock.base.bus import Bus
 
 resources: Dict[str, BaseMocker] = {}
+# The buses of the boards, by board number
+buses: Dict[str, Bus] = {}
 
 
 def register_resource(address: str, mocker: BaseMocker) -> None:
@@ -11,3 +14,7 @@ def register_resource(address: str, mocker: BaseMocker) -> None:
 
 def register_resources(new_resources: Dict[str, BaseMocker]) -> None:
     resources.update(new_resources)
+
+
+def register_bus(board: str, bus: Bus) -> None:
+    buses[board] = bus
@@ -0,0 +1,129 @@
+"""
+Responses which are produced while they are read. A handler can return a
+generator (or any iterator) of byte chunks instead of the whole response;
+the session pulls the chunks when the response is read. To declare the
+total length, or to send the response as an IEEE 488.2 block, return a
+'StreamResponse':
+
+    @scpi("CURVe?")
+    def _curve(self) -> StreamResponse:
+        chunks = (self._capture(start, 4096) for start in range(0, n, 4096))
+        return StreamResponse(chunks, length=n, block=True)
+
+Handlers can also return a numpy array, which is send as an IEEE 488.2
+block straight from the array buffer (see 'array_response').
+"""
+from typing import Any, Callable, Iterable, Iterator, Optional, Union
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional
+    np = None
+
+Chunk = Union[bytes, bytearray, memoryview]
+
+# Arrays are handed to the session in chunks of this many bytes
+ARRAY_CHUNK_SIZE = 1 << 20
+
+
+class StreamResponse:
+    """
+    A response made of byte chunks.
+
+    Args:
+        chunks: The chunks of the response, produced lazily.
+        length: The total number of bytes in the chunks, if known.
+        block: Prefix the chunks with an IEEE 488.2 block header. This is
+            a definite length header if the length is known, otherwise
+            an indefinite length header ("#0").
+    """
+    def __init__(
+            self,
+            chunks: Iterable[Chunk],
+            length: Optional[int] = None,
+            block: bool = False
+    ) -> None:
+        self.length = length
+        self.block = block
+        self._chunks = chunks
+
+    def header(self) -> bytes:
+        if not self.block:
+            return b""
+        if self.length is None:
+            return b"#0"
+        digits = str(self.length)
+        return f"#{len(digits)}{digits}".encode("ascii")
+
+    def __iter__(self) -> Iterator[Chunk]:
+        header = self.header()
+        if header:
+            yield header
+
+        produced = 0
+        for chunk in self._chunks:
+            produced += chunk.nbytes if isinstance(chunk, memoryview) else len(chunk)
+            yield chunk
+
+        if self.length is not None and produced != self.length:
+            raise ValueError(
+                f"The response declared {self.length} bytes, but produced {produced}"
+            )
+
+    def close(self) -> None:
+        """
+        Close the chunks, e.g. when the response is not read until the end.
+        """
+        close = getattr(self._chunks, "close", None)
+        if close is not None:
+            close()
+
+
+class DeferredResponse:
+    """
+    A response which is computed when it is first read, see the
+    'defer_queries' attribute of BaseMocker.
+
+    Args:
+        compute: Returns the response.
+    """
+    __slots__ = ("_compute",)
+
+    def __init__(self, compute: Callable[[], Any]) -> None:
+        self._compute = compute
+
+    def __call__(self) -> Any:
+        return self._compute()
+
+
+def is_array(value: Any) -> bool:
+    return np is not None and isinstance(value, np.ndarray)
+
+
+def array_response(
+        array: Any,
+        datatype: Optional[str] = None,
+        is_big_endian: bool = False
+) -> StreamResponse:
+    """
+    Frame a numpy array as a definite length IEEE 488.2 block. The array
+    is only copied if it needs to be converted or is not contiguous.
+
+    Args:
+        array: The values to send.
+        datatype: The type of the values in the block, as a numpy dtype or
+            a struct format character (e.g. "f" or "h"), like the
+            'datatype' of pyvisa's 'query_binary_values'. Defaults to the
+            type of the array.
+        is_big_endian: The byte order of the values in the block.
+    """
+    dtype = array.dtype if datatype is None else np.dtype(datatype)
+    dtype = dtype.newbyteorder(">" if is_big_endian else "<")
+    array = np.ascontiguousarray(array, dtype=dtype)
+
+    data = memoryview(array.reshape(-1).view(np.uint8))
+    chunks = (
+        data[start:start + ARRAY_CHUNK_SIZE]
+        for start in range(0, len(data), ARRAY_CHUNK_SIZE)
+    )
+    return StreamResponse(chunks, length=len(data), block=True)
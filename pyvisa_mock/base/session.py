@@ -3,7 +3,8 @@ Large parts of this code has been copied directly from pyvisa-sim
 
 https://github.com/pyvisa/pyvisa-sim
 """
-from typing import Optional, Dict
+from collections import deque
+from typing import Optional, Dict, Union, Iterator, Deque
 import logging
 from queue import Queue, Empty
 from threading import RLock
@@ -11,10 +12,20 @@ from datetime import timedelta
 
 from pyvisa import constants, attributes, rname
 from pyvisa_mock.base.base_mocker import BaseMocker, StbRegister
+from pyvisa_mock.base.blocks import split_blocks
+from pyvisa_mock.base.bus import Bus
+from pyvisa_mock.base.clock import Clock, RealClock
+from pyvisa_mock.base.compound import split_compound, is_query
+from pyvisa_mock.base.responses import StreamResponse, DeferredResponse
 
 
 logger = logging.getLogger()
 
+Reply = Union[str, bytes, bytearray, StreamResponse, DeferredResponse]
+
+_REAL_CLOCK = RealClock()
+_DEFAULT_TIMEOUT = attributes.AttributesByID[constants.VI_ATTR_TMO_VALUE].default
+
 
 class SessionError(Exception):
     pass
@@ -36,6 +47,35 @@ class EventNotSupportedError(SessionError):
     pass
 
 
+class QueryInterruptedError(SessionError):
+    pass
+
+
+class OutputQueueOverflowError(SessionError):
+    pass
+
+
+class IOTimeoutError(SessionError):
+    pass
+
+
+def has_query(message: Union[str, bytes]) -> bool:
+    """
+    Return True if a (compound) message contains a query. Strings and
+    binary blocks in the message are skipped.
+    """
+    if isinstance(message, str):
+        text = message
+    else:
+        text, _ = split_blocks(message)
+    return any(is_query(command) for command, _ in split_compound(text))
+
+
+def _close(reply: Reply) -> None:
+    if isinstance(reply, StreamResponse):
+        reply.close()
+
+
 class Session:
     _events: Dict[constants.EventType, Queue]
     _events_enabled: Dict[constants.EventType, bool]
@@ -45,6 +85,12 @@ class Session:
     _SUPPORTED_EVENTS = [
         constants.EventType.service_request,
         ]
+    # The output queue, set from the device. See the attributes of the
+    # same name of BaseMocker.
+    query_interrupted = "discard"
+    output_queue_size = 64
+    output_overflow = "error"
+    defer_queries = False
 
     def __init__(
             self,
@@ -68,7 +114,21 @@ class Session:
         self.session_type = None
         self.session_index = resource_manager_session
         self._device: Optional[BaseMocker] = None
-        self._read_buffer = ""
+        # The bus shared with the other sessions on the board, see bus.py
+        self.bus: Optional[Bus] = None
+        # The encoding of replies which are strings
+        self.encoding = "utf-8"
+        # The reply of the device. Bytes before the offset have been read
+        self._read_buffer = bytearray()
+        self._read_offset = 0
+        # The remaining chunks of a streamed reply
+        self._stream: Optional[StreamResponse] = None
+        self._chunks: Optional[Iterator] = None
+        # A reply which is computed when it is read
+        self._deferred: Optional[DeferredResponse] = None
+        # The responses queued after the reply in the read buffer. See the
+        # 'query_interrupted' attribute of the device.
+        self._responses: Deque[Reply] = deque()
         self._events: Dict[constants.EventType, Queue] = {
             i: Queue()
             for i in self._SUPPORTED_EVENTS
@@ -94,6 +154,26 @@ class Session:
                 'The stb register can\'t be accesses because there is no registered device')
         self._device.stb_register.value = stb
 
+    @property
+    def clock(self) -> Clock:
+        """
+        The clock of the device, which is used to wait for events.
+        """
+        if self._device is None:
+            return _REAL_CLOCK
+        return self._device.clock
+
+    @property
+    def timeout(self) -> Optional[float]:
+        """
+        The timeout of writes and reads in seconds (VI_ATTR_TMO_VALUE),
+        None if it is infinite.
+        """
+        timeout = self.attrs.get(constants.VI_ATTR_TMO_VALUE, _DEFAULT_TIMEOUT)
+        if timeout == constants.VI_TMO_INFINITE:
+            return None
+        return timeout / 1000
+
     @property
     def device(self) -> BaseMocker:
         return self._device
@@ -102,6 +182,10 @@ class Session:
     def device(self, dev: BaseMocker) -> None:
         self._device = dev
         self._device.events = dict(self._events)
+        self.query_interrupted = dev.query_interrupted
+        self.output_queue_size = dev.output_queue_size
+        self.output_overflow = dev.output_overflow
+        self.defer_queries = dev.defer_queries
 
     def get_attribute(self, attribute):  # TODO: type hints
         """
@@ -149,24 +233,223 @@ class Session:
 
         return constants.StatusCode.success
 
-    def write(self, message: str) -> None:
-        reply = self.device.send(message)
-        if reply is not None:
-            self._read_buffer = reply
+    def write(self, message: Union[str, bytes]) -> None:
+        """
+        Send a message to the device.
 
-    def read(self, count: int = None) -> str:
-        if count is None:
-            # Return everything
-            return self._read_buffer
+        Raises:
+            IOTimeoutError: If the delays of the device and the bus exceed
+                the timeout. The reply to the message is lost.
+        """
+        deadline = self._deadline()
+        self._transfer(len(message), deadline)
+
+        policy = self.query_interrupted
+        if policy == "discard":
+            # An unread deferred reply is replaced without computing it
+            reply = self._send(message, deadline)
+            if reply is not None:
+                self._set_reply(reply)
+            return
+
+        if policy == "error" and self.unread():
+            self.clear_output()
+            raise QueryInterruptedError(
+                f"{message!r} was send before the response to the previous query was read"
+            )
+
+        # Queued responses see the state of the device before the message
+        self._compute_deferred()
+        reply = self._send(message, deadline)
+        if reply is not None and has_query(message):
+            self._queue_reply(reply)
+
+    def _deadline(self) -> Optional[float]:
+        """
+        Return the time on the clock of the device at which a write or a
+        read which starts now times out, None if the timeout is infinite.
+        """
+        timeout = self.timeout
+        if timeout is None:
+            return None
+        return self.clock.time() + timeout
+
+    def _remaining(self, deadline: Optional[float]) -> Optional[float]:
+        if deadline is None:
+            return None
+        return max(deadline - self.clock.time(), 0.0)
+
+    def _send(self, message: Union[str, bytes], deadline: Optional[float]) -> Optional[Reply]:
+        timeout = self._remaining(deadline)
+        try:
+            if self.defer_queries:
+                return self.device.send(message, defer=True, timeout=timeout)
+            return self.device.send(message, timeout=timeout)
+        except TimeoutError as e:
+            raise IOTimeoutError(f"Timeout while sending {message!r}") from e
+
+    def _transfer(self, size: int, deadline: Optional[float]) -> None:
+        """
+        Transfer a message or a chunk of a reply on the bus of the board.
+        """
+        if self.bus is None:
+            return
+        try:
+            self.bus.transfer(size, self._remaining(deadline))
+        except TimeoutError as e:
+            raise IOTimeoutError(f"Timeout while transferring {size} bytes") from e
+
+    def _compute_deferred(self) -> None:
+        if self._deferred is not None:
+            self._fill(0)
+        if any(isinstance(reply, DeferredResponse) for reply in self._responses):
+            self._responses = deque(
+                reply() if isinstance(reply, DeferredResponse) else reply
+                for reply in self._responses
+            )
+
+    def _queue_reply(self, reply: Reply) -> None:
+        if not self.unread():
+            self._set_reply(reply)
+            return
+
+        if 1 + len(self._responses) >= self.output_queue_size:
+            overflow = self.output_overflow
+            if overflow == "drop_newest":
+                _close(reply)
+                return
+            if overflow == "drop_oldest":
+                self._next_reply()
+            else:
+                _close(reply)
+                raise OutputQueueOverflowError(
+                    f"The output queue holds {self.output_queue_size} unread responses"
+                )
+
+        self._responses.append(reply)
+
+    def _next_reply(self) -> None:
+        """
+        Drop the reply in the read buffer and move the next queued
+        response into it.
+        """
+        if self._responses:
+            self._set_reply(self._responses.popleft())
         else:
-            assert count >= 0
-            return_buffer = self._read_buffer[:count]
-            self._read_buffer = self._read_buffer[count:]
-            return return_buffer
+            self._set_reply(b"")
+
+    def unread(self) -> bool:
+        """
+        Return True if there are responses which have not been read.
+        """
+        return bool(self._responses) or self._deferred is not None or self.pending()
+
+    def clear_output(self) -> None:
+        """
+        Drop all unread responses, e.g. when the device is cleared.
+        """
+        while self._responses:
+            _close(self._responses.popleft())
+        self._set_reply(b"")
+
+    def _set_reply(self, reply: Reply) -> None:
+        self._close_stream()
+        self._read_offset = 0
+        self._deferred = None
+
+        if isinstance(reply, DeferredResponse):
+            self._read_buffer = bytearray()
+            self._deferred = reply
+        elif isinstance(reply, StreamResponse):
+            self._read_buffer = bytearray()
+            self._stream = reply
+            self._chunks = iter(reply)
+        elif isinstance(reply, str):
+            self._read_buffer = bytearray(reply, self.encoding)
+        else:
+            self._read_buffer = bytearray(reply)
+
+    def _close_stream(self) -> None:
+        if self._stream is not None:
+            self._stream.close()
+        self._stream = None
+        self._chunks = None
+
+    def _fill(self, count: Optional[int]) -> None:
+        """
+        Pull chunks from a streamed reply until the buffer holds 'count'
+        bytes, or until the end of the reply if count is None. A deferred
+        reply is computed first.
+        """
+        if self._deferred is not None:
+            self._set_reply(self._deferred())
+
+        while self._chunks is not None and (count is None or self.bytes_in_buffer < count):
+            try:
+                chunk = next(self._chunks)
+            except StopIteration:
+                self._stream = None
+                self._chunks = None
+                break
+            self._read_buffer += chunk
+
+    @property
+    def bytes_in_buffer(self) -> int:
+        return len(self._read_buffer) - self._read_offset
+
+    def pending(self) -> bool:
+        """
+        Return True if there is more of the reply to read.
+        """
+        self._fill(1)
+        return self.bytes_in_buffer > 0
+
+    def read(self, count: int = None) -> bytes:
+        """
+        Read from the reply of the device. Without a count, the remainder
+        of the reply is returned but not consumed. Streamed replies are
+        produced as far as needed. Once a reply has been read, the next
+        queued response is read.
+        """
+        deadline = self._deadline()
+        if self._responses and not self.pending():
+            self._next_reply()
+        return self._read(count, deadline)
+
+    def read_response(self) -> bytes:
+        """
+        Read and consume the remainder of the reply.
+        """
+        deadline = self._deadline()
+        if self._responses and not self.pending():
+            self._next_reply()
+        self._fill(None)
+        return self._read(self.bytes_in_buffer, deadline)
+
+    def _read(self, count: Optional[int], deadline: Optional[float]) -> bytes:
+        self._fill(count)
+
+        start = self._read_offset
+        if count is None:
+            return bytes(memoryview(self._read_buffer)[start:])
+
+        assert count >= 0
+        with memoryview(self._read_buffer) as view:
+            chunk = bytes(view[start:start + count])
+        self._read_offset = min(start + count, len(self._read_buffer))
+        self._transfer(len(chunk), deadline)
+
+        # Release the memory of the consumed part every now and then,
+        # such that reading in chunks remains linear in the reply size
+        if self._read_offset > len(self._read_buffer) // 2:
+            del self._read_buffer[:self._read_offset]
+            self._read_offset = 0
+
+        return chunk
 
     def ask(self, message: str):
         self.write(message)
-        return self.read()
+        return self.read_response()
 
     """
     Event Logic:
@@ -229,6 +512,6 @@ class Session:
             raise EventNotEnabledError('Event not enabled.')
         cur_event = self._events[event_type]
         try:
-            cur_event.get(timeout=timeout.total_seconds())
+            self.clock.get(cur_event, timeout.total_seconds())
         except Empty as e:
             raise EventTimeoutError() from e
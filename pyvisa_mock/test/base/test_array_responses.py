@@ -0,0 +1,48 @@
+import pytest
+from pyvisa import ResourceManager
+
+from pyvisa_mock.base.base_mocker import BaseMocker, scpi
+from pyvisa_mock.base.register import register_resource
+from pyvisa_mock.base.responses import array_response
+
+np = pytest.importorskip("numpy")
+
+
+class Digitizer(BaseMocker):
+    TRACE = np.linspace(-1, 1, 1000000)
+
+    @scpi("TRACe?")
+    def _trace(self) -> np.ndarray:
+        return self.TRACE
+
+    @scpi("TRACe:INTeger?", datatype="h", is_big_endian=True)
+    def _trace_int(self) -> np.ndarray:
+        return (self.TRACE[::2] * 1000).astype(np.int32)
+
+
+@pytest.fixture
+def resource():
+    register_resource("MOCK0::digitizer::INSTR", Digitizer())
+    return ResourceManager(visa_library="@mock").open_resource("MOCK0::digitizer::INSTR")
+
+
+def test_query_array(resource):
+    values = resource.query_binary_values("TRAC?", datatype="d", container=np.array)
+    assert np.array_equal(values, Digitizer.TRACE)
+
+
+def test_query_array_datatype(resource):
+    values = resource.query_binary_values(
+        "TRAC:INT?", datatype="h", is_big_endian=True, container=np.array
+    )
+    assert np.array_equal(values, (Digitizer.TRACE[::2] * 1000).astype(np.int16))
+
+
+def test_array_response_without_copy():
+    array = np.arange(10, dtype="<f4")
+    response = array_response(array)
+    assert response.header() == b"#240"
+
+    chunks = list(response)
+    # The data refers to the array buffer
+    assert np.shares_memory(np.frombuffer(chunks[1], dtype=np.uint8), array)
@@ -58,3 +58,17 @@ def test_read_binary_values(monkeypatch):
 
     data = resource.read_binary_values()
     assert data == [1.0, 2.0, 3.0]
+
+
+def test_read_raw_large_response(monkeypatch):
+    data = bytes(range(256)) * 1000
+    monkeypatch.setattr(instruments.Mocker7, "FETCH_DATA", data)
+
+    register_resources(instruments.resources)
+    rc = ResourceManager(visa_library="@mock")
+    resource: MessageBasedResource|Resource = rc.open_resource("MOCK0::mock7::INSTR")
+    resource.write("FETCh?")
+
+    # Larger than the chunk size, so this takes multiple reads
+    assert len(data) > resource.chunk_size
+    assert resource.read_raw() == data
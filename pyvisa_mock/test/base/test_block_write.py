@@ -0,0 +1,106 @@
+import pytest
+from pyvisa import ResourceManager
+
+from pyvisa_mock.base.base_mocker import BaseMocker, scpi
+from pyvisa_mock.base import blocks
+from pyvisa_mock.base.blocks import split_blocks
+from pyvisa_mock.base.register import register_resource
+
+
+class Generator(BaseMocker):
+    def __init__(self):
+        super().__init__()
+        self.data = {}
+
+    @scpi(":DATA<channel:int> <data:block>")
+    def _data(self, channel: int, data: memoryview) -> None:
+        self.data[channel] = bytes(data)
+
+    @scpi(":DATA<channel:int>?")
+    def _query_data(self, channel: int) -> bytes:
+        return self.data[channel]
+
+
+@pytest.fixture
+def generator():
+    return Generator()
+
+
+@pytest.fixture
+def resource(generator):
+    register_resource("MOCK0::generator::INSTR", generator)
+    return ResourceManager(visa_library="@mock").open_resource("MOCK0::generator::INSTR")
+
+
+def test_definite_block(generator):
+    generator.send(b":DATA1 #210\x00\x01\r\n:;#0\xff\xfe\n")
+    assert generator.data[1] == b"\x00\x01\r\n:;#0\xff\xfe"
+
+
+def test_indefinite_block(generator):
+    generator.send(b":DATA2 #0\x00\x01\x02\n")
+    assert generator.data[2] == b"\x00\x01\x02"
+
+
+def test_text_messages(generator):
+    generator.send(":DATA3 #13abc")
+    assert generator.send(":DATA3?") == b"abc"
+
+
+def test_quoted_text():
+
+    class Display(Generator):
+        @scpi(":DISPlay:TEXT <text:str>")
+        def _set_text(self, text: str) -> None:
+            self.text = text
+
+    display = Display()
+    assert split_blocks(b':DISP:TEXT "#3abc"') == (':DISP:TEXT "#3abc"', [])
+    display.send(b':DISP:TEXT "#3abc";:DATA1 #13xyz;:DISP:TEXT \'#0\'')
+    assert display.text == "'#0'"
+    assert display.data[1] == b"xyz"
+
+
+def test_write_raw(resource, generator):
+    resource.write_raw(b":DATA1 #14\x00\x80\xff\x7f")
+    assert generator.data[1] == b"\x00\x80\xff\x7f"
+
+
+def test_invalid_blocks():
+    with pytest.raises(ValueError):
+        split_blocks(b":DATA #9123")
+
+    with pytest.raises(ValueError):
+        split_blocks(b":DATA #15abc")
+
+
+def test_block_array(resource):
+    np = pytest.importorskip("numpy")
+
+    class Waveform(BaseMocker):
+        received = None
+
+        @scpi(":WAVeform <data:block>", datatype="f")
+        def _waveform(self, data: np.ndarray) -> None:
+            Waveform.received = data
+
+    register_resource("MOCK0::waveform::INSTR", Waveform())
+    waveform = ResourceManager(visa_library="@mock").open_resource(
+        "MOCK0::waveform::INSTR"
+    )
+
+    values = np.linspace(0, 1, 1000, dtype=np.float32)
+    waveform.write_binary_values(":WAV ", values, datatype="f")
+    assert np.array_equal(Waveform.received, values)
+
+
+def test_block_array_without_numpy(monkeypatch):
+
+    class Waveform(BaseMocker):
+        @scpi(":WAVeform <data:block>", datatype="f")
+        def _waveform(self, data: bytes) -> None:
+            pass
+
+    monkeypatch.setattr(blocks, "np", None)
+    with pytest.raises(ImportError):
+        Waveform().send(b":WAV #14abcd")
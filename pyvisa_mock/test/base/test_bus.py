@@ -0,0 +1,100 @@
+from threading import Thread
+
+import pytest
+from pyvisa import ResourceManager
+
+from pyvisa_mock.base.base_mocker import BaseMocker, scpi
+from pyvisa_mock.base.bus import Bus
+from pyvisa_mock.base.clock import VirtualClock
+from pyvisa_mock.base.register import register_bus, register_resource
+
+
+class Source(BaseMocker):
+    def __init__(self) -> None:
+        super().__init__()
+        self.voltage = 0.0
+
+    @scpi("VOLTage <voltage:float>")
+    def _set_voltage(self, voltage: float) -> None:
+        self.voltage = voltage
+
+    @scpi("VOLTage?")
+    def _get_voltage(self) -> float:
+        return self.voltage
+
+
+def test_transfer_rate():
+    clock = VirtualClock()
+    bus = Bus(bytes_per_second=1000, overhead=0.001, clock=clock)
+
+    bus.transfer(500)
+    assert clock.time() == pytest.approx(0.501)
+    bus.transfer(100)
+    assert clock.time() == pytest.approx(0.602)
+    assert bus.info() == (2, 600, pytest.approx(0.602))
+
+
+def test_unlimited_rate():
+    clock = VirtualClock()
+    bus = Bus(overhead=0.002, clock=clock)
+
+    bus.transfer(10 ** 9)
+    assert clock.time() == pytest.approx(0.002)
+
+
+def test_burst():
+    clock = VirtualClock()
+    bus = Bus(bytes_per_second=1000, burst=400, clock=clock)
+
+    bus.transfer(300)
+    assert clock.time() == 0
+    # 100 bytes are left in the bucket
+    bus.transfer(300)
+    assert clock.time() == pytest.approx(0.2)
+
+    # The bucket refills while the bus is idle, up to the burst size
+    clock.advance(10)
+    bus.transfer(400)
+    assert clock.time() == pytest.approx(10.2)
+
+
+def test_transfers_are_serialized():
+    clock = VirtualClock()
+    bus = Bus(bytes_per_second=1000, clock=clock)
+
+    def transfer():
+        for _ in range(10):
+            bus.transfer(100)
+
+    threads = [Thread(target=transfer) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert clock.time() == pytest.approx(4.0)
+    assert bus.info().transactions == 40
+
+
+def test_sessions_share_bus():
+    clock = VirtualClock()
+    bus = Bus(bytes_per_second=100, overhead=0.01, clock=clock)
+    register_bus("7", bus)
+    register_resource("MOCK7::source1::INSTR", Source())
+    register_resource("MOCK7::source2::INSTR", Source())
+    register_resource("MOCK8::source3::INSTR", Source())
+
+    rm = ResourceManager(visa_library="@mock")
+    first = rm.open_resource("MOCK7::source1::INSTR")
+    second = rm.open_resource("MOCK7::source2::INSTR")
+    other = rm.open_resource("MOCK8::source3::INSTR")
+
+    first.write("VOLT 1.5")
+    assert second.query("VOLT?") == "0.0"
+    assert other.query("VOLT?") == "0.0"
+
+    transactions, size, busy = bus.info()
+    # The write and the query of the sessions on board 7
+    assert transactions == 3
+    assert busy == pytest.approx(3 * 0.01 + size / 100)
+    assert clock.time() == pytest.approx(busy)
@@ -0,0 +1,72 @@
+import time
+from queue import Queue, Empty
+
+import pytest
+from pyvisa import ResourceManager
+
+from pyvisa_mock.base.clock import ScaledClock, VirtualClock
+from pyvisa_mock.base.register import register_resource
+from pyvisa_mock.test.mock_instruments.instruments import Mocker1, Mocker5
+
+
+def test_virtual_clock():
+    clock = VirtualClock()
+    calls = []
+    clock.call_later(2, calls.append, "second")
+    clock.call_later(1, calls.append, "first")
+    cancelled = clock.call_later(1.5, calls.append, "cancelled")
+    cancelled.cancel()
+
+    clock.sleep(1.2)
+    assert calls == ["first"]
+    assert clock.time() == pytest.approx(1.2)
+
+    clock.advance(10)
+    assert calls == ["first", "second"]
+    assert clock.time() == pytest.approx(11.2)
+
+
+def test_virtual_clock_get():
+    clock = VirtualClock()
+    queue = Queue()
+    clock.call_later(5, queue.put, "event")
+
+    with pytest.raises(Empty):
+        clock.get(queue, timeout=1)
+    assert clock.time() == pytest.approx(1)
+
+    assert clock.get(queue, timeout=10) == "event"
+    assert clock.time() == pytest.approx(5)
+
+
+def test_scaled_clock():
+    clock = ScaledClock(100)
+    start = time.time()
+    clock.sleep(5)
+    assert time.time() - start < 1
+
+
+def test_virtual_call_delay():
+    mocker = Mocker1()
+    mocker.clock = VirtualClock()
+    mocker.set_call_delay(3600)
+
+    start = time.time()
+    mocker.send(":INSTR:CHANNEL1:VOLT?")
+    assert time.time() - start < 1
+    assert mocker.clock.time() == pytest.approx(3600)
+
+
+def test_virtual_measurement():
+    mocker = Mocker5(clock=VirtualClock())
+    mocker.meas_time = 60
+    register_resource("MOCK0::virtual::INSTR", mocker)
+    resource = ResourceManager(visa_library="@mock").open_resource("MOCK0::virtual::INSTR")
+
+    resource.write(":INSTR:CHANNEL1:VOLT 12")
+    resource.write(":INSTR:CHANNEL1:MEAS")
+    start = time.time()
+    resource.wait_for_srq(timeout=120 * 1000)
+    assert time.time() - start < 1
+    assert mocker.clock.time() == pytest.approx(60)
+    assert resource.query(":INSTR:CHANNEL1:REAd?") == "12.0"
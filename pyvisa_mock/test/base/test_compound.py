@@ -0,0 +1,99 @@
+import pytest
+from pyvisa import ResourceManager
+
+from pyvisa_mock.base.base_mocker import BaseMocker, scpi
+from pyvisa_mock.base.clock import VirtualClock
+from pyvisa_mock.base.register import register_resource
+
+
+class Source(BaseMocker):
+    def __init__(self):
+        super().__init__()
+        self.settings = {}
+
+    @scpi(":SOURce:VOLTage <value:float>")
+    def _set_voltage(self, value: float) -> None:
+        self.settings["voltage"] = value
+
+    @scpi(":SOURce:CURRent <value:float>")
+    def _set_current(self, value: float) -> None:
+        self.settings["current"] = value
+
+    @scpi(":SOURce:VOLTage?")
+    def _get_voltage(self) -> float:
+        return self.settings["voltage"]
+
+    @scpi(":SOURce:CURRent?")
+    def _get_current(self) -> float:
+        return self.settings["current"]
+
+    @scpi(":OUTPut <state:bool>")
+    def _set_output(self, state: str) -> None:
+        self.settings["output"] = state
+
+    @scpi(":DISPlay:TEXT <text:str>")
+    def _set_text(self, text: str) -> None:
+        self.settings["text"] = text
+
+    @scpi("*OPC?")
+    def _opc(self) -> int:
+        return 1
+
+
+@pytest.fixture
+def source():
+    return Source()
+
+
+def test_compound_message(source):
+    response = source.send(":SOUR:VOLT 1;:SOUR:CURR 0.1;*OPC?")
+    assert response == "1"
+    assert source.settings == {"voltage": 1.0, "current": 0.1}
+
+
+def test_relative_headers(source):
+    source.send(":SOURce:VOLTage 2;CURRent 0.2;*OPC?;VOLT 3;:OUTP ON")
+    assert source.settings == {"voltage": 3.0, "current": 0.2, "output": "ON"}
+
+
+def test_joined_responses(source):
+    source.send(":SOUR:VOLT 1.5;CURR 0.5")
+    assert source.send(":SOUR:VOLT?;CURR?;*OPC?") == "1.5;0.5;1"
+
+
+def test_quoted_semicolon(source):
+    source.send(":DISP:TEXT 'a;b';:OUTP OFF;")
+    assert source.settings == {"text": "'a;b'", "output": "OFF"}
+
+
+def test_quoted_semicolon_single_command():
+
+    class Display(BaseMocker):
+        @scpi(":DISPlay:TEXT <text:str>")
+        def _set_text(self, text: str) -> None:
+            self.shown_at = self.clock.time()
+
+    # As any single command, the call delay passes before the handler is
+    # called, while a batch calls the handlers first
+    display = Display(call_delay=1.0, clock=VirtualClock())
+    display.send(':DISP:TEXT "a;b"')
+    assert display.shown_at == 1.0
+
+
+def test_unknown_command(source):
+    with pytest.raises(ValueError):
+        source.send(":SOUR:VOLT 1;POWer 2")
+    assert source.settings == {}
+
+
+def test_unknown_suffix(source):
+    # The unit suffix is checked before any handler is called
+    with pytest.raises(ValueError):
+        source.send(":SOUR:VOLT 1;:SOUR:CURR 2 junk")
+    assert source.settings == {}
+
+
+def test_compound_query(source):
+    register_resource("MOCK0::source::INSTR", source)
+    resource = ResourceManager(visa_library="@mock").open_resource("MOCK0::source::INSTR")
+    assert resource.query(":SOUR:VOLT 4;CURR 0.4;VOLT?;CURR?") == "4.0;0.4"
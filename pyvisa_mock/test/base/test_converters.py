@@ -0,0 +1,123 @@
+import pytest
+
+from pyvisa_mock.base.base_mocker import BaseMocker, scpi
+from pyvisa_mock.base.converters import (
+    NumericKeyword, to_float, to_int, to_bool, register_converter, get_converter
+)
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("1.5", 1.5),
+    ("1.5E+3", 1500.0),
+    ("-.5e-1", -0.05),
+    ("#H1F", 31.0),
+    ("20 mV", 0.02),
+    ("2.5kHz", 2500.0),
+    ("1MHZ", 1E6),
+    ("1.5A", 1.5),
+    ("3MA", 0.003),
+    ("INF", 9.9E37),
+])
+def test_to_float(value, expected):
+    assert to_float(value) == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("min", NumericKeyword.MINIMUM),
+    ("MAXimum", NumericKeyword.MAXIMUM),
+    ("DEF", NumericKeyword.DEFAULT),
+])
+def test_numeric_keywords(value, expected):
+    assert to_float(value) is expected
+    assert to_int(value) is expected
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("12", 12),
+    ("-3", -3),
+    ("#H1F", 31),
+    ("#q17", 15),
+    ("#B101", 5),
+    ("1E3", 1000),
+    ("MAX", NumericKeyword.MAXIMUM),
+    (4, 4),
+])
+def test_to_int(value, expected):
+    assert to_int(value) == expected
+
+
+@pytest.mark.parametrize("value", ["1.5", "abc", "1 XV", "#H1G"])
+def test_invalid_values(value):
+    with pytest.raises(ValueError):
+        to_int(value)
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("ON", True),
+    ("on", True),
+    ("1", True),
+    ("OFF", False),
+    ("0", False),
+    (0, False),
+])
+def test_to_bool(value, expected):
+    assert to_bool(value) is expected
+
+
+def test_bool_parameter():
+
+    class Mocker(BaseMocker):
+        @scpi(":OUTPut <state:bool>")
+        def _set_output(self, state: bool) -> None:
+            self.output = state
+
+    mocker = Mocker()
+    mocker.send(":OUTP OFF")
+    assert mocker.output is False
+    mocker.send(":OUTP 1")
+    assert mocker.output is True
+    mocker.send(":OUTP 0")
+    assert mocker.output is False
+
+    with pytest.raises(ValueError):
+        to_bool("maybe")
+
+
+def test_register_converter():
+
+    class Mode(str):
+        pass
+
+    assert get_converter(Mode) is Mode
+    register_converter(Mode, lambda value: Mode(value.upper()))
+
+    class Mocker(BaseMocker):
+        @scpi(":MODE <mode>")
+        def _set_mode(self, mode: Mode) -> None:
+            self.mode = mode
+
+    mocker = Mocker()
+    mocker.send(":MODE auto")
+    assert mocker.mode == "AUTO"
+
+
+def test_keyword_arguments_converted_by_name():
+
+    class Mocker(BaseMocker):
+        # The order of the parameters differs from the scpi string
+        @scpi(":CONFigure <mode>,<value>")
+        def _configure(self, value: float, mode: str) -> None:
+            self.config = (value, mode)
+
+        @scpi(":VOLTage <value:float>")
+        def _set_voltage(self, value: float) -> None:
+            self.voltage = value
+
+    mocker = Mocker()
+    mocker.send(":CONF volt,1.5E+3")
+    assert mocker.config == (1500.0, "volt")
+
+    mocker.send(":VOLT 20mV")
+    assert mocker.voltage == pytest.approx(0.02)
+    mocker.send(":VOLT MAX")
+    assert mocker.voltage is NumericKeyword.MAXIMUM
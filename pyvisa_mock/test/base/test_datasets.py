@@ -0,0 +1,104 @@
+import pytest
+from pyvisa import ResourceManager
+
+from pyvisa_mock.base.base_mocker import BaseMocker, MockingError, scpi, scpi_dataset
+from pyvisa_mock.base.register import register_resource
+from pyvisa_mock.base.responses import array_response
+
+np = pytest.importorskip("numpy")
+
+CAPTURE = np.arange(10000, dtype=np.int16)
+
+
+class Scope(BaseMocker):
+    def __init__(self, path, **kwargs):
+        super().__init__()
+        self._curve = self.map_dataset(path, **kwargs)
+
+    _get_curve = scpi_dataset(":CURVe?", "_curve", datatype="h")
+
+
+@pytest.fixture(params=["npy", "raw"])
+def scope(request, tmp_path):
+    if request.param == "npy":
+        path = tmp_path / "capture.npy"
+        np.save(path, CAPTURE)
+        return Scope(path)
+
+    path = tmp_path / "capture.bin"
+    path.write_bytes(b"HEADER" + CAPTURE.tobytes())
+    return Scope(path, datatype="h", offset=6)
+
+
+@pytest.fixture
+def resource(scope):
+    register_resource("MOCK0::scope::INSTR", scope)
+    return ResourceManager(visa_library="@mock").open_resource("MOCK0::scope::INSTR")
+
+
+def test_query_dataset(resource):
+    values = resource.query_binary_values(":CURV?", datatype="h", container=np.array)
+    assert np.array_equal(values, CAPTURE)
+
+
+def test_query_slice(resource):
+    resource.write(":DAT:STAR 101")
+    resource.write(":DAT:STOP 200")
+    values = resource.query_binary_values(":CURV?", datatype="h", container=np.array)
+    assert np.array_equal(values, CAPTURE[100:200])
+    assert resource.query(":DAT:STAR?") == "101"
+    assert resource.query(":DAT:STOP?") == "200"
+
+
+def test_default_selection(scope):
+    assert scope.send(":DATA:START?") == "1"
+    assert scope.send(":DATA:STOP?") == str(len(CAPTURE))
+
+
+def test_selection_per_instance(tmp_path):
+    path = tmp_path / "capture.npy"
+    np.save(path, CAPTURE)
+    first, second = Scope(path), Scope(path)
+    first.send(":DAT:STOP 10")
+    assert second.send(":DAT:STOP?") == str(len(CAPTURE))
+
+
+def test_select(scope):
+    dataset = scope._curve
+    assert np.array_equal(dataset.select(20, 11), CAPTURE[10:20])
+    assert np.array_equal(dataset.select(0, 20000), CAPTURE)
+
+
+def test_served_from_mapping(scope):
+    dataset = scope._curve
+    response = array_response(dataset.select(1, 100), "h")
+    _, chunk = iter(response)
+    assert np.shares_memory(np.asarray(chunk), dataset.array)
+
+
+def test_raw_file_needs_datatype(tmp_path):
+    path = tmp_path / "capture.bin"
+    path.write_bytes(CAPTURE.tobytes())
+    with pytest.raises(ValueError):
+        BaseMocker.map_dataset(path)
+
+
+def test_duplicate_selection():
+    with pytest.raises(MockingError, match="already registered"):
+
+        class TwoChannels(BaseMocker):
+            _get_first = scpi_dataset(":CH1:CURVe?", "_first")
+            _get_second = scpi_dataset(":CH2:CURVe?", "_second")
+
+    class OwnSelections(BaseMocker):
+        _get_first = scpi_dataset(":CH1:CURVe?", "_first", ":CH1:STARt", ":CH1:STOP")
+        _get_second = scpi_dataset(":CH2:CURVe?", "_second", ":CH2:STARt", ":CH2:STOP")
+
+    with pytest.raises(MockingError, match="already registered by a dataset"):
+
+        class Replaced(BaseMocker):
+            _get_curve = scpi_dataset(":CURVe?", "_curve")
+
+            @scpi(":DATa:STARt <value:int>")
+            def _set_start(self, value: int) -> None:
+                pass
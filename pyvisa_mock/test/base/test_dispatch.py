@@ -0,0 +1,303 @@
+import re
+import timeit
+
+import pytest
+
+from pyvisa_mock.base.base_mocker import (
+    BaseMocker, MockingError, scpi, compile_regular_expression
+)
+from pyvisa_mock.base.dispatch import SCPITrie, keyword_forms, split_scpi_string
+from pyvisa_mock.test.mock_instruments.instruments import Mocker4, MockerChannel
+
+
+def test_keyword_forms():
+    assert keyword_forms("VOLTage") == ["VOLT", "VOLTAGE"]
+    assert keyword_forms("*IDN") == ["*IDN"]
+    assert keyword_forms("passFAIL") == ["PASSFAIL"]
+    assert keyword_forms("CHAnnelAbc") == [
+        "CHAA", "CHAABC", "CHANNELA", "CHANNELABC"
+    ]
+
+
+def test_split_scpi_string():
+    assert split_scpi_string("*IDN?") == ([], "*IDN?")
+    assert split_scpi_string(":VOLTage?") == ([""], "VOLTage?")
+    assert split_scpi_string(":SOURce:VOLTage:LEVel <value>") == (
+        ["", "SOURce", "VOLTage"], "LEVel <value>"
+    )
+    # Keywords with parameters are stored in the trie as well
+    assert split_scpi_string(":INSTRument<n>:VOLTage?") == (
+        ["", "INSTRument<n>"], "VOLTage?"
+    )
+    # Stop at a segment with arguments
+    assert split_scpi_string(":CONFigure <mode>:VOLTage?") == (
+        [""], "CONFigure <mode>:VOLTage?"
+    )
+
+
+@pytest.mark.parametrize("message", [
+    ":SOURce:VOLTage:LEVel 1.2",
+    ":sour:volt:lev 1.2",
+    ":SOURCE:VOLT:LEVEL 1.2",
+    ":SOUR:VOLTAGE:LEVELS 1.2",
+    ":SOURc:VOLT:LEV 1.2",
+    "SOUR:VOLT:LEV 1.2",
+    ":SOUR:CURR:LEV 1.2",
+    ":VOLT 1.2",
+    ":SOUR:VOLT:LEV:IMM 1.2",
+])
+def test_trie_agrees_with_regex(message):
+    """
+    The trie should find exactly those entries whose regex matches.
+    """
+    scpi_strings = [
+        ":SOURce:VOLTage:LEVel <value>",
+        ":SOURce:VOLTage:LEVel?",
+        ":SOURce:CURRent:LEVel <value>",
+        ":SOURce<n>:VOLTage <value>",
+        "[:SOURce]:VOLTage[:LEVel][:IMMediate] <value:float>",
+        "*IDN?",
+    ]
+
+    trie = SCPITrie()
+    for scpi_string in scpi_strings:
+        regex = compile_regular_expression(scpi_string)
+        trie.add_scpi(scpi_string, re.compile(regex), scpi_string)
+
+    found = [match.handler for match in trie.iter_matches(message)]
+    expected = [
+        scpi_string for scpi_string in scpi_strings
+        if re.match(compile_regular_expression(scpi_string), message)
+    ]
+    assert sorted(found) == sorted(expected)
+
+
+def test_many_commands():
+
+    class ManyCommands(BaseMocker):
+        for index in range(500):
+            @scpi(f":SUBSystem{index}:VALue?")
+            def _get_value(self) -> str:
+                return "value"
+
+    mocker = ManyCommands()
+    assert mocker.send(":SUBS123:VAL?") == "value"
+    assert mocker.send(":subsystem499:value?") == "value"
+
+    with pytest.raises(ValueError, match='Unknown SCPI command'):
+        mocker.send(":SUBS500:VAL?")
+
+
+def _mid_header_commands(count: int, typed: bool) -> BaseMocker:
+    channel = "<channel:int>" if typed else "<channel>"
+    value = "<value:float>" if typed else "<value>"
+
+    class MidHeader(BaseMocker):
+        for index in range(count):
+            @scpi(f":INSTRument:CHANNEL{channel}:COMMand{index} {value}")
+            def _set(self, channel: int, value: float) -> None:
+                self.value = value
+
+    return MidHeader()
+
+
+@pytest.mark.parametrize("typed", [True, False])
+def test_mid_header_parameters_scale(typed):
+    """
+    The keywords after a keyword with parameters are stored in the trie,
+    so the time to find a handler does not grow with the number of
+    commands below it.
+    """
+    def send_time(count: int) -> float:
+        mocker = _mid_header_commands(count, typed)
+        message = f":INSTR:CHANNEL1:COMM{count // 2} 1.5"
+        mocker.send(message)
+        assert float(mocker.value) == 1.5
+        return min(timeit.repeat(lambda: mocker.send(message), number=200, repeat=5))
+
+    assert send_time(1000) < 3 * send_time(100)
+
+
+def test_submodule_dispatch():
+    mocker = Mocker4()
+    mocker.send(":INSTRument2:CHANNEL1:VOLTage 1.5")
+    assert mocker.send(":INSTR2:CHANNEL1:VOLT?") == "1.5"
+    assert mocker.send(":INSTR1:CHANNEL1:VOLT?") == "0"
+
+
+class LazyMocker3(BaseMocker):
+
+    def __init__(self, call_delay: float = 0.0) -> None:
+        super().__init__(call_delay=call_delay)
+        self._channels = {
+            1: MockerChannel(),
+            2: MockerChannel()
+        }
+
+    @scpi(":CHANNEL<number>", lazy=True)
+    def _channel(self, number: int) -> MockerChannel:
+        return self._channels[number]
+
+
+class LazyMocker4(BaseMocker):
+
+    def __init__(self, call_delay: float = 0.0) -> None:
+        super().__init__(call_delay=call_delay)
+        self._instruments = {
+            1: LazyMocker3(),
+            2: LazyMocker3()
+        }
+
+    @scpi(":INSTRument<instrument_num>", lazy=True)
+    def _instrument(self, instrument_num: int) -> LazyMocker3:
+        return self._instruments[instrument_num]
+
+    @scpi("*IDN?")
+    def _idn(self) -> str:
+        return "lazy"
+
+
+def test_untyped_overlap():
+    """
+    No example message shows that these overlap, both match ":ABC".
+    """
+
+    class Untyped(BaseMocker):
+        @scpi(":A<x>C")
+        def _a(self, x: str) -> str:
+            return "a"
+
+        @scpi(":AB<y>")
+        def _ab(self, y: str) -> str:
+            return "ab"
+
+        @scpi(":B<z>")
+        def _b(self, z: str) -> str:
+            return "b"
+
+        @scpi(":A:D?")
+        def _d(self) -> str:
+            return "d"
+
+    assert Untyped.ambiguous_patterns() == [
+        (compile_regular_expression(":A<x>C"), compile_regular_expression(":AB<y>")),
+        (compile_regular_expression(":A<x>C"), compile_regular_expression(":A:D?")),
+    ]
+
+    mocker = Untyped()
+    with pytest.raises(MockingError):
+        mocker.send(":ABC")
+    assert mocker.send(":AB") == "ab"
+    assert mocker.send(":B1") == "b"
+    assert mocker.send(":A:D?") == "d"
+
+
+def test_untyped_disjoint():
+    """
+    The literal text before the parameters shows that these never match the
+    same message.
+    """
+
+    class Disjoint(BaseMocker):
+        @scpi(":SOURce:VOLTage <value>")
+        def _set_voltage(self, value: str) -> None:
+            self.voltage = value
+
+        @scpi(":SOURce:VOLTage?")
+        def _get_voltage(self) -> str:
+            return self.voltage
+
+        @scpi(":SOURce:CMD1 <value>")
+        def _cmd1(self, value: str) -> None:
+            self.cmd = 1
+
+        @scpi(":SOURce:CMD10 <value>")
+        def _cmd10(self, value: str) -> None:
+            self.cmd = 10
+
+    assert Disjoint.ambiguous_patterns() == []
+
+    mocker = Disjoint()
+    mocker.send(":SOUR:VOLT 1.5")
+    assert mocker.send(":SOUR:VOLT?") == "1.5"
+    mocker.send(":SOUR:CMD10 1")
+    assert mocker.cmd == 10
+
+
+def test_lazy_submodule_dispatch():
+    # Only the headers are added to the parent classes
+    assert len(LazyMocker3.__scpi_dict__) == 1
+    assert len(LazyMocker4.__scpi_dict__) == 2
+
+    mocker = LazyMocker4()
+    mocker.send(":INSTRument2:CHANNEL1:VOLTage 1.5")
+    assert mocker.send(":instr2:channel1:volt?") == "1.5"
+    assert mocker.send(":INSTR1:CHANNEL1:VOLT?") == "0"
+    assert mocker.send("*IDN?") == "lazy"
+
+    for message in [":INSTR1:CHANNEL1:CURR?", ":INSTR1", ":INSTR1:VOLT?"]:
+        with pytest.raises(ValueError, match='Unknown SCPI command'):
+            mocker.send(message)
+
+
+def test_lazy_submodule_of_submodule():
+
+    class Rack(BaseMocker):
+        def __init__(self, call_delay: float = 0.0) -> None:
+            super().__init__(call_delay=call_delay)
+            self.instrument = LazyMocker3()
+
+        @scpi(":INSTRument")
+        def _instrument(self) -> LazyMocker3:
+            return self.instrument
+
+    mocker = Rack()
+    mocker.send(":INSTR:CHANNEL2:VOLT 1.5")
+    assert mocker.send(":INSTR:CHANNEL2:VOLT?") == "1.5"
+    assert mocker.send(":INSTR:CHANNEL1:VOLT?") == "0"
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_cache_submodule(lazy):
+
+    class Rack(BaseMocker):
+        def __init__(self, call_delay: float = 0.0) -> None:
+            super().__init__(call_delay=call_delay)
+            self.created = []
+
+        @scpi(":SLOT<slot>", lazy=lazy, cache_submodule=True)
+        def _slot(self, slot: int) -> Mocker4:
+            # A new submodule on every call, unless it is cached
+            self.created.append(slot)
+            return Mocker4()
+
+    rack = Rack()
+    rack.send(":SLOT1:INSTR2:CHANNEL1:VOLT 1.5")
+    rack.send(":SLOT2:INSTR2:CHANNEL1:VOLT 2.5")
+    assert rack.send(":SLOT1:INSTR2:CHANNEL1:VOLT?") == "1.5"
+    assert rack.send(":SLOT2:INSTR2:CHANNEL1:VOLT?") == "2.5"
+    assert rack.created == [1, 2]
+
+    # The cache is per instance
+    assert Rack().send(":SLOT1:INSTR2:CHANNEL1:VOLT?") == "0"
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_cache_submodule_unhashable(lazy):
+
+    class Rack(BaseMocker):
+        def __init__(self, call_delay: float = 0.0) -> None:
+            super().__init__(call_delay=call_delay)
+            self.created = []
+
+        @scpi(":GROup<slots>", lazy=lazy, cache_submodule=True)
+        def _group(self, slots: list) -> Mocker4:
+            # A list cannot be a key, the submodule is cached per message
+            self.created.append(slots)
+            return Mocker4()
+
+    rack = Rack()
+    rack.send(":GROup12:INSTR2:CHANNEL1:VOLT 1.5")
+    assert rack.send(":GRO12:INSTR2:CHANNEL1:VOLT?") == "1.5"
+    assert rack.send(":GRO13:INSTR2:CHANNEL1:VOLT?") == "0"
+    assert rack.created == [["1", "2"], ["1", "3"]]
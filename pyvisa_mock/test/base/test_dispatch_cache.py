@@ -0,0 +1,77 @@
+import pytest
+
+from pyvisa_mock.base.base_mocker import BaseMocker, scpi
+
+
+class CachedMocker(BaseMocker):
+    dispatch_cache_size = 2
+
+    def __init__(self, call_delay: float = 0.0) -> None:
+        super().__init__(call_delay=call_delay)
+        self._voltage = 0.0
+
+    @scpi(":VOLTage <value>")
+    def _set_voltage(self, value: float) -> None:
+        self._voltage = value
+
+    @scpi(":VOLTage?")
+    def _get_voltage(self) -> float:
+        return self._voltage
+
+
+def test_cache_hits_and_misses():
+    CachedMocker.clear_dispatch_cache()
+    mocker = CachedMocker()
+
+    mocker.send(":VOLT 1.5")
+    assert mocker.send(":VOLT?") == "1.5"
+    assert mocker.send(":VOLT?") == "1.5"
+    # The arguments are part of the cached resolution
+    mocker.send(":VOLT 2.5")
+    assert mocker.send(":VOLT?") == "2.5"
+
+    info = CachedMocker.dispatch_cache_info()
+    assert info.hits == 2
+    assert info.misses == 3
+    assert info.maxsize == 2
+    assert info.currsize == 2
+
+
+def test_negative_cache():
+    CachedMocker.clear_dispatch_cache()
+    mocker = CachedMocker()
+
+    for _ in range(2):
+        with pytest.raises(ValueError, match='Unknown SCPI command'):
+            mocker.send(":CURRent?")
+
+    info = CachedMocker.dispatch_cache_info()
+    assert info.hits == 1
+    assert info.misses == 1
+
+
+def test_cache_per_class():
+
+    class Uncached(BaseMocker):
+        @scpi("*IDN?")
+        def _idn(self) -> str:
+            return "uncached"
+
+    assert Uncached.dispatch_cache_info() is None
+    Uncached.enable_dispatch_cache(maxsize=16)
+    assert Uncached().send("*IDN?") == "uncached"
+    assert Uncached.dispatch_cache_info().misses == 1
+    assert CachedMocker.dispatch_cache_info().maxsize == 2
+
+    Uncached.disable_dispatch_cache()
+    assert Uncached.dispatch_cache_info() is None
+
+
+def test_call_delay_keeps_cache():
+    mocker = CachedMocker()
+    mocker.send(":VOLT?")
+    assert CachedMocker.dispatch_cache_info().currsize > 0
+
+    # Call delays are set per instance, the cached handlers do not change
+    mocker.set_call_delay(0.0, ":VOLTage?")
+    assert CachedMocker.dispatch_cache_info().currsize > 0
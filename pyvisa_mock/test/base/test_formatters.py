@@ -0,0 +1,52 @@
+import pytest
+
+from pyvisa_mock.base.base_mocker import BaseMocker, scpi
+from pyvisa_mock.base.formatters import Formatter
+
+
+class Meter(BaseMocker):
+    @scpi("MEASure:VOLTage?", fmt=".6E")
+    def _voltage(self) -> float:
+        return 0.1 + 0.2
+
+    @scpi("MEASure:CURRent?", fmt=".3f")
+    def _currents(self) -> list:
+        return [1, 0.5, -2.25]
+
+    @scpi("MEASure:COUNt?", fmt="d")
+    def _count(self) -> tuple:
+        return 1, 2, 3
+
+    @scpi("SYSTem:ERRor?", fmt=lambda value: f'"{value}"')
+    def _error(self) -> str:
+        return "No error"
+
+    @scpi("READ?")
+    def _read(self) -> float:
+        return 0.1 + 0.2
+
+
+def test_formatted_responses():
+    meter = Meter()
+    assert meter.send("MEAS:VOLT?") == "3.000000E-01"
+    assert meter.send("MEAS:CURR?") == "1.000,0.500,-2.250"
+    assert meter.send("MEAS:COUN?") == "1,2,3"
+    assert meter.send("SYST:ERR?") == '"No error"'
+    assert meter.send("READ?") == "0.30000000000000004"
+
+
+def test_formatted_array():
+    np = pytest.importorskip("numpy")
+
+    class Scope(BaseMocker):
+        @scpi("TRACe?", fmt="+.2e")
+        def _trace(self) -> np.ndarray:
+            return np.array([[0.5, -1.0], [2.0, 0.0]])
+
+    assert Scope().send("TRAC?") == "+5.00e-01,-1.00e+00,+2.00e+00,+0.00e+00"
+
+
+@pytest.mark.parametrize("fmt", [".3x", "{:.3f}", "3E."])
+def test_invalid_format(fmt):
+    with pytest.raises(ValueError):
+        Formatter(fmt)
@@ -0,0 +1,202 @@
+import re
+import pytest
+
+from pyvisa_mock.base.base_mocker import BaseMocker, scpi, compile_regular_expression
+from pyvisa_mock.base.converters import NumericKeyword
+from pyvisa_mock.base.grammar import SCPIGrammarError, expand_optional, examples
+
+
+@pytest.mark.parametrize("scpi_string, message, expected", [
+    ("CHANnel<ch:int>", "CHAN12", {"ch": "12"}),
+    ("CHANnel<ch:int>", "CHAN-1", {"ch": "-1"}),
+    ("CHANnel<ch:int>", "CHAN1.5", None),
+    ("CHANnel<ch:int>", "CHANx", None),
+    ("VOLTage <v:float>", "VOLT 1.5E-3", {"v": "1.5E-3"}),
+    ("VOLTage <v:float>", "volt .5", {"v": ".5"}),
+    ("VOLTage <v:float>", "VOLT 1.5.3", None),
+    ("VOLTage <v:float>", "VOLT abc", None),
+    ("VOLTage <v:float>", "VOLT 20 mV", {"v": "20 mV"}),
+    ("VOLTage <v:float>", "VOLT 20 mV 3", None),
+    ("VOLTage <v:float>", "VOLT 2 MHz", {"v": "2 MHz"}),
+    ("VOLTage <v:float>", "VOLT 2 junk", None),
+    ("COUNt <n:int>", "COUN 5 7", None),
+    ("COUNt <n:int>", "COUN 5 \n", {"n": "5"}),
+    ("COUNt <n:int>", "COUN 1e3", {"n": "1e3"}),
+    ("OUTPut <state:bool>", "OUTP on", {"state": "on"}),
+    ("OUTPut <state:bool>", "OUTP 1", {"state": "1"}),
+    ("OUTPut <state:bool>", "OUTP ONCE", None),
+    ("TRIGger:SOURce <src:{BUS|IMMediate}>", "TRIG:SOUR imm", {"src": "imm"}),
+    ("TRIGger:SOURce <src:{BUS|IMMediate}>", "TRIG:SOUR immediate", {"src": "immediate"}),
+    ("TRIGger:SOURce <src:{BUS|IMMediate}>", "TRIG:SOUR EXT", None),
+    ("DISPlay:TEXT <text:str>", 'DISP:TEXT "hello world"', {"text": '"hello world"'}),
+    ("[:SOURce]:VOLTage?", ":VOLT?", {}),
+    ("[:SOURce]:VOLTage?", ":SOURCE:VOLT?", {}),
+    ("[:SOURce]:VOLTage?", ":SOURC:VOLT?", None),
+    ("MEASure:{VOLTage|CURRent}?", "MEAS:CURR?", {}),
+    ("MEASure:{VOLTage|CURRent}?", "MEAS:POW?", None),
+])
+def test_typed_grammar(scpi_string, message, expected):
+    match = re.match(compile_regular_expression(scpi_string), message)
+    if expected is None:
+        assert match is None
+    else:
+        assert match.groupdict() == expected
+
+
+def test_untyped_parameters_unchanged():
+    assert compile_regular_expression(":INSTRument:CHANNEL<channel>:VOLTage <value>") == (
+        r"(?i):INSTR(?:ument)?:CHANNEL(?P<channel>.*):VOLT(?:age)? (?P<value>.*)"
+    )
+    assert compile_regular_expression("*IDN?") == r"(?i)\*IDN\?"
+
+
+@pytest.mark.parametrize("scpi_string", [
+    "VOLTage <v:double>",
+    "[:SOURce:VOLTage",
+    "{ON|OFF",
+    "VOLTage <v",
+])
+def test_grammar_errors(scpi_string):
+    with pytest.raises(SCPIGrammarError):
+        compile_regular_expression(scpi_string)
+
+
+def test_expand_optional():
+    assert expand_optional("[:SOURce]:VOLTage[:LEVel]?") == [
+        ":SOURce:VOLTage:LEVel?", ":SOURce:VOLTage?", ":VOLTage:LEVel?", ":VOLTage?"
+    ]
+    assert expand_optional("[:A[:B]]:C") == [":A:B:C", ":A:C", ":C"]
+    assert expand_optional("OUTPut <state:{ON|OFF}>") == ["OUTPut <state:{ON|OFF}>"]
+
+
+def test_examples():
+    assert examples("[:SOURce]:VOLTage <v:float>") == [
+        ":VOLT 1", ":SOUR:VOLT 1", ":VOLTage 1", ":SOURce:VOLTage 1",
+        ":SOURCE:VOLTAGE 1", ":source:voltage 1",
+    ]
+
+
+def test_typed_mocker():
+
+    class Source(BaseMocker):
+        def __init__(self, call_delay: float = 0.0) -> None:
+            super().__init__(call_delay=call_delay)
+            self._voltage = {}
+            self._mode = "OFF"
+
+        @scpi("[:SOURce]:CHANnel<channel:int>:VOLTage[:LEVel] <value:float>")
+        def _set_voltage(self, channel: int, value: float) -> None:
+            self._voltage[channel] = value
+
+        @scpi("[:SOURce]:CHANnel<channel:int>:VOLTage[:LEVel]?")
+        def _get_voltage(self, channel: int) -> float:
+            return self._voltage[channel]
+
+        @scpi(":OUTPut <mode:{ON|OFF}>")
+        def _set_mode(self, mode: str) -> None:
+            self._mode = mode.upper()
+
+        @scpi(":OUTPut?")
+        def _get_mode(self) -> str:
+            return self._mode
+
+    # Typed parameters make these patterns unambiguous
+    assert Source.ambiguous_patterns() == []
+
+    mocker = Source()
+    mocker.send(":SOUR:CHAN1:VOLT:LEV 1.5")
+    mocker.send(":CHAN2:VOLT 2e-3")
+    assert mocker.send(":CHAN1:VOLT?") == "1.5"
+    assert mocker.send(":SOURCE:CHANNEL2:VOLTAGE:LEVEL?") == "0.002"
+    mocker.send(":CHAN1:VOLT 20 mV")
+    assert mocker.send(":CHAN1:VOLT?") == "0.02"
+
+    mocker.send(":OUTP on")
+    assert mocker.send(":OUTP?") == "ON"
+
+    with pytest.raises(ValueError, match='Unknown SCPI command'):
+        mocker.send(":OUTP maybe")
+    with pytest.raises(ValueError, match='Unknown SCPI command'):
+        mocker.send(":CHAN1:VOLT one")
+    with pytest.raises(ValueError, match='Unknown SCPI command'):
+        mocker.send(":CHAN1:VOLT 20 mV 3")
+
+
+def test_suffix_range_regex():
+    assert compile_regular_expression("CHANnel{1:64}:VOLTage?") == (
+        r"(?i)CHAN(?:nel)?(?P<channel>\d+)(?!\d):VOLT(?:age)?\?"
+    )
+    assert compile_regular_expression("CHANnel<ch:{1:8}>?") == (
+        r"(?i)CHAN(?:nel)?(?P<ch>\d+)(?!\d)\?"
+    )
+
+    for scpi_string in ["{1:64}:VOLTage?", "CHANnel{8:1}"]:
+        with pytest.raises(SCPIGrammarError):
+            compile_regular_expression(scpi_string)
+
+
+def test_suffix_range_mocker():
+
+    class Switch(BaseMocker):
+        def __init__(self, call_delay: float = 0.0) -> None:
+            super().__init__(call_delay=call_delay)
+            self._closed = set()
+
+        @scpi(":ROUTe:CLOSe:CHANnel{1:256} <state:bool>")
+        def _close(self, channel: int, state: str) -> None:
+            if state.upper() in ("ON", "1"):
+                self._closed.add(channel)
+
+        @scpi(":ROUTe:CLOSe:CHANnel{1:256}?")
+        def _is_closed(self, channel: int) -> int:
+            return int(channel in self._closed)
+
+        @scpi(":SLOT<slot:{1:4}>:CHANnel{1:64}:LABel?")
+        def _label(self, slot: int, channel: int) -> str:
+            return f"{type(slot).__name__} {slot}.{channel}"
+
+    assert Switch.ambiguous_patterns() == []
+
+    mocker = Switch()
+    mocker.send(":ROUT:CLOS:CHAN256 ON")
+    assert mocker.send(":route:close:channel256?") == "1"
+    assert mocker.send(":ROUT:CLOS:CHAN1?") == "0"
+    assert mocker.send(":SLOT4:CHAN12:LAB?") == "int 4.12"
+
+    for message in [":ROUT:CLOS:CHAN0 ON", ":ROUT:CLOS:CHAN257?", ":SLOT5:CHAN1:LAB?"]:
+        with pytest.raises(ValueError, match='Unknown SCPI command'):
+            mocker.send(message)
+
+
+def test_list_parameters():
+    np = pytest.importorskip("numpy")
+
+    class ListMocker(BaseMocker):
+        @scpi("LIST:VOLTage <values:list[float]>")
+        def _set_voltages(self, values: np.ndarray) -> None:
+            self.voltages = values
+
+        @scpi("LIST:COUNt <counts:list[int]>")
+        def _set_counts(self, counts: np.ndarray) -> None:
+            self.counts = counts
+
+    mocker = ListMocker()
+    values = np.linspace(0, 10, 100000)
+    mocker.send("LIST:VOLT " + ",".join(map(str, values)))
+    assert np.array_equal(mocker.voltages, values)
+
+    mocker.send("LIST:VOLT 1, 2.5 3E3")
+    assert np.array_equal(mocker.voltages, [1, 2.5, 3000])
+
+    mocker.send("LIST:VOLT 1,20mV,MAX")
+    assert list(mocker.voltages) == [1, 0.02, NumericKeyword.MAXIMUM]
+
+    mocker.send("LIST:COUN 1,#H1F")
+    assert mocker.counts.dtype.kind == "i"
+    assert list(mocker.counts) == [1, 31]
+
+    with pytest.raises(ValueError):
+        mocker.send("LIST:COUN 1,1.5")
+    for message in ["LIST:VOLT 1,,2", "LIST:VOLT 1,abc", "LIST:VOLT 1,2,", "LIST:VOLT ,1"]:
+        with pytest.raises(ValueError, match='Unknown SCPI command'):
+            mocker.send(message)
@@ -0,0 +1,114 @@
+import pytest
+
+from pyvisa_mock.base.base_mocker import BaseMocker, scpi
+from pyvisa_mock.test.mock_instruments.instruments import Mocker1
+
+
+class Mocker1Variant(Mocker1):
+    """
+    Inherits the voltage commands of Mocker1, overrides the query and adds
+    an identification command.
+    """
+
+    @scpi(":INSTRument:CHANNEL<channel>:VOLTage?")
+    def _get_voltage_variant(self, channel: int) -> float:
+        return -self._voltage[channel]
+
+    @scpi("*IDN?")
+    def _idn(self) -> str:
+        return "variant"
+
+
+class Mocker1Alias(Mocker1):
+    pass
+
+
+def test_inherited_handlers():
+    mocker = Mocker1Variant()
+    mocker.send(":INSTR:CHANNEL1:VOLT 12")
+    assert mocker.send(":INSTR:CHANNEL1:VOLT?") == "-12.0"
+    assert mocker.send("*IDN?") == "variant"
+
+    # The parent class is not affected
+    parent = Mocker1()
+    parent.send(":INSTR:CHANNEL1:VOLT 12")
+    assert parent.send(":INSTR:CHANNEL1:VOLT?") == "12.0"
+    with pytest.raises(ValueError, match='Unknown SCPI command'):
+        parent.send("*IDN?")
+
+    # The untyped channel of the setter overlaps with the query, as in
+    # the parent class. The overridden query adds no other overlaps.
+    assert Mocker1Variant.ambiguous_patterns() == Mocker1.ambiguous_patterns()
+
+
+def test_tables_shared_with_base():
+    assert Mocker1Alias.__scpi_dict__ is Mocker1.__scpi_dict__
+    assert Mocker1Alias.__scpi_trie__ is Mocker1.__scpi_trie__
+
+    # Handlers and compiled patterns are shared with the base class
+    for regex, handler in Mocker1.__scpi_dict__.items():
+        assert Mocker1Variant.__scpi_patterns__[regex] is Mocker1.__scpi_patterns__[regex]
+
+    mocker = Mocker1Alias()
+    mocker.send(":INSTR:CHANNEL2:VOLT 1.5")
+    assert mocker.send(":INSTR:CHANNEL2:VOLT?") == "1.5"
+
+
+def test_decorated_methods_remain_callable():
+
+    class Mocker(BaseMocker):
+        @scpi("*IDN?")
+        @scpi("*IDN:LONG?")
+        def idn(self) -> str:
+            return "mocker"
+
+    assert Mocker().idn() == "mocker"
+    assert Mocker().send("*IDN:LONG?") == "mocker"
+    assert len(Mocker.__scpi_dict__) == 2
+
+
+def test_diamond_inheritance():
+
+    class A(BaseMocker):
+        @scpi("P?")
+        def _p(self) -> str:
+            return "A"
+
+        @scpi("Q?")
+        def _q(self) -> str:
+            return "A"
+
+    class B(A):
+        @scpi("R?")
+        def _r(self) -> str:
+            return "B"
+
+    class C(A):
+        @scpi("P?")
+        def _p_c(self) -> str:
+            return "C"
+
+    class D(B, C):
+        @scpi("S?")
+        def _s(self) -> str:
+            return "D"
+
+    class D2(B, C):
+        pass
+
+    # B inherits the handler of A, C overrides it, and C comes before A
+    # in the MRO of D
+    for mocker_class in (D, D2):
+        mocker = mocker_class()
+        assert mocker.send("P?") == "C"
+        assert mocker.send("Q?") == "A"
+        assert mocker.send("R?") == "B"
+
+    assert D().send("S?") == "D"
+    assert D2.__scpi_own__ == {}
+
+    # A subclass of C alone shares its tables
+    class C2(C):
+        pass
+
+    assert C2.__scpi_dict__ is C.__scpi_dict__
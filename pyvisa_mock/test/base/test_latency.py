@@ -0,0 +1,137 @@
+import pytest
+
+from pyvisa_mock.base.base_mocker import BaseMocker, scpi
+from pyvisa_mock.base.clock import VirtualClock
+from pyvisa_mock.base.latency import (
+    FixedLatency, LogNormalLatency, NormalLatency, ThroughputLatency, WarmupLatency
+)
+from pyvisa_mock.test.mock_instruments.instruments import Mocker1
+
+QUERY = ":INSTR:CHANNEL1:VOLT?"
+SET = ":INSTR:CHANNEL1:VOLT 2"
+
+
+class Supply(BaseMocker):
+    def __init__(self):
+        super().__init__(clock=VirtualClock())
+        self._voltage = 0.0
+
+    @scpi("*IDN?")
+    def _idn(self) -> str:
+        return "Supply"
+
+    @scpi(":INSTRument:CHANNEL<channel:int>:VOLTage <value:float>")
+    def _set_voltage(self, channel: int, value: float) -> None:
+        self._voltage = value
+
+    @scpi(":INSTRument:CHANNEL<channel:int>:VOLTage?")
+    def _get_voltage(self, channel: int) -> float:
+        return self._voltage
+
+
+def elapsed(mocker, message):
+    start = mocker.clock.time()
+    mocker.send(message)
+    return mocker.clock.time() - start
+
+
+@pytest.fixture
+def mocker():
+    return Supply()
+
+
+def test_command_delay_per_instance():
+    first = Mocker1()
+    second = Mocker1()
+    first.clock = VirtualClock()
+    second.clock = VirtualClock()
+
+    first.set_call_delay(2.0, ":INSTRument:CHANNEL<channel>:VOLTage?")
+    assert elapsed(first, QUERY) == pytest.approx(2.0)
+    assert elapsed(second, QUERY) == 0
+
+
+def test_instrument_latency(mocker):
+    mocker.set_latency(FixedLatency(0.5))
+    assert elapsed(mocker, QUERY) == pytest.approx(0.5)
+    assert elapsed(mocker, SET) == pytest.approx(0.5)
+
+    mocker.set_latency(None)
+    assert elapsed(mocker, QUERY) == 0
+
+
+def test_command_and_family_latency(mocker):
+    mocker.set_latency(FixedLatency(1.0))
+    mocker.set_latency(FixedLatency(2.0), family=":INSTRument:CHANNEL<channel>")
+    mocker.set_latency(FixedLatency(3.0), ":INSTRument:CHANNEL<channel:int>:VOLTage?")
+
+    assert elapsed(mocker, QUERY) == pytest.approx(3.0)
+    assert elapsed(mocker, SET) == pytest.approx(2.0)
+    assert elapsed(mocker, "*IDN?") == pytest.approx(1.0)
+
+
+def test_unknown_command(mocker):
+    with pytest.raises(ValueError):
+        mocker.set_latency(FixedLatency(1.0), ":MEASure?")
+
+
+@pytest.mark.parametrize("latency_class, spread", [
+    (NormalLatency, 0.002),
+    (LogNormalLatency, 0.5),
+])
+def test_random_latency(latency_class, spread):
+    latency = latency_class(0.01, spread, seed=3)
+    delays = [latency.delay(QUERY, 0) for _ in range(2000)]
+    assert min(delays) >= 0
+    # The median
+    assert sorted(delays)[1000] == pytest.approx(0.01, rel=0.1)
+
+    # The seed makes the delays reproducible
+    latency = latency_class(0.01, spread, seed=3)
+    assert [latency.delay(QUERY, 0) for _ in range(2000)] == delays
+
+
+def test_throughput_and_warmup(mocker):
+    mocker.set_latency(WarmupLatency(ThroughputLatency(100, overhead=0.1), first=5))
+    size = len(QUERY) + len("0.0")
+    assert elapsed(mocker, QUERY) == pytest.approx(5 + 0.1 + size / 100)
+    assert elapsed(mocker, QUERY) == pytest.approx(0.1 + size / 100)
+
+
+def test_send_many_latency(mocker):
+    mocker.set_latency(FixedLatency(0.25) + FixedLatency(0.25))
+    mocker.send_many([QUERY] * 4)
+    assert mocker.clock.time() == pytest.approx(2.0)
+
+
+def test_lazy_header_delay():
+
+    class Channel(BaseMocker):
+        @scpi(":VOLTage?")
+        def _get_voltage(self) -> float:
+            return 1.0
+
+    class Rack(BaseMocker):
+        def __init__(self):
+            super().__init__(clock=VirtualClock())
+
+        @scpi(":CHANnel<number>", lazy=True, cache_submodule=True)
+        def _channel(self, number: int) -> Channel:
+            return Channel()
+
+    rack = Rack()
+    rack.set_call_delay(0.5, ":CHANnel<number>")
+    assert elapsed(rack, ":CHAN1:VOLT?") == pytest.approx(0.5)
+
+    rack.set_latency(FixedLatency(0.25), ":CHANnel<number>")
+    assert elapsed(rack, ":CHAN2:VOLT?") == pytest.approx(0.75)
+
+    # A command in the submodule takes precedence over its header
+    rack.set_latency(None, ":CHANnel<number>")
+    rack.set_call_delay(2.0, ":CHANnel<number>:VOLTage?")
+    assert elapsed(rack, ":CHAN3:VOLT?") == pytest.approx(2.0)
+
+    with pytest.raises(ValueError, match="header followed by"):
+        rack.set_call_delay(0.5, ":SLOT<number>")
+    with pytest.raises(ValueError):
+        rack.set_call_delay(0.5, ":CHANnel<number>:CURRent?")
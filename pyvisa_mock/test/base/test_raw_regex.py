@@ -4,7 +4,13 @@ from pyvisa_mock.test.mock_instruments.instruments import (
     MockerResponse,
     MockerChannel,
     )
-from pyvisa_mock.base.base_mocker import MockingError, scpi_raw_regex, BaseMocker
+from pyvisa_mock.base.base_mocker import (
+    MockingError,
+    scpi_raw_regex,
+    scpi,
+    BaseMocker,
+    compile_regular_expression,
+    )
 
 
 def test_raw_regex_overlap():
@@ -47,3 +53,43 @@ def test_raw_regex_overlap():
                 pass
 
 
+def test_overlap_detected_at_class_definition():
+    assert (
+        compile_regular_expression(":PASSfail"), ":passFAIL"
+    ) in Mocker6.ambiguous_patterns()
+
+    class Overlapping(BaseMocker):
+        @scpi(":MEASure<channel>?")
+        def _measure(self, channel: str) -> str:
+            return channel
+
+        @scpi(":MEASure:ALL?")
+        def _measure_all(self) -> str:
+            return "all"
+
+        @scpi(":FETCh?")
+        def _fetch(self) -> str:
+            return "fetch"
+
+    assert Overlapping.ambiguous_patterns() == [
+        (
+            compile_regular_expression(":MEASure<channel>?"),
+            compile_regular_expression(":MEASure:ALL?"),
+        )
+    ]
+
+    mocker = Overlapping()
+    assert mocker.send(":MEAS1?") == "1"
+    assert mocker.send(":FETCH?") == "fetch"
+    with pytest.raises(MockingError):
+        mocker.send(":MEAS:ALL?")
+
+
+def test_check_ambiguity():
+    mocker = Mocker6()
+    mocker.check_ambiguity = True
+    assert int(mocker.send(":PASS")) == MockerResponse.PASS_COMMAND.value
+    with pytest.raises(MockingError):
+        mocker.send(":passFAIL")
+    with pytest.raises(ValueError):
+        mocker.send(":CaSeTeSt")
@@ -0,0 +1,76 @@
+import time
+import pytest
+
+from pyvisa_mock.base.base_mocker import BaseMocker, scpi
+
+
+class Source(BaseMocker):
+
+    def __init__(self, call_delay: float = 0.0) -> None:
+        super().__init__(call_delay=call_delay)
+        self.calls = 0
+        self._voltage = {}
+
+    @scpi("*IDN?", cache=True)
+    def _idn(self) -> str:
+        self.calls += 1
+        return "source"
+
+    @scpi(":CHANnel<channel:int>:VOLTage <value:float>", writes="voltage")
+    def _set_voltage(self, channel: int, value: float) -> None:
+        self._voltage[channel] = value
+
+    @scpi(":CHANnel<channel:int>:VOLTage?", cache=True, state="voltage")
+    def _get_voltage(self, channel: int) -> float:
+        self.calls += 1
+        return self._voltage.get(channel, 0.0)
+
+    @scpi("*RST", writes=["voltage", "mode"])
+    def _reset(self) -> None:
+        self._voltage.clear()
+
+
+def test_cached_response():
+    mocker = Source()
+    assert mocker.send("*IDN?") == "source"
+    assert mocker.send("*IDN?") == "source"
+    assert mocker.calls == 1
+    assert mocker.response_cache_info() == (1, 1, 1)
+
+    # The cache is per instance
+    other = Source()
+    other.send("*IDN?")
+    assert other.calls == 1
+
+    mocker.clear_response_cache()
+    mocker.send("*IDN?")
+    assert mocker.calls == 2
+
+
+def test_writer_invalidates():
+    mocker = Source()
+    mocker.send(":CHAN1:VOLT 1.5")
+    assert mocker.send(":CHAN1:VOLT?") == "1.5"
+    assert mocker.send(":CHAN1:VOLT?") == "1.5"
+    assert mocker.send(":CHAN2:VOLT?") == "0.0"
+    assert mocker.calls == 2
+
+    mocker.send(":CHAN1:VOLT 2.5")
+    assert mocker.send(":CHAN1:VOLT?") == "2.5"
+    assert mocker.calls == 3
+
+    mocker.send("*RST")
+    assert mocker.send(":CHAN1:VOLT?") == "0.0"
+    assert mocker.calls == 4
+    assert mocker.response_cache_info().hits == 1
+
+
+def test_cached_response_is_delayed():
+    mocker = Source()
+    mocker.send("*IDN?")
+    mocker.set_call_delay(0.2)
+
+    start = time.time()
+    mocker.send("*IDN?")
+    assert time.time() - start == pytest.approx(0.2, abs=0.1)
+    assert mocker.calls == 1
@@ -0,0 +1,59 @@
+import pytest
+
+from pyvisa_mock.base.base_mocker import BaseMocker, scpi
+from pyvisa_mock.base.clock import VirtualClock
+
+
+class RecordingClock(VirtualClock):
+    def __init__(self):
+        super().__init__()
+        self.sleeps = []
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        super().sleep(seconds)
+
+
+class Source(BaseMocker):
+    def __init__(self):
+        super().__init__(call_delay=0.1, clock=RecordingClock())
+        self._voltage = 0.0
+
+    @scpi(":VOLTage <voltage:float>")
+    def _set_voltage(self, voltage: float) -> None:
+        self._voltage = voltage
+
+    @scpi(":VOLTage?")
+    def _get_voltage(self) -> float:
+        return self._voltage
+
+
+def test_send_many():
+    source = Source()
+    responses = source.send_many([":VOLT 1", ":VOLT?", ":VOLT 2.5", ":VOLT?"])
+    assert responses == ["None", "1.0", "None", "2.5"]
+    assert source.clock.sleeps == [pytest.approx(0.4)]
+    assert source.clock.time() == pytest.approx(0.4)
+
+
+def test_repeated_messages_resolved_once(monkeypatch):
+    lookups = []
+    lookup = Source._lookup
+
+    def counting_lookup(scpi_string, check_ambiguity=False):
+        lookups.append(scpi_string)
+        return lookup(scpi_string, check_ambiguity)
+
+    monkeypatch.setattr(Source, "_lookup", staticmethod(counting_lookup))
+    source = Source()
+    source.send_many([":VOLT?"] * 10 + [":VOLT 1"])
+    assert lookups == [":VOLT?", ":VOLT 1"]
+
+
+def test_unknown_message():
+    source = Source()
+    with pytest.raises(ValueError):
+        source.send_many([":VOLT 1", ":CURR?"])
+
+    # No handler was called
+    assert source.send(":VOLT?") == "0.0"
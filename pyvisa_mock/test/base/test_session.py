@@ -1,5 +1,186 @@
-from pyvisa_mock.base.session import Session
+import pytest
+from pyvisa import ResourceManager
+
+from pyvisa_mock.base.base_mocker import BaseMocker, scpi
+from pyvisa_mock.base.clock import VirtualClock
+from pyvisa_mock.base.register import register_resource
+from pyvisa_mock.base.session import (
+    Session, OutputQueueOverflowError, QueryInterruptedError
+)
 
 
 def test_session():
     Session(0, "TCPIP0::mock:INSTR")
+
+
+class Reply:
+    def __init__(self, reply) -> None:
+        self.reply = reply
+        self.clock = VirtualClock()
+
+    def send(self, message, timeout=None):
+        return self.reply
+
+
+def test_read_in_chunks():
+    session = Session(0, "MOCK0::mock::INSTR")
+    session._device = Reply(b"0123456789")
+    session.write("FETCh?")
+
+    assert session.read() == b"0123456789"
+    assert session.read(3) == b"012"
+    assert session.read(4) == b"3456"
+    # The consumed part of the buffer is released
+    assert len(session._read_buffer) < 10
+    assert session.bytes_in_buffer == 3
+    assert session.read() == b"789"
+    assert session.read(10) == b"789"
+    assert session.read(10) == b""
+
+
+def test_string_reply_encoding():
+    session = Session(0, "MOCK0::mock::INSTR")
+    session._device = Reply("25 °C")
+    session.write("TEMP?")
+    assert session.read() == "25 °C".encode("utf-8")
+
+    session.encoding = "latin-1"
+    session.write("TEMP?")
+    assert session.read() == "25 °C".encode("latin-1")
+
+
+class Queries:
+    query_interrupted = "keep"
+    output_queue_size = 3
+    output_overflow = "error"
+    defer_queries = False
+
+    def __init__(self) -> None:
+        self.events = {}
+        self.clock = VirtualClock()
+
+    def send(self, message, timeout=None):
+        return message.rstrip("?")
+
+
+@pytest.fixture
+def queue_session():
+    session = Session(0, "MOCK0::mock::INSTR")
+    session.device = Queries()
+    return session
+
+
+def test_pipelined_queries(queue_session):
+    queue_session.write("A?")
+    queue_session.write("SET 1")
+    queue_session.write("BB?")
+
+    assert queue_session.read(1) == b"A"
+    assert not queue_session.pending()
+    assert queue_session.read_response() == b"BB"
+    assert not queue_session.unread()
+
+
+@pytest.mark.parametrize("overflow, expected", [
+    ("drop_oldest", [b"B", b"C", b"D"]),
+    ("drop_newest", [b"A", b"B", b"C"]),
+])
+def test_output_queue_overflow(queue_session, overflow, expected):
+    queue_session.output_overflow = overflow
+    for message in ("A?", "B?", "C?", "D?"):
+        queue_session.write(message)
+
+    assert [queue_session.read_response() for _ in expected] == expected
+
+
+def test_output_queue_overflow_error(queue_session):
+    for message in ("A?", "B?", "C?"):
+        queue_session.write(message)
+    with pytest.raises(OutputQueueOverflowError):
+        queue_session.write("D?")
+
+
+def test_query_interrupted(queue_session):
+    queue_session.query_interrupted = "error"
+    queue_session.write("A?")
+    with pytest.raises(QueryInterruptedError):
+        queue_session.write("B?")
+
+    assert not queue_session.unread()
+    queue_session.write("C?")
+    assert queue_session.read_response() == b"C"
+
+
+def test_quoted_query_mark(queue_session):
+    # A '?' in a string does not make a command a query
+    queue_session.write(':DISP:TEXT "ok;go?"')
+    queue_session.write("A?")
+    assert queue_session.read_response() == b"A"
+    assert not queue_session.unread()
+
+
+def test_ask(queue_session):
+    # As a query with a read, the reply is consumed
+    assert queue_session.ask("A?") == b"A"
+    assert queue_session.ask("B?") == b"B"
+    assert not queue_session.unread()
+
+
+def test_pipelined_resource():
+    class Meter(BaseMocker):
+        query_interrupted = "keep"
+
+        @scpi("MEASure:CHANnel<channel:int>?")
+        def _measure(self, channel: int) -> float:
+            return channel / 10
+
+    register_resource("MOCK0::meter::INSTR", Meter())
+    resource = ResourceManager(visa_library="@mock").open_resource("MOCK0::meter::INSTR")
+    for channel in range(1, 4):
+        resource.write(f"MEAS:CHAN{channel}?")
+
+    assert [resource.read() for _ in range(3)] == ["0.1", "0.2", "0.3"]
+
+
+class Measurements(BaseMocker):
+    defer_queries = True
+    query_interrupted = "keep"
+
+    def __init__(self):
+        super().__init__()
+        self.level = 0
+        self.measured = 0
+
+    @scpi("LEVel <level:int>")
+    def _set_level(self, level: int) -> None:
+        self.level = level
+
+    @scpi("MEASure?")
+    def _measure(self) -> int:
+        self.measured += 1
+        return self.level
+
+
+@pytest.mark.parametrize("query_interrupted", ["discard", "keep"])
+def test_deferred_queries(query_interrupted):
+    device = Measurements()
+    device.query_interrupted = query_interrupted
+    session = Session(0, "MOCK0::mock::INSTR")
+    session.device = device
+
+    session.write("MEAS?")
+    assert device.measured == 0
+    assert session.read_response() == b"0"
+    assert device.measured == 1
+
+    # The response is computed before the next message changes the level,
+    # unless it is discarded
+    session.write("LEV 5")
+    session.write("MEAS?")
+    session.write("LEV 7")
+    if query_interrupted == "keep":
+        assert device.measured == 2
+        assert session.read_response() == b"5"
+    else:
+        assert device.measured == 1
+        assert session.read_response() == b"None"
@@ -0,0 +1,86 @@
+from typing import Iterator
+
+import pytest
+from pyvisa import ResourceManager
+
+from pyvisa_mock.base.base_mocker import BaseMocker, scpi
+from pyvisa_mock.base.register import register_resource
+from pyvisa_mock.base.responses import StreamResponse
+from pyvisa_mock.base.session import Session
+
+
+class Scope(BaseMocker):
+    POINTS = 100000
+
+    def __init__(self, call_delay: float = 0.0) -> None:
+        super().__init__(call_delay=call_delay)
+        self.produced = 0
+
+    def _chunks(self, size: int) -> Iterator[bytes]:
+        for start in range(0, self.POINTS, size):
+            self.produced += 1
+            yield bytes(i % 256 for i in range(start, min(start + size, self.POINTS)))
+
+    @scpi("CURVe?")
+    def _curve(self) -> Iterator[bytes]:
+        return self._chunks(1000)
+
+    @scpi("CURVe:BLOCk?")
+    def _curve_block(self) -> StreamResponse:
+        return StreamResponse(self._chunks(1000), length=self.POINTS, block=True)
+
+    @scpi("CURVe:WRONg?")
+    def _curve_wrong_length(self) -> StreamResponse:
+        return StreamResponse(self._chunks(1000), length=self.POINTS + 1)
+
+
+def open_session(device: BaseMocker) -> Session:
+    session = Session(0, "MOCK0::scope::INSTR")
+    session.device = device
+    return session
+
+
+def test_chunks_are_produced_lazily():
+    scope = Scope()
+    session = open_session(scope)
+    session.write("CURV?")
+    assert scope.produced == 0
+
+    assert session.read(10) == bytes(range(10))
+    assert scope.produced == 1
+
+    data = session.read(1995)
+    assert data[-1] == 2004 % 256
+    assert scope.produced == 3
+    assert session.bytes_in_buffer < 2000
+
+    rest = session.read()
+    assert len(rest) == Scope.POINTS - 2005
+    assert scope.produced == Scope.POINTS // 1000
+
+
+def test_new_message_discards_stream():
+    scope = Scope()
+    session = open_session(scope)
+    session.write("CURV?")
+    session.read(10)
+    session.write("CURV:BLOC?")
+    assert session.read(8) == b"#6100000"
+
+
+def test_declared_length_is_checked():
+    session = open_session(Scope())
+    session.write("CURV:WRON?")
+    with pytest.raises(ValueError, match="declared"):
+        session.read()
+
+
+def test_query_streamed_block():
+    register_resource("MOCK0::scope::INSTR", Scope())
+    resource = ResourceManager(visa_library="@mock").open_resource("MOCK0::scope::INSTR")
+
+    values = resource.query_binary_values("CURV:BLOC?", datatype="B", container=bytes)
+    assert values == bytes(i % 256 for i in range(Scope.POINTS))
+
+    resource.write("CURV?")
+    assert resource.read_raw() == values
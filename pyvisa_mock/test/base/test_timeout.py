@@ -0,0 +1,122 @@
+import time
+
+import pytest
+from pyvisa import ResourceManager, VisaIOError
+from pyvisa.constants import StatusCode
+
+from pyvisa_mock.base.base_mocker import BaseMocker, scpi
+from pyvisa_mock.base.bus import Bus
+from pyvisa_mock.base.clock import VirtualClock
+from pyvisa_mock.base.latency import FixedLatency, WarmupLatency
+from pyvisa_mock.base.register import register_bus, register_resource
+
+
+class Meter(BaseMocker):
+    def __init__(self) -> None:
+        super().__init__(clock=VirtualClock())
+        self.measurements = 0
+
+    @scpi("MEASure?")
+    def _measure(self) -> int:
+        self.measurements += 1
+        return self.measurements
+
+
+def open_meter(name: str, meter: Meter):
+    register_resource(f"MOCK0::{name}::INSTR", meter)
+    return ResourceManager(visa_library="@mock").open_resource(f"MOCK0::{name}::INSTR")
+
+
+def test_send_timeout():
+    meter = Meter()
+    meter.set_call_delay(5.0)
+
+    with pytest.raises(TimeoutError):
+        meter.send("MEAS?", timeout=1.0)
+    # The handler is not called, the clock waited for the timeout
+    assert meter.measurements == 0
+    assert meter.clock.time() == pytest.approx(1.0)
+
+    assert meter.send("MEAS?", timeout=10.0) == "1"
+    assert meter.clock.time() == pytest.approx(6.0)
+
+
+def test_compound_timeout():
+    meter = Meter()
+    meter.set_call_delay(0.6)
+
+    with pytest.raises(TimeoutError):
+        meter.send("MEAS?;MEAS?", timeout=1.0)
+    # No handler is called, as for a single command
+    assert meter.measurements == 0
+    assert meter.clock.time() == pytest.approx(1.0)
+
+    assert meter.send("MEAS?;MEAS?", timeout=2.0) == "1;2"
+
+
+def test_resource_timeout():
+    meter = Meter()
+    meter.set_call_delay(5.0)
+    resource = open_meter("slow_meter", meter)
+    resource.timeout = 1000
+
+    start = time.time()
+    with pytest.raises(VisaIOError) as error:
+        resource.query("MEAS?")
+    assert error.value.error_code == StatusCode.error_timeout
+    assert time.time() - start < 1
+    assert meter.clock.time() == pytest.approx(1.0)
+
+    resource.timeout = None
+    assert resource.query("MEAS?") == "1"
+
+
+def test_retry_after_timeout():
+    meter = Meter()
+    # The first measurement takes long, e.g. to load a calibration
+    meter.set_latency(WarmupLatency(FixedLatency(0.1), first=3.0))
+    resource = open_meter("warmup_meter", meter)
+
+    with pytest.raises(VisaIOError):
+        resource.query("MEAS?")
+    # The default timeout of VISA is 2 seconds
+    assert meter.clock.time() == pytest.approx(2.0)
+
+    assert resource.query("MEAS?") == "2"
+    assert meter.clock.time() == pytest.approx(2.1)
+
+
+def test_bus_timeout():
+    clock = VirtualClock()
+    register_bus("5", Bus(bytes_per_second=100, clock=clock))
+
+    class Digitizer(BaseMocker):
+        @scpi("FETCh?")
+        def _fetch(self) -> str:
+            return "0" * 1000
+
+    register_resource("MOCK5::digitizer::INSTR", Digitizer())
+    resource = ResourceManager(visa_library="@mock").open_resource("MOCK5::digitizer::INSTR")
+    resource.timeout = 5000
+
+    resource.write("FETC?")
+    with pytest.raises(VisaIOError) as error:
+        resource.read()
+    assert error.value.error_code == StatusCode.error_timeout
+
+
+def test_one_deadline_per_write():
+    meter = Meter()
+    meter.set_call_delay(1.0)
+    register_bus("6", Bus(overhead=1.5, clock=meter.clock))
+    register_resource("MOCK6::meter::INSTR", meter)
+    resource = ResourceManager(visa_library="@mock").open_resource("MOCK6::meter::INSTR")
+    resource.timeout = 2000
+
+    # The transfer and the call delay each fit in the timeout, together
+    # they do not
+    with pytest.raises(VisaIOError) as error:
+        resource.write("MEAS?")
+    assert error.value.error_code == StatusCode.error_timeout
+    assert meter.measurements == 0
+    assert meter.clock.time() == pytest.approx(2.0)
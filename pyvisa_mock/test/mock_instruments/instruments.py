@@ -1,10 +1,9 @@
-from typing import Dict
+from typing import Dict, Optional
 from collections import defaultdict
-import time
-from threading import Thread
 from enum import Enum, auto
 
 from pyvisa_mock.base.base_mocker import BaseMocker, scpi, scpi_raw_regex
+from pyvisa_mock.base.clock import Clock
 
 
 class Mocker0(BaseMocker):
@@ -119,8 +118,8 @@ class Mocker5(BaseMocker):
 
     meas_time: float = 1
 
-    def __init__(self, call_delay: float = 0.0) -> None:
-        super().__init__(call_delay=call_delay)
+    def __init__(self, call_delay: float = 0.0, clock: Optional[Clock] = None) -> None:
+        super().__init__(call_delay=call_delay, clock=clock)
         self._voltage: Dict[int, float] = defaultdict(lambda: 0.0)
 
     @scpi(r'*CLS')
@@ -136,7 +135,10 @@ class Mocker5(BaseMocker):
         return self._run_measurement(channel)
 
     def _run_measurement(self, channel: int) -> float:
-        time.sleep(self.meas_time)
+        self.clock.sleep(self.meas_time)
+        return self._finish_measurement(channel)
+
+    def _finish_measurement(self, channel: int) -> float:
         self.stb = 0x40
         self.set_service_request_event()
         return self._voltage[channel]
@@ -146,11 +148,7 @@ class Mocker5(BaseMocker):
         if self.stb & 0x40:
             # Don't start another measurement until the previous one is cleared.
             return
-        Thread(
-            target=self._run_measurement,
-            args=(channel,),
-            daemon=True,
-            ).start()
+        self.clock.call_later(self.meas_time, self._finish_measurement, channel)
 
     @scpi(":INSTRument:CHANNEL<channel>:REAd?")
     def _read_voltage_meas(self, channel: int) -> float: